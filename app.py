@@ -56,8 +56,9 @@ class StarterWorkerType:
     sweep = 'sweep'
     sweep_no_wait = 'sweep_no_wait'
     sweeps_loop = 'sweeps_loop'
+    insights_poller = 'insights_poller'
 
-    ALL = {sweep, sweep_no_wait, sweeps_loop}
+    ALL = {sweep, sweep_no_wait, sweeps_loop, insights_poller}
 
 
 def process_celery_worker_command(command_line_values):
@@ -150,6 +151,14 @@ def process_start_command(command_line_values):
         run_sweeps_forever()
         return
 
+    # Runs alongside sweeps when facebook config INSIGHTS_CENTRAL_POLLING_ENABLED is on.
+    # One is enough. More are safe, but only add load on FB.
+    if command_line_values.worker_type == StarterWorkerType.insights_poller:
+        from oozer.metrics.report_run_poller import run_poller_forever
+
+        run_poller_forever()
+        return
+
     # we never get values that are not on the list of valid ones
     # OptParser complains about that first, so, here we only get the ones
     # we declare in opt parser config as supported options.
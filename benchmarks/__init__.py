@@ -0,0 +1,13 @@
+"""
+Benchmarks for Sweep Builder and Sweep Looper code.
+
+These are NOT tests. They are meant to be ran by hand (or by CI) against local
+stand-ins of our storage backends (see `make start-services`) to track
+throughput regressions across commits. Typical invocation from repo root::
+
+    APP_DYNAMODB_HOST=http://localhost:8000 \\
+    APP_REDIS_URL=redis://localhost:7000 \\
+    python -m benchmarks.sweep --accounts-per-scope 5 --ads-per-adset 20 --output sweep-bench.json
+
+Never point these at production DynamoDB / Redis. Benchmarks wipe and seed tables.
+"""
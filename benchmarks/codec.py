@@ -0,0 +1,133 @@
+"""
+Cold storage payload codec benchmark.
+
+Encodes and decodes chunks of insights rows with every supported combination
+of payload format and compression, reporting CPU time spent against bytes saved.
+
+Rows are read from a fixture file (a payload as stored in cold storage, in any
+format / compression `load_data` understands - for example a recorded insights report
+chunk downloaded from S3). Without a fixture, synthetic rows shaped like
+day-breakdown insights with action breakdowns over 6 attribution windows are used.
+
+Needs no storage backends.
+"""
+import argparse
+import random
+import sys
+import time
+import ujson as json
+
+from typing import List, Dict, Any
+
+from oozer.common.cold_storage import codec
+
+ATTRIBUTION_WINDOWS = ['1d_click', '7d_click', '28d_click', '1d_view', '7d_view', '28d_view']
+ACTION_TYPES = ['link_click', 'post_engagement', 'page_engagement', 'video_view', 'post_reaction', 'comment']
+ACTION_FIELDS = ['actions', 'action_values', 'cost_per_action_type', 'video_p25_watched_actions']
+
+
+def _gen_actions(rnd: random.Random) -> List[Dict[str, str]]:
+    actions = []
+    for action_type in ACTION_TYPES:
+        action = {'action_type': action_type, 'value': str(rnd.randint(0, 100000))}
+        action.update({window: str(rnd.randint(0, 100000)) for window in ATTRIBUTION_WINDOWS})
+        actions.append(action)
+    return actions
+
+
+def gen_rows(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    ad_account_id = str(rnd.randint(10 ** 15, 10 ** 16))
+    rows = []
+    for _ in range(count):
+        row = {
+            'account_id': ad_account_id,
+            'campaign_id': str(rnd.randint(10 ** 16, 10 ** 17)),
+            'adset_id': str(rnd.randint(10 ** 16, 10 ** 17)),
+            'ad_id': str(rnd.randint(10 ** 16, 10 ** 17)),
+            'date_start': '2020-01-01',
+            'date_stop': '2020-01-01',
+            'spend': f'{rnd.random() * 1000:.2f}',
+            'impressions': str(rnd.randint(0, 10 ** 6)),
+            'clicks': str(rnd.randint(0, 10 ** 4)),
+            'cpm': f'{rnd.random() * 10:.6f}',
+            'ctr': f'{rnd.random() * 5:.6f}',
+        }
+        row.update({field: _gen_actions(rnd) for field in ACTION_FIELDS})
+        rows.append(row)
+    return rows
+
+
+def run_codec(rows: List[Dict[str, Any]], payload_format: str, compression: str, level: int, chunk_size: int):
+    chunks = [rows[i : i + chunk_size] for i in range(0, len(rows), chunk_size)]
+
+    start = time.process_time()
+    bodies = [codec.encode(chunk, payload_format, compression, level)[0] for chunk in chunks]
+    encode_seconds = time.process_time() - start
+
+    start = time.process_time()
+    for body in bodies:
+        codec.decode(body)
+    decode_seconds = time.process_time() - start
+
+    return {
+        'format': payload_format,
+        'compression': compression or 'none',
+        'level': level if compression else None,
+        'bytes': sum(len(body) for body in bodies),
+        'encode_cpu_seconds': round(encode_seconds, 4),
+        'decode_cpu_seconds': round(decode_seconds, 4),
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixture', default=None, help='Cold storage payload file to take rows from')
+    parser.add_argument('--rows', type=int, default=10000, help='Number of synthetic rows (when no fixture)')
+    parser.add_argument('--chunk-size', type=int, default=200)
+    parser.add_argument('--gzip-levels', default='1,6,9')
+    parser.add_argument('--zstd-levels', default='1,3,9')
+    parser.add_argument('--output', default=None, help='Write JSON results here instead of stdout')
+    args = parser.parse_args(argv)
+
+    if args.fixture:
+        with open(args.fixture, 'rb') as f:
+            rows = codec.decode(f.read())
+    else:
+        rows = gen_rows(args.rows)
+
+    variants = [(codec.COMPRESSION_NONE, 0)]
+    variants += [(codec.COMPRESSION_GZIP, int(level)) for level in args.gzip_levels.split(',')]
+    variants += [(codec.COMPRESSION_ZSTD, int(level)) for level in args.zstd_levels.split(',')]
+
+    results = [
+        run_codec(rows, payload_format, compression, level, args.chunk_size)
+        for payload_format in [codec.FORMAT_JSON, codec.FORMAT_NDJSON]
+        for compression, level in variants
+    ]
+    baseline_bytes = results[0]['bytes']
+    baseline_encode_seconds = results[0]['encode_cpu_seconds']
+    for result in results:
+        result['bytes_saved_ratio'] = round(1 - result['bytes'] / baseline_bytes, 4)
+        result['extra_encode_cpu_seconds_per_mb_saved'] = (
+            round(
+                (result['encode_cpu_seconds'] - baseline_encode_seconds)
+                / ((baseline_bytes - result['bytes']) / 1024 / 1024),
+                4,
+            )
+            if result['bytes'] < baseline_bytes
+            else None
+        )
+
+    report = {'rows': len(rows), 'chunk_size': args.chunk_size, 'codecs': results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Cold storage upload benchmark.
+
+Simulates a collection loop (pages of data arriving from FB with some latency)
+writing chunks to S3 through ChunkDumpStore, once with synchronous uploads
+and once with background uploads, against a local S3 stand-in.
+
+Outputs a JSON document (to stdout or file) with total time per mode.
+"""
+# flake8: noqa: E402
+
+# this must be first import in our entry point
+import common.patch
+
+common.patch.patch_event_loop()
+
+import argparse
+import sys
+import time
+import ujson as json
+
+from typing import List, Dict, Any
+
+import gevent
+
+import config.aws
+from common.configure_logging import configure_logging
+from common.enums.entity import Entity
+from common.enums.reporttype import ReportType
+from oozer.common.cold_storage import base_store
+from oozer.common.cold_storage.batch_store import ChunkDumpStore
+from oozer.common.job_scope import JobScope
+
+
+class SyncChunkDumpStore(ChunkDumpStore):
+    """
+    ChunkDumpStore the way it was before uploads moved to the background
+    """
+
+    _store = staticmethod(base_store.store)
+
+
+def _gen_datum(index: int, datum_size: int) -> Dict[str, Any]:
+    return {'id': str(index), 'payload': 'x' * datum_size}
+
+
+def run_mode(store_class: type, args: argparse.Namespace) -> Dict[str, Any]:
+    job_scope = JobScope(
+        sweep_id=f'bench-{int(time.time())}',
+        ad_account_id='bench',
+        entity_id='bench',
+        entity_type=Entity.AdAccount,
+        report_type=ReportType.entity,
+        report_variant=Entity.Ad,
+    )
+
+    start = time.time()
+    with store_class(job_scope, chunk_size=args.chunk_size) as store:
+        for page in range(args.pages):
+            # stand-in for FB paging latency
+            gevent.sleep(args.page_latency)
+            for index in range(args.page_size):
+                store(_gen_datum(page * args.page_size + index, args.datum_size))
+    seconds = time.time() - start
+
+    total = args.pages * args.page_size
+    return {
+        'mode': store_class.__name__,
+        'items': total,
+        'seconds': round(seconds, 4),
+        'items_per_second': round(total / seconds, 2),
+    }
+
+
+def main(argv: List[str] = None):
+    configure_logging()
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--page-latency', type=float, default=0.2, help='Seconds to "wait on FB" per page')
+    parser.add_argument('--chunk-size', type=int, default=200)
+    parser.add_argument('--datum-size', type=int, default=1000, help='Approximate bytes per datum')
+    parser.add_argument('--output', default=None, help='Write JSON results here instead of stdout')
+    args = parser.parse_args(argv)
+
+    if config.aws.S3_ENDPOINT is None:
+        raise ValueError('S3 endpoint config not set. Refusing to write benchmark data to what could be production S3.')
+
+    base_store.get_bucket_by_type().create()
+
+    report = {
+        'upload_concurrency': config.aws.S3_UPLOAD_CONCURRENCY,
+        'upload_max_bytes_in_flight': config.aws.S3_UPLOAD_MAX_BYTES_IN_FLIGHT,
+        'modes': [run_mode(SyncChunkDumpStore, args), run_mode(ChunkDumpStore, args)],
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
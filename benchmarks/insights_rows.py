@@ -0,0 +1,165 @@
+"""
+Insights row post-processing benchmark.
+
+Runs the same insights rows through the per-row vendor data extractors and
+FieldTransformation (as we used to) and through InsightsRowProcessor compiled
+for the job, reporting rows per second of CPU time. Encoding of processed rows
+for cold storage is timed too, as that is where rows go next.
+
+Rows are read from a fixture file (a payload as stored in cold storage, in any
+format / compression codec.decode understands). Without a fixture, synthetic
+rows shaped like day-breakdown insights are used.
+
+Needs no storage backends.
+"""
+import argparse
+import copy
+import functools
+import io
+import sys
+import time
+import ujson as json
+
+from typing import Any, Callable, Dict, List
+
+from benchmarks.codec import gen_rows
+from common.enums.entity import Entity
+from common.enums.reporttype import ReportType
+from oozer.common.cold_storage import codec
+from oozer.common.job_scope import JobScope
+from oozer.common.vendor_data import add_vendor_data
+from oozer.metrics.collect_insights import Insights
+from oozer.metrics.field_transformation import FieldTransformation
+from oozer.metrics.row_processor import InsightsRowProcessor
+from oozer.metrics.vendor_data_extractor import report_type_vendor_data_extractor_map
+
+# values for breakdown fields synthetic rows don't have
+BREAKDOWN_VALUES = {
+    'age': '25-34',
+    'gender': 'female',
+    'dma': 'Macon, GA',
+    'region': 'California',
+    'country': 'US',
+    'publisher_platform': 'instagram',
+    'platform_position': 'feed',
+    'hourly_stats_aggregated_by_advertiser_time_zone': '13:00:00 - 13:59:59',
+}
+
+
+def make_legacy_processor(job_scope: JobScope, entity_type: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    vendor_data_extractor = report_type_vendor_data_extractor_map[job_scope.report_type]
+    if job_scope.report_type == ReportType.day_hour:
+        vendor_data_extractor = functools.partial(vendor_data_extractor, job_scope.ad_account_timezone_name)
+    aux_data = {
+        'ad_account_id': job_scope.ad_account_id,
+        'entity_type': entity_type,
+        'report_type': job_scope.report_type,
+    }
+
+    def process(row):
+        add_vendor_data(row, **vendor_data_extractor(row, **aux_data))
+        return FieldTransformation.transform(row, Insights._ACTIONS_FIELDS_TO_TRANSFORM)
+
+    return process
+
+
+def make_compiled_processor(job_scope: JobScope, entity_type: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    return InsightsRowProcessor(job_scope, entity_type, Insights._ACTIONS_FIELDS_TO_TRANSFORM)
+
+
+def run_processor(name: str, make_processor: Callable, job_scope: JobScope, rows: List[Dict[str, Any]], repeat: int):
+    best_process_seconds = best_encode_seconds = None
+    for _ in range(repeat):
+        # processing happens in place, so every run gets its own rows
+        rows_copy = copy.deepcopy(rows)
+
+        start = time.process_time()
+        process = make_processor(job_scope, Entity.Ad)
+        processed = [process(row) for row in rows_copy]
+        process_seconds = time.process_time() - start
+
+        start = time.process_time()
+        encoder = codec.StreamEncoder(io.BytesIO(), codec.FORMAT_NDJSON, codec.COMPRESSION_NONE)
+        for row in processed:
+            encoder.write(row)
+        encode_seconds = time.process_time() - start
+
+        best_process_seconds = (
+            process_seconds if best_process_seconds is None else min(best_process_seconds, process_seconds)
+        )
+        best_encode_seconds = (
+            encode_seconds if best_encode_seconds is None else min(best_encode_seconds, encode_seconds)
+        )
+
+    return {
+        'processor': name,
+        'process_cpu_seconds': round(best_process_seconds, 4),
+        'encode_cpu_seconds': round(best_encode_seconds, 4),
+        'rows_per_second': round(len(rows) / best_process_seconds) if best_process_seconds else None,
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixture', default=None, help='Cold storage payload file to take rows from')
+    parser.add_argument('--rows', type=int, default=20000, help='Number of synthetic rows (when no fixture)')
+    parser.add_argument(
+        '--report-type',
+        choices=sorted(report_type_vendor_data_extractor_map),
+        default=ReportType.day,
+        help='Report type rows are processed as',
+    )
+    parser.add_argument('--repeat', type=int, default=3, help='Best of this many runs is reported')
+    parser.add_argument('--output', default=None, help='Write JSON results here instead of stdout')
+    args = parser.parse_args(argv)
+
+    if args.fixture:
+        with open(args.fixture, 'rb') as f:
+            rows = codec.decode(f.read())
+    else:
+        rows = [{**row, **BREAKDOWN_VALUES} for row in gen_rows(args.rows)]
+    # whatever vendor data rows come with is recomputed
+    for row in rows:
+        row.pop('__oprm', None)
+        row.pop('__transformed', None)
+
+    job_scope = JobScope(
+        ad_account_id=rows[0].get('account_id', '1') if rows else '1',
+        report_type=args.report_type,
+        report_variant=Entity.Ad,
+        ad_account_timezone_name='America/Los_Angeles',
+    )
+
+    results = [
+        run_processor('extractors', make_legacy_processor, job_scope, rows, args.repeat),
+        run_processor('compiled', make_compiled_processor, job_scope, rows, args.repeat),
+    ]
+
+    # compiled processor must produce exactly what extractors + FieldTransformation did
+    legacy_process = make_legacy_processor(job_scope, Entity.Ad)
+    compiled_process = make_compiled_processor(job_scope, Entity.Ad)
+    identical_rows = all(
+        legacy_process(legacy_row) == compiled_process(compiled_row)
+        for legacy_row, compiled_row in zip(copy.deepcopy(rows), copy.deepcopy(rows))
+    )
+
+    report = {
+        'rows': len(rows),
+        'report_type': args.report_type,
+        'identical_rows': identical_rows,
+        'speedup': round(results[0]['process_cpu_seconds'] / results[1]['process_cpu_seconds'], 2)
+        if results[1]['process_cpu_seconds']
+        else None,
+        'processors': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
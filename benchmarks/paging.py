@@ -0,0 +1,137 @@
+"""
+Graph API paging benchmark.
+
+Pages through the same Graph API responses with SDK's Cursor (rows turned into
+SDK objects and back into dicts with export_all_data, as we used to) and with
+RawCursor (rows parsed straight into dicts), reporting rows per second of CPU time.
+
+Pages are read from a fixture file - a JSON list of recorded Graph API response
+bodies of one edge read (for example, insights report pages). Without a fixture,
+pages of synthetic day-breakdown insights rows are used.
+
+Needs no network or storage backends. Responses are served from memory.
+"""
+import argparse
+import sys
+import time
+import ujson as json
+
+from typing import Any, Callable, Dict, List
+
+from facebook_business.adobjects.ad import Ad
+from facebook_business.adobjects.adset import AdSet
+from facebook_business.adobjects.adsinsights import AdsInsights
+from facebook_business.adobjects.campaign import Campaign
+from facebook_business.api import Cursor, FacebookRequest, FacebookResponse
+
+from benchmarks.codec import gen_rows
+from oozer.common.raw_paging import RawCursor
+
+TARGET_CLASSES = {'insights': AdsInsights, 'campaigns': Campaign, 'adsets': AdSet, 'ads': Ad}
+
+NEXT_PAGE_URL = 'https://graph.facebook.com/v6.0/benchmark/edge?page='
+
+
+class RecordedPagesApi:
+    """
+    Stands in for FacebookAdsApi. Serves pages from memory, chained by paging.next
+    """
+
+    def __init__(self, pages: List[Dict[str, Any]]):
+        self.bodies = []
+        for index, page in enumerate(pages):
+            page = dict(page)
+            paging = dict(page.get('paging') or {})
+            paging.pop('next', None)
+            if index < len(pages) - 1:
+                paging['next'] = f'{NEXT_PAGE_URL}{index + 1}'
+            page['paging'] = paging
+            self.bodies.append(json.dumps(page))
+
+    def call(self, method, path, params=None, **kwargs) -> FacebookResponse:
+        index = int(path[len(NEXT_PAGE_URL) :]) if isinstance(path, str) else 0
+        return FacebookResponse(body=self.bodies[index], http_status=200, headers={})
+
+
+def iter_sdk_rows(api: RecordedPagesApi, target_class: type):
+    cursor = Cursor(
+        target_objects_class=target_class,
+        params={},
+        include_summary=False,
+        api=api,
+        node_id='benchmark',
+        endpoint='edge',
+    )
+    return (row.export_all_data() for row in cursor)
+
+
+def iter_raw_rows(api: RecordedPagesApi, target_class: type):
+    request = FacebookRequest(
+        node_id='benchmark', method='GET', endpoint='/edge', api=api, target_class=target_class, api_type='EDGE'
+    )
+    return RawCursor(request)
+
+
+def run_paging(name: str, iter_rows: Callable, api: RecordedPagesApi, target_class: type, repeat: int):
+    best_seconds = None
+    rows_count = 0
+    for _ in range(repeat):
+        start = time.process_time()
+        rows_count = sum(1 for _ in iter_rows(api, target_class))
+        seconds = time.process_time() - start
+        best_seconds = seconds if best_seconds is None else min(best_seconds, seconds)
+
+    return {
+        'iterator': name,
+        'rows': rows_count,
+        'cpu_seconds': round(best_seconds, 4),
+        'rows_per_second': round(rows_count / best_seconds) if best_seconds else None,
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixture', default=None, help='JSON file with a list of recorded response bodies')
+    parser.add_argument('--target', choices=sorted(TARGET_CLASSES), default='insights', help='What pages are of')
+    parser.add_argument('--rows', type=int, default=10000, help='Number of synthetic rows (when no fixture)')
+    parser.add_argument('--page-size', type=int, default=500, help='Rows per synthetic page (when no fixture)')
+    parser.add_argument('--repeat', type=int, default=3, help='Best of this many runs is reported')
+    parser.add_argument('--output', default=None, help='Write JSON results here instead of stdout')
+    args = parser.parse_args(argv)
+
+    if args.fixture:
+        with open(args.fixture, 'rb') as f:
+            pages = json.loads(f.read())
+    else:
+        rows = gen_rows(args.rows)
+        pages = [{'data': rows[i : i + args.page_size]} for i in range(0, len(rows), args.page_size)]
+
+    api = RecordedPagesApi(pages)
+    target_class = TARGET_CLASSES[args.target]
+
+    results = [
+        run_paging('sdk_cursor', iter_sdk_rows, api, target_class, args.repeat),
+        run_paging('raw_cursor', iter_raw_rows, api, target_class, args.repeat),
+    ]
+
+    report = {
+        'pages': len(pages),
+        'target': args.target,
+        # raw paging must hand out exactly what export_all_data did
+        'identical_rows': list(iter_sdk_rows(api, target_class)) == list(iter_raw_rows(api, target_class)),
+        'speedup': round(results[0]['cpu_seconds'] / results[1]['cpu_seconds'], 2)
+        if results[1]['cpu_seconds']
+        else None,
+        'iterators': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+End-to-end Sweep benchmark.
+
+Seeds a synthetic universe into local DynamoDB / Redis stand-ins and runs
+Sweep Builder and Sweep Looper stages against it, one stage at a time
+(each stage fully consumes output of prior stage) so that each stage's
+throughput, storage IO and memory use is measured in isolation.
+
+Celery is replaced with a no-op that only serializes the task message
+the way Celery would, so that we measure our own overhead, not the broker's.
+
+Outputs a JSON document (to stdout or file) meant for tracking regressions across commits.
+"""
+# flake8: noqa: E402
+
+# this must be first import in our entry point
+import common.patch
+
+common.patch.patch_event_loop()
+
+import argparse
+import logging
+import platform
+import resource
+import sys
+import time
+import ujson as json
+
+from typing import Iterable, List, Dict, Any, Callable
+
+from kombu.serialization import dumps as kombu_dumps
+
+from benchmarks.universe import UniverseSpec, reset_tables, seed_entities, seed_job_reports
+from common.celeryapp import get_celery_app
+from common.io_stats import IOStats, BACKEND_DYNAMODB, BACKEND_REDIS
+from common.configure_logging import configure_logging
+from config import build as build_config
+
+logger = logging.getLogger(__name__)
+
+
+class NoopCeleryTask:
+    """
+    Stands in for a Celery task in the oozer.
+
+    Encodes the message payload with the same serializer Celery would use,
+    but does not send it anywhere.
+    """
+
+    def __init__(self, task):
+        self.task = task
+        self.name = getattr(task, 'name', str(task))
+        self.sent_count = 0
+        self.sent_bytes = 0
+
+    def delay(self, *args, **kwargs):
+        _, _, payload = kombu_dumps((args, kwargs, {}), serializer=get_celery_app().conf.task_serializer)
+        self.sent_count += 1
+        self.sent_bytes += len(payload)
+
+
+def _peak_rss_kb() -> int:
+    # on Linux ru_maxrss is in kilobytes (on macOS it's bytes, but we run this in Linux containers)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class StageResult:
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.seconds = 0.0
+        self.io_stats = IOStats()
+        self.peak_rss_kb = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        calls = self.io_stats.calls
+        return {
+            'stage': self.name,
+            'claims': self.count,
+            'seconds': round(self.seconds, 4),
+            'claims_per_second': round(self.count / self.seconds, 2) if self.seconds else None,
+            'dynamodb_calls': calls[BACKEND_DYNAMODB],
+            'redis_calls': calls[BACKEND_REDIS],
+            'dynamodb_calls_per_claim': round(calls[BACKEND_DYNAMODB] / self.count, 4) if self.count else None,
+            'redis_calls_per_claim': round(calls[BACKEND_REDIS] / self.count, 4) if self.count else None,
+            'io_seconds': round(self.io_stats.total_seconds, 4),
+            'io_operations': self.io_stats.to_dict()['operations'],
+            'peak_rss_kb': self.peak_rss_kb,
+        }
+
+
+def run_stage(name: str, results: List[StageResult], fn: Callable[[], Iterable]) -> list:
+    """
+    Fully consumes the iterable produced by fn, measuring the effort.
+    """
+    stage = StageResult(name)
+    output = []
+    start = time.time()
+    with stage.io_stats:
+        for item in fn():
+            output.append(item)
+    stage.seconds = time.time() - start
+    stage.count = len(output)
+    stage.peak_rss_kb = _peak_rss_kb()
+    results.append(stage)
+    logger.warning(f'[benchmark][{name}] {stage.count} claims in {stage.seconds:.2f} seconds')
+    return output
+
+
+def run_sweep_benchmark(spec: UniverseSpec, sweep_id: str, seed: bool = True) -> Dict[str, Any]:
+    from oozer.common.sweep_status_tracker import SweepStatusTracker
+    from oozer.oozer import TaskOozer
+    from oozer.producer import TaskProducer
+    from sweep_builder.expectation_builder.expectations import iter_expectations
+    from sweep_builder.persister import iter_persist_prioritized
+    from sweep_builder.prioritizer.prioritized import iter_prioritized
+    from sweep_builder.reality_inferrer.reality import iter_reality_base
+    from sweep_builder.scorable import iter_scorable
+
+    seeding = {}
+    if seed:
+        start = time.time()
+        reset_tables()
+        seeding['entities'] = seed_entities(spec)
+        seeding['job_reports'] = seed_job_reports(spec)
+        seeding['seconds'] = round(time.time() - start, 4)
+
+    results: List[StageResult] = []
+
+    reality_claims = run_stage('reality', results, iter_reality_base)
+    expectation_claims = run_stage('expectations', results, lambda: iter_expectations(reality_claims))
+    scorable_claims = run_stage('scorable', results, lambda: iter_scorable(expectation_claims))
+    prioritization_claims = run_stage('prioritized', results, lambda: iter_prioritized(scorable_claims))
+    run_stage('persisted', results, lambda: iter_persist_prioritized(sweep_id, prioritization_claims))
+
+    producer = TaskProducer(sweep_id)
+    tasks = run_stage('produced', results, producer.iter_tasks)
+
+    noop_tasks = {}
+
+    def iter_oozed():
+        stop_oozing_time = time.time() + 60 * 60
+        with TaskOozer(sweep_id, SweepStatusTracker(sweep_id), 5, stop_oozing_time) as oozer:
+            for celery_task, job_scope, job_context, score in tasks:
+                noop_task = noop_tasks.setdefault(celery_task, NoopCeleryTask(celery_task))
+                # non-blocking variant. We measure our overhead, not the rate limiter.
+                oozer._ooze_task(noop_task, job_scope, job_context, score)
+                yield job_scope
+
+    run_stage('oozed', results, iter_oozed)
+
+    return {
+        'sweep_id': sweep_id,
+        'commit_id': build_config.COMMIT_ID,
+        'build_id': build_config.BUILD_ID,
+        'python': platform.python_version(),
+        'universe': spec.to_dict(),
+        'seeding': seeding,
+        'stages': [stage.to_dict() for stage in results],
+        'messages': {
+            'count': sum(task.sent_count for task in noop_tasks.values()),
+            'bytes': sum(task.sent_bytes for task in noop_tasks.values()),
+        },
+        'peak_rss_kb': _peak_rss_kb(),
+    }
+
+
+def main(argv: List[str] = None):
+    configure_logging()
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for key, value in UniverseSpec().to_dict().items():
+        parser.add_argument('--' + key.replace('_', '-'), dest=key, type=type(value), default=value)
+    parser.add_argument('--sweep-id', default=f'bench-{int(time.time())}')
+    parser.add_argument('--no-seed', dest='seed_universe', action='store_false', help='Reuse previously seeded data')
+    parser.add_argument('--output', default=None, help='Write JSON results here instead of stdout')
+    args = vars(parser.parse_args(argv))
+
+    sweep_id = args.pop('sweep_id')
+    seed_universe = args.pop('seed_universe')
+    output = args.pop('output')
+
+    report = run_sweep_benchmark(UniverseSpec(**args), sweep_id, seed=seed_universe)
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Generator of a synthetic "universe" of Scopes, AdAccounts, their entities
+and prior collection history (JobReport records).
+
+Seeded into whatever DynamoDB our models are pointed at, so that Sweep Builder
+code can be ran against it as if it was a real universe.
+"""
+import random
+
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from typing import Dict, Any
+
+from common.enums.failure_bucket import FailureBucket
+from common.store.base import BaseMeta
+from common.store.entities import AdAccountEntity, CampaignEntity, AdsetEntity, AdEntity
+from common.store.jobreport import JobReport
+from common.store.scope import AssetScope, PlatformToken
+from common.tztools import now
+
+TIMEZONES = ['America/Los_Angeles', 'America/New_York', 'Europe/London', 'Asia/Tokyo']
+
+
+class UniverseSpec:
+    """
+    Describes the shape of the synthetic universe
+    """
+
+    scopes: int = 1
+    accounts_per_scope: int = 2
+    campaigns_per_account: int = 5
+    adsets_per_campaign: int = 4
+    ads_per_adset: int = 10
+
+    # Beginning of Life of entities is picked uniformly from this many days back
+    max_bol_days_back: int = 90
+    # ratio of entities that already ended their life and, for those,
+    # how many days back (uniform) their End of Life was
+    eol_ratio: float = 0.5
+    max_eol_days_back: int = 60
+
+    # ratio of jobs that have some collection history
+    # and, of those, ratio that failed last time around
+    job_report_ratio: float = 0.8
+    job_report_failure_ratio: float = 0.1
+
+    seed: int = 42
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            if not hasattr(self, key):
+                raise ValueError(f'Unknown universe spec attribute "{key}"')
+            setattr(self, key, type(getattr(self, key))(value))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: getattr(self, key) for key in UniverseSpec.__annotations__}
+
+    @property
+    def total_accounts(self) -> int:
+        return self.scopes * self.accounts_per_scope
+
+    @property
+    def total_ads(self) -> int:
+        return self.total_accounts * self.campaigns_per_account * self.adsets_per_campaign * self.ads_per_adset
+
+
+def _gen_life(rnd: random.Random, spec: UniverseSpec, reference_dt: datetime) -> Dict[str, datetime]:
+    bol = reference_dt - timedelta(days=rnd.randint(0, spec.max_bol_days_back))
+    life = {'bol': bol}
+    if rnd.random() < spec.eol_ratio:
+        eol = reference_dt - timedelta(days=rnd.randint(0, spec.max_eol_days_back))
+        life['eol'] = max(bol, eol)
+    return life
+
+
+def reset_tables():
+    """
+    Drops and recreates all our tables.
+    """
+    if BaseMeta.host is None:
+        raise ValueError('DynamoDB host config not set. Refusing to wipe what could be production tables.')
+
+    from common.store.sync_schema import sync_schema
+
+    sync_schema(brute_force=True)
+
+
+def seed_entities(spec: UniverseSpec) -> int:
+    """
+    Writes Scopes, tokens, AdAccounts and Campaign, AdSet, Ad entities
+
+    :return: Number of records written
+    """
+    rnd = random.Random(spec.seed)
+    reference_dt = now()
+    cnt = 0
+
+    with ExitStack() as stack:
+        aa_batch = stack.enter_context(AdAccountEntity.batch_write())
+        c_batch = stack.enter_context(CampaignEntity.batch_write())
+        as_batch = stack.enter_context(AdsetEntity.batch_write())
+        a_batch = stack.enter_context(AdEntity.batch_write())
+
+        for scope_index in range(spec.scopes):
+            scope_id = f'bench-scope-{scope_index}'
+            PlatformToken.upsert(scope_id, token=f'bench-token-{scope_index}')
+            AssetScope.upsert(scope_id, platform_token_ids={scope_id})
+            cnt += 2
+
+            for aa_index in range(spec.accounts_per_scope):
+                ad_account_id = f'{scope_index}{aa_index:05d}'
+                aa_batch.upsert(scope_id, ad_account_id, is_active=True, timezone=rnd.choice(TIMEZONES))
+                cnt += 1
+
+                for c_index in range(spec.campaigns_per_account):
+                    campaign_id = f'{ad_account_id}{c_index:04d}'
+                    c_batch.upsert(ad_account_id, campaign_id, **_gen_life(rnd, spec, reference_dt))
+                    cnt += 1
+
+                    for as_index in range(spec.adsets_per_campaign):
+                        adset_id = f'{campaign_id}{as_index:04d}'
+                        as_batch.upsert(
+                            ad_account_id, adset_id, campaign_id=campaign_id, **_gen_life(rnd, spec, reference_dt)
+                        )
+                        cnt += 1
+
+                        for a_index in range(spec.ads_per_adset):
+                            ad_id = f'{adset_id}{a_index:04d}'
+                            a_batch.upsert(
+                                ad_account_id,
+                                ad_id,
+                                campaign_id=campaign_id,
+                                adset_id=adset_id,
+                                **_gen_life(rnd, spec, reference_dt),
+                            )
+                            cnt += 1
+
+    return cnt
+
+
+def seed_job_reports(spec: UniverseSpec) -> int:
+    """
+    Writes JobReport records for some portion of jobs Sweep Builder would
+    generate for the seeded universe, so that scoring sees realistic histories.
+
+    Must be ran after seed_entities.
+
+    :return: Number of records written
+    """
+    from sweep_builder.expectation_builder.expectations import iter_expectations
+    from sweep_builder.reality_inferrer.reality import iter_reality_base
+
+    rnd = random.Random(spec.seed)
+    reference_dt = now()
+    cnt = 0
+
+    with JobReport.batch_write() as batch:
+        for expectation_claim in iter_expectations(iter_reality_base()):
+            if rnd.random() >= spec.job_report_ratio:
+                continue
+
+            data = dict(
+                last_success_dt=reference_dt - timedelta(hours=rnd.randint(1, 24 * 30)),
+                last_total_running_time=rnd.randint(1, 600),
+                last_total_datapoint_count=rnd.randint(0, 10000),
+                fails_in_row=0,
+            )
+            if rnd.random() < spec.job_report_failure_ratio:
+                data.update(
+                    last_failure_dt=reference_dt - timedelta(hours=rnd.randint(1, 24)),
+                    last_failure_bucket=rnd.choice([FailureBucket.Other, FailureBucket.UserThrottling]),
+                    fails_in_row=rnd.randint(1, 3),
+                )
+
+            batch.upsert_deduped(expectation_claim.job_id, **data)
+            cnt += 1
+
+    return cnt
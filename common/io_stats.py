@@ -0,0 +1,126 @@
+"""
+Opt-in accounting of calls we make to our own storage backends (DynamoDB, Redis).
+
+Our code talks to DynamoDB through PynamoDB and to Redis through redis-py-cluster,
+in dozens of places, with no single choke point we own. Instead of sprinkling
+counters all over the code, we temporarily wrap the lowest common call
+of each client library and keep tallies of calls and time spent in them.
+
+This is not meant to be left on in production workers. It's used by
+benchmarks and profiling code that wants to know "how many IO hits per claim"
+and "how much of this stage was waiting on IO".
+
+Example::
+
+    with IOStats() as io_stats:
+        do_something()
+
+    io_stats.calls  # {'dynamodb': 12, 'redis': 340}
+    io_stats.seconds  # {'dynamodb': 0.12, 'redis': 0.3}
+    io_stats.operations  # {('dynamodb', 'Query'): 4, ('redis', 'ZADD'): 30, ...}
+"""
+import functools
+import time
+
+from collections import defaultdict
+from typing import Dict, Tuple, List
+
+from gevent import getcurrent
+
+BACKEND_DYNAMODB = 'dynamodb'
+BACKEND_REDIS = 'redis'
+
+# Stack of currently active IOStats instances.
+# Calls are attributed to *all* active instances,
+# so nested accounting (sweep total + per stage) works.
+_active_stats: List['IOStats'] = []
+_original_methods: Dict[Tuple[type, str], callable] = {}
+
+
+def _record(backend: str, operation: str, seconds: float):
+    greenlet = getcurrent()
+    for io_stats in _active_stats:
+        if io_stats.greenlet is None or io_stats.greenlet is greenlet:
+            io_stats.record(backend, operation, seconds)
+
+
+def _wrap_method(cls: type, method_name: str, backend: str, extract_operation_name):
+    original = getattr(cls, method_name)
+    _original_methods[(cls, method_name)] = original
+
+    @functools.wraps(original)
+    def wrapper(self, *args, **kwargs):
+        start = time.time()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            _record(backend, extract_operation_name(*args), time.time() - start)
+
+    setattr(cls, method_name, wrapper)
+
+
+def _install_hooks():
+    from pynamodb.connection.base import Connection
+    from rediscluster.client import StrictRedisCluster
+    from rediscluster.pipeline import StrictClusterPipeline
+
+    # Every PynamoDB operation (get, query, update_item, batch_write_item...)
+    # goes through this one method with operation name as first arg
+    _wrap_method(Connection, 'dispatch', BACKEND_DYNAMODB, lambda operation_name, *args: operation_name)
+    # pipeline is a subclass of RedisCluster but overrides execute_command
+    # to just queue up commands. We want to count the round trip (execute) only.
+    _wrap_method(
+        StrictRedisCluster, 'execute_command', BACKEND_REDIS, lambda *args: str(args[0]).upper() if args else ''
+    )
+    _wrap_method(StrictClusterPipeline, 'execute', BACKEND_REDIS, lambda *args: 'PIPELINE')
+
+
+def _uninstall_hooks():
+    for (cls, method_name), original in _original_methods.items():
+        setattr(cls, method_name, original)
+    _original_methods.clear()
+
+
+class IOStats:
+    """
+    Context manager that tallies DynamoDB and Redis calls made while it's active
+
+    With current_greenlet_only, calls made by other greenlets in the meantime are not counted.
+    """
+
+    def __init__(self, current_greenlet_only: bool = False):
+        self.greenlet = getcurrent() if current_greenlet_only else None
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.operations: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def record(self, backend: str, operation: str, seconds: float):
+        self.calls[backend] += 1
+        self.seconds[backend] += seconds
+        self.operations[(backend, operation)] += 1
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(self.seconds.values())
+
+    def to_dict(self) -> Dict[str, Dict]:
+        return {
+            'calls': dict(self.calls),
+            'seconds': dict(self.seconds),
+            'operations': {f'{backend}.{operation}': cnt for (backend, operation), cnt in self.operations.items()},
+        }
+
+    def __enter__(self) -> 'IOStats':
+        if not _active_stats:
+            _install_hooks()
+        _active_stats.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _active_stats.remove(self)
+        if not _active_stats:
+            _uninstall_hooks()
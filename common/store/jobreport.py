@@ -206,6 +206,10 @@ class JobReport(BaseModel, MemoizeMixin):
     last_partial_running_time = attributes.NumberAttribute(null=True, attr_name='prt')
     last_partial_datapoint_count = attributes.NumberAttribute(null=True, attr_name='pdc')
 
+    # day-breakdown reports only. See oozer.common.day_finality
+    last_content_hash = attributes.UnicodeAttribute(null=True, attr_name='ch')
+    final_dt = attributes.UTCDateTimeAttribute(null=True, attr_name='fndt')
+
     fails_in_row = attributes.NumberAttribute(attr_name='fir')
 
 
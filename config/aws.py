@@ -13,6 +13,23 @@ S3_BUCKET_RAW_NAME = 'operam-metrics-reports-raw'
 The bucket name where we push our report files
 """
 
+# Cold storage payload encoding (see oozer.common.cold_storage.codec)
+# Format: 'json' (one array) or 'ndjson' (datum per line)
+S3_PAYLOAD_FORMAT = 'json'
+# Compression: '' (none), 'gzip' or 'zstd'
+S3_PAYLOAD_COMPRESSION = ''
+S3_PAYLOAD_COMPRESSION_LEVEL = 6
+
+# Spooling store handlers cut chunks at this many bytes of (uncompressed) payload,
+# buffering them in temp files in this directory (system default when None).
+S3_SPOOL_CHUNK_BYTES = 4 * 1024 * 1024
+S3_SPOOL_DIR = None
+
+# Chunks of job data are uploaded in the background by this many uploaders per worker process,
+# with at most this many bytes of encoded chunks waiting for / in upload at any time.
+S3_UPLOAD_CONCURRENCY = 8
+S3_UPLOAD_MAX_BYTES_IN_FLIGHT = 64 * 1024 * 1024
+
 from common.updatefromenv import update_from_env
 
 update_from_env(__name__)
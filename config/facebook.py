@@ -13,6 +13,49 @@ PAGE_POST = None
 INSIGHTS_MAX_POLLING_INTERVAL = 16
 INSIGHTS_MIN_POLLING_INTERVAL = 0.5
 
+# Facebook API sessions (and their keep-alive HTTP connections) are reused across jobs, per token.
+SESSION_POOL_ENABLED = True
+# max number of tokens with a pooled session
+SESSION_POOL_MAX_SIZE = 200
+# seconds of not being used after which a session is closed
+SESSION_POOL_IDLE_TIMEOUT = 300
+# HTTP connections to keep open per host per session. Matches max gevent concurrency of a worker.
+SESSION_POOL_CONNECTIONS_PER_HOST = 100
+
+# When on, page size for entity collection adapts per parent (ad account, page) and entity type,
+# starting from the static default. See oozer.common.adaptive_page_size
+ADAPTIVE_PAGE_SIZE_ENABLED = False
+ADAPTIVE_PAGE_SIZE_MIN = 10
+ADAPTIVE_PAGE_SIZE_MAX = 1000
+# pages taking longer than this shrink the page size
+ADAPTIVE_PAGE_SIZE_SLOW_SECONDS = 20
+# full pages coming back faster than this grow the page size
+ADAPTIVE_PAGE_SIZE_FAST_SECONDS = 3
+# learned page size is forgotten after this many seconds without change
+ADAPTIVE_PAGE_SIZE_TTL = 30 * 24 * 60 * 60
+
+# When on, entities and insights rows are parsed from Graph API responses straight into dicts,
+# without going through SDK objects. See oozer.common.raw_paging
+RAW_PAGING_ENABLED = False
+
+# When on, insights reports expected to have at most INSIGHTS_SYNC_MAX_ROWS rows (per size
+# of the report last time, or a guess from report type) are read inline, without async report run.
+INSIGHTS_SYNC_ENABLED = False
+INSIGHTS_SYNC_MAX_ROWS = 200
+
+# When on, collection tasks only submit async insights reports and hand them over
+# to central report run poller (`app.py start insights_poller`), which downloads them when done.
+INSIGHTS_CENTRAL_POLLING_ENABLED = False
+# seconds between poller passes over outstanding report runs
+INSIGHTS_POLLER_INTERVAL = 1
+# report run statuses read per Graph API request
+INSIGHTS_POLLER_BATCH_SIZE = 50
+# report runs not done after this many seconds are given up on
+INSIGHTS_REPORT_RUN_MAX_AGE = 3 * 60 * 60
+
+# Graph API base URL override (for fake Graph API servers). None means SDK default.
+GRAPH_URL = None
+
 from common.updatefromenv import update_from_env
 
 update_from_env(__name__)
@@ -28,10 +28,101 @@ REPORT_TYPE_ENTITY_COMMENTS_FREQUENCY = 6
 # Selector Parameters
 FAILS_IN_ROW_BREAKDOWN_LIMIT = 5
 TASK_BREAKDOWN_ENABLED = False
+# When on, divisible jobs are broken down into jobs per child entities (Campaigns, then AdSets) ahead of time,
+# when they are predicted, going by their last runs, to yield more than TASK_BREAKDOWN_MAX_DATAPOINTS rows
+# or to run longer than TASK_BREAKDOWN_MAX_RUNNING_TIME seconds. Broken down jobs are merged back once
+# their child jobs together come under TASK_BREAKDOWN_MERGE_LOAD of these limits.
+TASK_BREAKDOWN_PREDICTIVE_ENABLED = False
+TASK_BREAKDOWN_MAX_DATAPOINTS = 50000
+TASK_BREAKDOWN_MAX_RUNNING_TIME = 30 * 60
+TASK_BREAKDOWN_MERGE_LOAD = 0.5
+
+# Entity collection
+# When on, Campaigns, AdSets and Ads whose EntityHash did not change since last collection
+# are not written to cold storage again, nor fed back. Hashes are forgotten ENTITY_HASH_TTL seconds
+# after first written, so all entities are written out again at least that often.
+ENTITY_CHANGE_DETECTION_ENABLED = False
+ENTITY_HASH_TTL = 7 * 24 * 60 * 60
+# When on, Campaigns, AdSets and Ads are collected incrementally: only those updated since
+# the high-water updated_time of last successful collection (less ENTITY_INCREMENTAL_OVERLAP seconds,
+# to not miss updates landing out of order) are asked for. Once ENTITY_FULL_COLLECTION_INTERVAL seconds
+# pass since last full collection, all entities are collected again, so that deletions are reflected too.
+ENTITY_INCREMENTAL_COLLECTION_ENABLED = False
+ENTITY_FULL_COLLECTION_INTERVAL = 24 * 60 * 60
+ENTITY_INCREMENTAL_OVERLAP = 15 * 60
+ENTITY_WATERMARK_TTL = 7 * 24 * 60 * 60
+# Collected entities are fed back in messages of up to ENTITY_FEEDBACK_BATCH_SIZE trimmed entities.
+# Each message is applied with up to ENTITY_FEEDBACK_CONCURRENCY DynamoDB writes in flight,
+# and writes rejected for exceeding provisioned throughput are retried with backoff.
+ENTITY_FEEDBACK_BATCH_SIZE = 500
+ENTITY_FEEDBACK_CONCURRENCY = 10
+ENTITY_FEEDBACK_THROUGHPUT_RETRIES = 3
+ENTITY_FEEDBACK_THROUGHPUT_BACKOFF = 0.5
+# When on, Campaign entities job collects AdSets and Ads of the AdAccount too, in one pass over Campaigns
+# with AdSets and their Ads expanded in place (nested field expansion), up to ENTITY_HIERARCHY_*_LIMIT
+# of each per page (per parent). Separate AdSet and Ad entities jobs are not expected then.
+# Such collection is always a full one. If FB finds nested pages too large, the job falls back
+# to paging Campaigns, AdSets and Ads one after another.
+ENTITY_HIERARCHICAL_COLLECTION_ENABLED = False
+ENTITY_HIERARCHY_CAMPAIGN_LIMIT = 10
+ENTITY_HIERARCHY_ADSET_LIMIT = 25
+ENTITY_HIERARCHY_AD_LIMIT = 50
+# When on, PagePosts entities job collects first PAGE_POST_INLINE_COMMENTS_LIMIT Comments of each PagePost inline,
+# along with their total count. Per-PagePost Comments jobs are expected only for PagePosts with more Comments than that,
+# whose count of Comments changed since last PagePosts collection. Counts are forgotten
+# PAGE_POST_COMMENT_COUNTS_TTL seconds after last written.
+PAGE_POST_INLINE_COMMENTS_ENABLED = False
+PAGE_POST_INLINE_COMMENTS_LIMIT = 25
+PAGE_POST_COMMENT_COUNTS_TTL = 30 * 24 * 60 * 60
+
+# Day-breakdown insights coalescing
+# When on, per-AdAccount day-breakdown insights jobs for adjacent days that were small last time
+# they were collected are queued as one multi-day job of up to DAY_RANGE_COALESCING_MAX_DAYS days
+# and DAY_RANGE_COALESCING_MAX_DATAPOINTS rows (by last collection). Outcome of the multi-day job
+# is recorded on JobReport of each of the days, so scoring of day jobs is not affected.
+DAY_RANGE_COALESCING_ENABLED = False
+DAY_RANGE_COALESCING_MAX_DAYS = 30
+DAY_RANGE_COALESCING_MAX_DATAPOINTS = 5000
+
+# Day-breakdown insights finality
+# When on, a reporting day of per-AdAccount day-breakdown insights is marked final once it was collected
+# more than DAY_REPORT_ATTRIBUTION_WINDOW_DAYS days after it, twice in a row, with same content.
+# Final days are not expected (collected) any more, unless AdAccount's refresh_if_older_than is set
+# past the time they were marked final at. Days are forgotten DAY_REPORT_FINALITY_TTL seconds after
+# last day of the report was marked final.
+DAY_REPORT_FINALITY_ENABLED = False
+DAY_REPORT_ATTRIBUTION_WINDOW_DAYS = 28
+DAY_REPORT_FINALITY_TTL = 90 * 24 * 60 * 60
+
+# Delivery-aware lifetime insights
+# When on, per-AdAccount day insights at Ad level note Campaigns, AdSets and Ads delivering in last
+# LIFETIME_DELIVERY_RECENT_DAYS days, and per-AdAccount lifetime insights are asked only for entities
+# seen delivering since lifetime insights were last collected (less LIFETIME_DELIVERY_OVERLAP seconds),
+# as long as there are at most LIFETIME_DELIVERY_AWARE_MAX_ENTITIES of them. Once
+# LIFETIME_FULL_COLLECTION_INTERVAL seconds pass since last full collection, all entities are collected again.
+LIFETIME_DELIVERY_AWARE_ENABLED = False
+LIFETIME_DELIVERY_RECENT_DAYS = 2
+LIFETIME_DELIVERY_OVERLAP = 60 * 60
+LIFETIME_DELIVERY_AWARE_MAX_ENTITIES = 1000
+LIFETIME_FULL_COLLECTION_INTERVAL = 24 * 60 * 60
+LIFETIME_DELIVERY_TTL = 7 * 24 * 60 * 60
+
+# Organic insights batching
+# When on, per-entity lifetime insights jobs of PagePosts (and of PageVideos) of a Page are batched into jobs
+# of up to ORGANIC_INSIGHTS_BATCH_SIZE entities, with insights of all of them read in one request (ids=...).
+# Outcome of a batch is recorded on JobReport of each of its entities. Entities that failed last time are not batched.
+ORGANIC_INSIGHTS_BATCHING_ENABLED = False
+ORGANIC_INSIGHTS_BATCH_SIZE = 50
 
 # Ad account sourcing
 AD_ACCOUNT_IMPORT_DISABLED = False
 PAGE_IMPORT_DISABLED = False
+# When on, access to imported AdAccounts and Pages is tested with multiple ID reads of up to
+# CONSOLE_IMPORT_ACCESS_CHECK_BATCH_SIZE entities (per access token), and tests and DynamoDB writes
+# are done CONSOLE_IMPORT_CONCURRENCY at a time.
+CONSOLE_IMPORT_CONCURRENCY_ENABLED = False
+CONSOLE_IMPORT_CONCURRENCY = 10
+CONSOLE_IMPORT_ACCESS_CHECK_BATCH_SIZE = 50
 
 # actual entity jobs:
 ENTITY_AA_DISABLED = False
@@ -78,6 +169,10 @@ from common.updatefromenv import update_from_env
 update_from_env(__name__)
 
 # and here we post-process the values, by applying group
+if ENTITY_HIERARCHICAL_COLLECTION_ENABLED:
+    # collected along with Campaigns
+    ENTITY_AS_DISABLED = ENTITY_A_DISABLED = True
+
 if ENTITY_ALL_DISABLED:
     ENTITY_C_DISABLED = ENTITY_AS_DISABLED = ENTITY_A_DISABLED = ENTITY_AC_DISABLED = ENTITY_AV_DISABLED = True
     ENTITY_CA_DISABLED = ENTITY_AA_DISABLED = ENTITY_P_DISABLED = ENTITY_PP_DISABLED = ENTITY_CM_DISABLED = True
@@ -11,6 +11,24 @@ OOZER_REVIEW_INTERVAL = 10
 OOZER_START_RATE = 100.0
 OOZER_MIN_RATE = 10.0
 
+# "Dire singles until wholesale" (see docs/job-queuing.md)
+# When on, per-entity insights jobs (from task breakdown) are not let out any more
+# once the per-AdAccount job they are part of was let out in the same sweep.
+WHOLESALE_DEDUP_ENABLED = False
+# "...or speculative tail" variant. When above is on and this is above zero, per-AdAccount job is not
+# let out either when no more than this many of its per-entity jobs are left to be let out.
+WHOLESALE_DEDUP_SPECULATIVE_TAIL = 0
+
+# In-sweep retries of throttled jobs (see oozer/common/throttled_retries.py)
+# When on, jobs failing on throttling are retried within the sweep, up to THROTTLED_RETRY_BUDGET times each,
+# after a backoff per kind of throttling (doubling with each retry), unless they would have to wait
+# longer than THROTTLED_RETRY_MAX_DELAY seconds. Due retries are checked for every
+# THROTTLED_RETRY_CHECK_INTERVAL seconds and let out ahead of new jobs, and as they fall due once there are no new jobs.
+THROTTLED_RETRY_ENABLED = False
+THROTTLED_RETRY_BUDGET = 2
+THROTTLED_RETRY_MAX_DELAY = 5 * 60
+THROTTLED_RETRY_CHECK_INTERVAL = 5
+
 # Hour, DMA, AgeGender * about 2 years back + 3 levels of lifetime + 3 levels of Entities
 _number_of_long_tasks_per_aa = 3 * 600 + 3 + 3
 
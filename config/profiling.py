@@ -0,0 +1,17 @@
+# flake8: noqa: E722
+
+# Opt-in profiling of Sweep Builder pipeline stages.
+# Adds a few clock reads per claim per stage, so keep off unless investigating.
+PIPELINE_ENABLED = False
+
+# Sampled (folded stacks) flamegraph of the pipeline code.
+# Only in effect when PIPELINE_ENABLED is on.
+FLAMEGRAPH_ENABLED = False
+FLAMEGRAPH_SAMPLE_INTERVAL = 0.005  # seconds of CPU time between samples
+
+# Where per-sweep summary (JSON) and flamegraph (folded stacks) files are written
+OUTPUT_DIR = '/tmp/pipeline-profiles'
+
+from common.updatefromenv import update_from_env
+
+update_from_env(__name__)
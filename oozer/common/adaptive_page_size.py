@@ -0,0 +1,138 @@
+"""
+Page size for entity collection learned per parent object (ad account, page) and entity type.
+
+Static default page sizes are a compromise. Accounts with heavy targeting specs
+need smaller pages to not trip "Please reduce the amount of data you're asking for",
+while light accounts could page through much faster with bigger pages.
+
+Here page size starts at the static default and then:
+ - halves when FB says there is too much data (and the page is retried),
+ - shrinks when a page takes too long to come back,
+ - grows when full pages come back fast.
+Learned value is kept in Redis, so next sweep starts where this one ended.
+"""
+import logging
+import time
+
+from typing import Any, Callable, Dict, Generator, List, Union
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from facebook_business.api import Cursor
+from facebook_business.exceptions import FacebookRequestError
+
+from common.connect.redis import get_redis
+from common.enums.failure_bucket import FailureBucket
+from common.measurement import Measure
+from config import facebook as facebook_config
+from oozer.common.facebook_api import FacebookApiErrorInspector
+from oozer.common.raw_paging import RawCursor
+
+logger = logging.getLogger(__name__)
+
+SHRINK_ON_ERROR_FACTOR = 0.5
+SHRINK_ON_SLOW_FACTOR = 0.75
+GROW_FACTOR = 1.25
+
+
+class AdaptivePageSize:
+    def __init__(self, parent_id: str, entity_type: str, default_page_size: int):
+        self.parent_id = parent_id
+        self.entity_type = entity_type
+        self.default_page_size = default_page_size
+        self.redis = get_redis()
+
+        stored = self.redis.get(self._key)
+        self.page_size = self._clamp(int(stored) if stored else default_page_size)
+        self._initial_page_size = self.page_size
+
+    @property
+    def _key(self) -> str:
+        return f'{self.parent_id}:{self.entity_type}:{self.__class__.__name__}'
+
+    @staticmethod
+    def _clamp(page_size: float) -> int:
+        return int(max(facebook_config.ADAPTIVE_PAGE_SIZE_MIN, min(facebook_config.ADAPTIVE_PAGE_SIZE_MAX, page_size)))
+
+    def _resize(self, factor: float, reason: str) -> bool:
+        page_size = self._clamp(self.page_size * factor)
+        if page_size == self.page_size:
+            return False
+        logger.info(f'Page size for {self.entity_type} of {self.parent_id} {reason}: {self.page_size} > {page_size}')
+        Measure.increment(f'{__name__}.resized', tags={'entity_type': self.entity_type, 'reason': reason})(1)
+        self.page_size = page_size
+        return True
+
+    def shrink_on_error(self) -> bool:
+        """
+        :return: Whether it was possible to shrink the page size (and retry makes sense)
+        """
+        return self._resize(SHRINK_ON_ERROR_FACTOR, 'too_large')
+
+    def record_page(self, seconds: float, count: int):
+        if seconds > facebook_config.ADAPTIVE_PAGE_SIZE_SLOW_SECONDS:
+            self._resize(SHRINK_ON_SLOW_FACTOR, 'slow')
+        elif seconds < facebook_config.ADAPTIVE_PAGE_SIZE_FAST_SECONDS and count >= self.page_size:
+            # only full pages tell us bigger ones would be worth it
+            self._resize(GROW_FACTOR, 'fast')
+
+    def save(self):
+        Measure.gauge(f'{__name__}.page_size', tags={'entity_type': self.entity_type})(self.page_size)
+        if self.page_size != self._initial_page_size:
+            self.redis.set(self._key, self.page_size, ex=facebook_config.ADAPTIVE_PAGE_SIZE_TTL)
+            self._initial_page_size = self.page_size
+
+
+def _is_too_much_data(ex: FacebookRequestError) -> bool:
+    _, failure_bucket = FacebookApiErrorInspector(ex).get_status_and_bucket()
+    return failure_bucket == FailureBucket.TooLarge
+
+
+def _set_cursor_page_size(cursor: Union[Cursor, RawCursor], page_size: int):
+    cursor.params['limit'] = page_size
+    # After first page, SDK's Cursor requests "next" URL from paging data, which carries its own limit.
+    if isinstance(cursor._path, str):
+        parts = urlsplit(cursor._path)
+        query = [(k, str(page_size) if k == 'limit' else v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+        cursor._path = urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def iter_adaptively(
+    getter_method: Callable, fields: List[str], params: Dict[str, Any], page_sizer: AdaptivePageSize
+) -> Generator[Any, None, None]:
+    """
+    Pages through an edge adjusting page size between pages per page_sizer
+
+    :param getter_method: SDK edge getter (like AdAccount.get_campaigns) or a custom one.
+        Custom getters that don't return SDK's Cursor (or RawCursor) are iterated as is.
+    """
+    cursor = None
+    try:
+        while True:
+            start = time.time()
+            try:
+                if cursor is None:
+                    # SDK reads first page right away
+                    cursor = getter_method(fields=fields, params={**params, 'limit': page_sizer.page_size})
+                    if not isinstance(cursor, (Cursor, RawCursor)):
+                        yield from cursor
+                        return
+                    has_data = len(cursor) > 0 or cursor.load_next_page()
+                else:
+                    has_data = cursor.load_next_page()
+            except FacebookRequestError as ex:
+                if not _is_too_much_data(ex) or not page_sizer.shrink_on_error():
+                    raise
+                if cursor is not None:
+                    _set_cursor_page_size(cursor, page_sizer.page_size)
+                continue
+
+            if not has_data:
+                return
+
+            page_sizer.record_page(time.time() - start, len(cursor))
+            _set_cursor_page_size(cursor, page_sizer.page_size)
+
+            for _ in range(len(cursor)):
+                yield next(cursor)
+    finally:
+        page_sizer.save()
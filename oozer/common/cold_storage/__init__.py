@@ -1,4 +1,4 @@
 # flake8: noqa: F401
 
 from oozer.common.cold_storage.base_store import store  # for backward compat
-from oozer.common.cold_storage.batch_store import ChunkDumpStore
+from oozer.common.cold_storage.batch_store import ChunkDumpStore, SpoolingChunkStore
@@ -15,7 +15,7 @@ Example:
 s3://operam-reports/facebook/2d700d-1629501014003404/fb_insights_campaign_daily/2018/02/08/2018-02-08T11:00:00Z-aef8b404-68c7-41f0-a82b-8f7d529d049c.json  # noqa
 
 """
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, BinaryIO, Union
 
 import boto3
 import xxhash
@@ -23,17 +23,6 @@ import io
 import logging
 import uuid
 
-# ujson is faster for massive amounts of small data units
-# which is actually the pattern we have - yielding small datum per normative
-# task or small batches of small datums.
-# Biggest problem (for us) with ujson is its handling of very very large numbers
-# However, since this code base is dealing with facebook and they committed to
-# sending very large numbers as strings, as long as we do NOT convert
-# super large (massive spend, or Entity IDs) from stringified form to longs
-# we should be fine (and substantially faster on shoving data out us).
-# http://artem.krylysov.com/blog/2015/09/29/benchmark-python-json-libraries/
-import ujson as json
-
 from datetime import date, datetime, timezone
 from facebook_business.api import FacebookAdsApi
 from common.measurement import Measure
@@ -41,6 +30,8 @@ from common.measurement import Measure
 import config.aws
 import config.build
 import common.tztools
+from oozer.common.cold_storage import codec
+from oozer.common.cold_storage.uploader import UploadBatch, get_upload_pool
 from oozer.common.enum import ColdStoreBucketType
 
 from oozer.common.job_scope import JobScope
@@ -189,19 +180,91 @@ def store(
     :param custom_namespace: Defines custom job namespace
     :return string: The key used to store the data
     """
-    key = _job_scope_to_storage_key(job_scope, chunk_marker, custom_namespace)
+    put_object_kwargs = _encode(data, job_scope, chunk_marker, custom_namespace)
+    get_bucket_by_type(bucket_type).put_object(**put_object_kwargs)
+    return put_object_kwargs['Key']
+
+
+def store_async(
+    data: Any,
+    job_scope: JobScope,
+    chunk_marker: Optional[int] = DEFAULT_CHUNK_NUMBER,
+    bucket_type: str = ColdStoreBucketType.ORIGINAL_BUCKET,
+    custom_namespace: str = None,
+    batch: UploadBatch = None,
+) -> str:
+    """
+    Same as `store`, except the upload happens in the background.
+
+    Returns as soon as the data is encoded and queued for upload
+    (may block if too much data is already queued up).
+    Caller must `batch.wait()` before considering the data stored.
+
+    :param batch: Tracker of uploads the caller will wait on
+    :return string: The key the data will be stored under
+    """
+    put_object_kwargs = _encode(data, job_scope, chunk_marker, custom_namespace)
+    get_upload_pool().submit(get_bucket_by_type(bucket_type), put_object_kwargs, batch)
+    return put_object_kwargs['Key']
+
+
+def store_spooled_async(
+    fileobj: BinaryIO,
+    size: int,
+    codec_metadata: Dict[str, str],
+    content_encoding: Optional[str],
+    job_scope: JobScope,
+    chunk_marker: Optional[int] = DEFAULT_CHUNK_NUMBER,
+    bucket_type: str = ColdStoreBucketType.ORIGINAL_BUCKET,
+    custom_namespace: str = None,
+    batch: UploadBatch = None,
+) -> str:
+    """
+    Same as `store_async`, but for payload already encoded (see codec.StreamEncoder)
+    into a file. The file is uploaded from as is and closed once uploaded.
 
+    :param fileobj: Binary file object positioned at the start of the payload
+    :param size: Size of the payload in bytes
+    :return string: The key the data will be stored under
+    """
+    put_object_kwargs = _gen_put_object_kwargs(
+        job_scope, chunk_marker, custom_namespace, fileobj, codec_metadata, content_encoding
+    )
+    get_upload_pool().submit(get_bucket_by_type(bucket_type), put_object_kwargs, batch, size=size)
+    return put_object_kwargs['Key']
+
+
+def _encode(
+    data: Any, job_scope: JobScope, chunk_marker: Optional[int], custom_namespace: Optional[str]
+) -> Dict[str, Any]:
+    """
+    :return: Arguments for bucket.put_object call
+    """
     # per discussion with Mike C, to make Lambda code behind S3 simpler
     # ALL payloads are lists, even those that are single datum.
     if not isinstance(data, (list, tuple, set)):
         data = [data]
 
-    bucket = get_bucket_by_type(bucket_type)
-    bucket.put_object(
-        Key=key, Body=json.dumps(data, ensure_ascii=False).encode(), Metadata=_job_scope_to_metadata(job_scope)
-    )
+    body, codec_metadata, content_encoding = codec.encode(list(data))
+    return _gen_put_object_kwargs(job_scope, chunk_marker, custom_namespace, body, codec_metadata, content_encoding)
 
-    return key
+
+def _gen_put_object_kwargs(
+    job_scope: JobScope,
+    chunk_marker: Optional[int],
+    custom_namespace: Optional[str],
+    body: Union[bytes, BinaryIO],
+    codec_metadata: Dict[str, str],
+    content_encoding: Optional[str],
+) -> Dict[str, Any]:
+    put_object_kwargs = {
+        'Key': _job_scope_to_storage_key(job_scope, chunk_marker, custom_namespace),
+        'Body': body,
+        'Metadata': {**_job_scope_to_metadata(job_scope), **codec_metadata},
+    }
+    if content_encoding:
+        put_object_kwargs['ContentEncoding'] = content_encoding
+    return put_object_kwargs
 
 
 def load(key):
@@ -212,4 +275,7 @@ def load(key):
 
 
 def load_data(key):
-    return json.load(load(key))
+    """
+    Loads payload stored under the key, regardless of format and compression it was stored with
+    """
+    return codec.decode(load(key).read())
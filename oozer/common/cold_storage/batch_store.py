@@ -1,13 +1,18 @@
 import logging
+import tempfile
 
 from facebook_business.adobjects.adsinsights import AdsInsights
-from typing import Dict, List, Union, Optional, Callable
+from typing import BinaryIO, Dict, List, Union, Optional, Callable
+
+import config.aws
 
 from common.enums.entity import Entity
 from oozer.common.job_scope import JobScope
 from oozer.common.enum import JobStatus, ColdStoreBucketType
 
-from oozer.common.cold_storage.base_store import store, DEFAULT_CHUNK_NUMBER
+from oozer.common.cold_storage import codec
+from oozer.common.cold_storage.base_store import store, store_async, store_spooled_async, DEFAULT_CHUNK_NUMBER
+from oozer.common.cold_storage.uploader import UploadBatch
 
 logger = logging.getLogger(__name__)
 
@@ -54,6 +59,14 @@ class MemorySpoolStore(BaseStoreHandler):
 
 
 class ChunkDumpStore(BaseStoreHandler):
+    """
+    Stores data in chunks of chunk_size items.
+
+    Chunks are uploaded in the background (see uploader module), so that
+    producer of data can keep producing while prior chunks are uploading.
+    All uploads are waited on when the store is closed.
+    """
+
     def __init__(
         self,
         job_scope,
@@ -67,6 +80,17 @@ class ChunkDumpStore(BaseStoreHandler):
         self.chunk_size = chunk_size
         self.bucket_type = bucket_type
         self.custom_namespace = custom_namespace
+        self.uploads = UploadBatch()
+
+    def _store(
+        self,
+        data: List,
+        job_scope: JobScope,
+        chunk_marker: Optional[int] = DEFAULT_CHUNK_NUMBER,
+        bucket_type: str = ColdStoreBucketType.ORIGINAL_BUCKET,
+        custom_namespace: str = None,
+    ) -> str:
+        return store_async(data, job_scope, chunk_marker, bucket_type, custom_namespace, batch=self.uploads)
 
     def store(self, datum):
         self.data.append(datum)
@@ -79,6 +103,86 @@ class ChunkDumpStore(BaseStoreHandler):
         if len(self.data):
             self._store(self.data, self.job_scope, self.chunk_marker, self.bucket_type, self.custom_namespace)
 
+        try:
+            self.uploads.wait()
+        except Exception as ex:
+            if exc_type is None:
+                # so that the job fails
+                raise
+            # Whatever we are unwinding from is more relevant than upload failures.
+            logger.warning(f'Upload failed while handling another exception: {ex}')
+
+
+class SpoolingChunkStore(BaseStoreHandler):
+    """
+    Stores data in chunks of about chunk_bytes bytes.
+
+    Datums are encoded as they come in and spooled into a temp file, so memory use
+    does not depend on size of datums or of the report. Once a chunk grows past
+    chunk_bytes, the file is uploaded (in the background, straight from the file)
+    and a new chunk is started. All uploads are waited on when the store is closed.
+
+    Pass chunk_bytes=0 to never cut chunks and store all data as one object.
+    """
+
+    def __init__(
+        self,
+        job_scope: JobScope,
+        chunk_bytes: int = None,
+        bucket_type: str = ColdStoreBucketType.ORIGINAL_BUCKET,
+        custom_namespace: str = None,
+    ):
+        super().__init__(job_scope)
+        self.chunk_marker = 0
+        self.chunk_bytes = config.aws.S3_SPOOL_CHUNK_BYTES if chunk_bytes is None else chunk_bytes
+        self.bucket_type = bucket_type
+        self.custom_namespace = custom_namespace
+        self.uploads = UploadBatch()
+
+        self._file: Optional[BinaryIO] = None
+        self._encoder: Optional[codec.StreamEncoder] = None
+
+    def _flush_chunk(self):
+        codec_metadata, content_encoding = self._encoder.close()
+        size = self._file.tell()
+        self._file.seek(0)
+        store_spooled_async(
+            self._file,
+            size,
+            codec_metadata,
+            content_encoding,
+            self.job_scope,
+            self.chunk_marker,
+            self.bucket_type,
+            self.custom_namespace,
+            batch=self.uploads,
+        )
+        self.chunk_marker += 1
+        # file is now owned by uploader
+        self._file = self._encoder = None
+
+    def store(self, datum):
+        if self._encoder is None:
+            self._file = tempfile.TemporaryFile(dir=config.aws.S3_SPOOL_DIR)
+            self._encoder = codec.StreamEncoder(self._file)
+
+        self._encoder.write(datum)
+        if self.chunk_bytes and self._encoder.bytes_written >= self.chunk_bytes:
+            self._flush_chunk()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._encoder is not None:
+            self._flush_chunk()
+
+        try:
+            self.uploads.wait()
+        except Exception as ex:
+            if exc_type is None:
+                # so that the job fails
+                raise
+            # Whatever we are unwinding from is more relevant than upload failures.
+            logger.warning(f'Upload failed while handling another exception: {ex}')
+
 
 class NaturallyNormativeChildStore(BaseStoreHandler):
     def __init__(self, job_scope: JobScope, bucket_type: str = ColdStoreBucketType.ORIGINAL_BUCKET):
@@ -0,0 +1,158 @@
+"""
+Encoding of cold storage payloads.
+
+Payload is always a list of datums. It's serialized either as one JSON array
+(FORMAT_JSON, the original format) or as newline-delimited JSON, one datum per line
+(FORMAT_NDJSON), and then optionally compressed (gzip or zstd).
+
+Format and compression are recorded in S3 object metadata and compression
+is also communicated through Content-Encoding header. Decoding does not need either,
+as both are recognized from payload itself (compression by magic bytes, format
+by first character), so objects written with any settings, old or new, load the same.
+"""
+import gzip
+import io
+
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+# ujson is faster for massive amounts of small data units
+# which is actually the pattern we have - yielding small datum per normative
+# task or small batches of small datums.
+# Biggest problem (for us) with ujson is its handling of very very large numbers
+# However, since this code base is dealing with facebook and they committed to
+# sending very large numbers as strings, as long as we do NOT convert
+# super large (massive spend, or Entity IDs) from stringified form to longs
+# we should be fine (and substantially faster on shoving data out us).
+# http://artem.krylysov.com/blog/2015/09/29/benchmark-python-json-libraries/
+import ujson as json
+import zstandard
+
+import config.aws
+
+FORMAT_JSON = 'json'
+FORMAT_NDJSON = 'ndjson'
+
+COMPRESSION_NONE = ''
+COMPRESSION_GZIP = 'gzip'
+COMPRESSION_ZSTD = 'zstd'
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def _serialize(data: List[Any], payload_format: str) -> bytes:
+    if payload_format == FORMAT_NDJSON:
+        return ''.join(json.dumps(datum, ensure_ascii=False) + '\n' for datum in data).encode()
+    if payload_format == FORMAT_JSON:
+        return json.dumps(data, ensure_ascii=False).encode()
+    raise ValueError(f'Unknown payload format "{payload_format}"')
+
+
+def _compress(body: bytes, compression: str, level: int) -> bytes:
+    if compression == COMPRESSION_NONE:
+        return body
+    if compression == COMPRESSION_GZIP:
+        return gzip.compress(body, compresslevel=level)
+    if compression == COMPRESSION_ZSTD:
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    raise ValueError(f'Unknown payload compression "{compression}"')
+
+
+def encode(
+    data: List[Any], payload_format: str = None, compression: str = None, level: int = None
+) -> Tuple[bytes, Dict[str, str], Optional[str]]:
+    """
+    Serializes and compresses payload per config (or arguments, when given)
+
+    :return: Body, metadata to add to the object, Content-Encoding value (None when not compressed)
+    """
+    payload_format = payload_format or config.aws.S3_PAYLOAD_FORMAT
+    compression = config.aws.S3_PAYLOAD_COMPRESSION if compression is None else compression
+    level = config.aws.S3_PAYLOAD_COMPRESSION_LEVEL if level is None else level
+
+    body = _compress(_serialize(data, payload_format), compression, level)
+    return body, _metadata(payload_format, compression), compression or None
+
+
+def _metadata(payload_format: str, compression: str) -> Dict[str, str]:
+    metadata = {'payload_format': payload_format}
+    if compression:
+        metadata['payload_compression'] = compression
+    return metadata
+
+
+class StreamEncoder:
+    """
+    Incremental variant of `encode` for payloads too large to hold in memory.
+
+    Datums are serialized (and compressed) one by one into given binary file object.
+    Produces exactly the same payloads `encode` does.
+    """
+
+    def __init__(self, fileobj: BinaryIO, payload_format: str = None, compression: str = None, level: int = None):
+        self.payload_format = payload_format or config.aws.S3_PAYLOAD_FORMAT
+        self.compression = config.aws.S3_PAYLOAD_COMPRESSION if compression is None else compression
+        level = config.aws.S3_PAYLOAD_COMPRESSION_LEVEL if level is None else level
+
+        if self.payload_format not in (FORMAT_JSON, FORMAT_NDJSON):
+            raise ValueError(f'Unknown payload format "{self.payload_format}"')
+
+        self._compressor = None
+        if self.compression == COMPRESSION_NONE:
+            self._writer = fileobj
+        elif self.compression == COMPRESSION_GZIP:
+            # closing GzipFile does not close fileobj
+            self._writer = self._compressor = gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=level)
+        elif self.compression == COMPRESSION_ZSTD:
+            self._writer = self._compressor = zstandard.ZstdCompressor(level=level).stream_writer(fileobj)
+        else:
+            raise ValueError(f'Unknown payload compression "{self.compression}"')
+
+        self.count = 0
+        # uncompressed
+        self.bytes_written = 0
+
+    def _write(self, data: bytes):
+        self._writer.write(data)
+        self.bytes_written += len(data)
+
+    def write(self, datum: Any):
+        encoded = json.dumps(datum, ensure_ascii=False).encode()
+        if self.payload_format == FORMAT_NDJSON:
+            self._write(encoded + b'\n')
+        else:
+            self._write((b',' if self.count else b'[') + encoded)
+        self.count += 1
+
+    def close(self) -> Tuple[Dict[str, str], Optional[str]]:
+        """
+        Finishes the payload. Does not close the underlying file object.
+
+        :return: Metadata to add to the object, Content-Encoding value (None when not compressed)
+        """
+        if self.payload_format == FORMAT_JSON:
+            self._write(b']' if self.count else b'[]')
+        if self.compression == COMPRESSION_GZIP:
+            self._compressor.close()
+        elif self.compression == COMPRESSION_ZSTD:
+            self._compressor.flush(zstandard.FLUSH_FRAME)
+        return _metadata(self.payload_format, self.compression), self.compression or None
+
+
+def _decompress(body: bytes) -> bytes:
+    if body[:2] == _GZIP_MAGIC:
+        return gzip.decompress(body)
+    if body[:4] == _ZSTD_MAGIC:
+        # Simple one-shot compress() calls record content size in frame header, but be lenient
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    return body
+
+
+def decode(body: bytes) -> List[Any]:
+    """
+    Reverses `encode`, whatever format and compression were used
+    """
+    body = _decompress(body)
+    if body.lstrip()[:1] == b'[':
+        return json.loads(body)
+    return [json.loads(line) for line in io.BytesIO(body) if line.strip()]
@@ -0,0 +1,139 @@
+"""
+Background uploads of encoded chunks to S3.
+
+Collection loops alternate between paging through FB data and pushing chunks
+of it to S3. Done synchronously, the two never overlap and the loop spends as much
+time waiting on S3 as on FB. Here chunks are handed off to a per-process pool of
+uploader greenlets, so the loop can go fetch the next page while prior chunks upload.
+
+To keep memory use in check, total size of chunks accepted but not yet uploaded
+is capped. When the cap is reached, producers block until uploads drain (backpressure).
+
+Each producer (store handler) tracks its own uploads through an UploadBatch
+and must wait on it before declaring the job done. Upload failures are
+re-raised from UploadBatch.wait, so that they still fail the task.
+"""
+import logging
+import time
+
+from typing import Any, List, Dict, Optional
+
+import gevent
+import gevent.event
+import gevent.queue
+
+from common.measurement import Measure
+from config import aws as aws_config
+
+logger = logging.getLogger(__name__)
+
+
+class UploadBatch:
+    """
+    Tracks uploads submitted by one producer
+    """
+
+    def __init__(self):
+        self.pending = 0
+        self.errors: List[Exception] = []
+        self._all_done = gevent.event.Event()
+        self._all_done.set()
+
+    def _add(self):
+        self.pending += 1
+        self._all_done.clear()
+
+    def _done(self, error: Optional[Exception] = None):
+        self.pending -= 1
+        if error is not None:
+            self.errors.append(error)
+        if not self.pending:
+            self._all_done.set()
+
+    def wait(self, timeout: Optional[float] = None):
+        """
+        Blocks until all uploads in this batch are done.
+
+        :raises: First error any of the uploads in this batch failed with
+        :raises TimeoutError: when uploads don't finish in time
+        """
+        if not self._all_done.wait(timeout):
+            raise TimeoutError(f'{self.pending} uploads still pending after {timeout} seconds')
+        if self.errors:
+            raise self.errors[0]
+
+
+class UploadPool:
+    """
+    Bounded queue of encoded chunks drained by a fixed number of uploader greenlets
+    """
+
+    def __init__(self, concurrency: int, max_bytes_in_flight: int):
+        self.concurrency = concurrency
+        self.max_bytes_in_flight = max_bytes_in_flight
+        self.bytes_in_flight = 0
+
+        # Queue bounded by count is a second line of defense, in case of many tiny chunks.
+        self._queue = gevent.queue.Queue(maxsize=concurrency * 2)
+        self._bytes_released = gevent.event.Event()
+        self._workers: List[gevent.Greenlet] = []
+
+    def _ensure_workers(self):
+        self._workers = [worker for worker in self._workers if not worker.dead]
+        while len(self._workers) < self.concurrency:
+            self._workers.append(gevent.spawn(self._work))
+
+    def _work(self):
+        while True:
+            bucket, put_object_kwargs, size, batch = self._queue.get()
+            error = None
+            start = time.time()
+            body = put_object_kwargs['Body']
+            try:
+                bucket.put_object(**put_object_kwargs)
+            except Exception as ex:
+                logger.warning(f'Upload of {put_object_kwargs["Key"]} failed: {ex}')
+                error = ex
+            finally:
+                Measure.timing(f'{__name__}.upload', tags={'success': error is None}, sample_rate=0.01)(
+                    (time.time() - start) * 1000
+                )
+                if not isinstance(body, bytes):
+                    # spooled file. Closing temp file removes it.
+                    body.close()
+                self.bytes_in_flight -= size
+                self._bytes_released.set()
+                batch._done(error)
+
+    def submit(self, bucket, put_object_kwargs: Dict[str, Any], batch: UploadBatch, size: int = None):
+        """
+        Queues the upload. Blocks while too many bytes are already in flight.
+
+        :param bucket: S3 Bucket resource
+        :param put_object_kwargs: Arguments for bucket.put_object call. Must contain Key and Body.
+        :param batch: Tracker of uploads this upload belongs to
+        :param size: Size of the Body, when it's a file object and not bytes
+        """
+        if size is None:
+            size = len(put_object_kwargs['Body'])
+        if self.bytes_in_flight and self.bytes_in_flight + size > self.max_bytes_in_flight:
+            Measure.increment(f'{__name__}.backpressure_waits', sample_rate=0.01)(1)
+            # Single chunk larger than the cap is let through once nothing else is in flight.
+            while self.bytes_in_flight and self.bytes_in_flight + size > self.max_bytes_in_flight:
+                self._bytes_released.clear()
+                self._bytes_released.wait()
+
+        self.bytes_in_flight += size
+        batch._add()
+        self._ensure_workers()
+        self._queue.put((bucket, put_object_kwargs, size, batch))
+
+
+_upload_pool: Optional[UploadPool] = None
+
+
+def get_upload_pool() -> UploadPool:
+    global _upload_pool
+    if _upload_pool is None:
+        _upload_pool = UploadPool(aws_config.S3_UPLOAD_CONCURRENCY, aws_config.S3_UPLOAD_MAX_BYTES_IN_FLIGHT)
+    return _upload_pool
@@ -5,9 +5,18 @@ from config.operam_console_api import URL
 
 
 class ConsoleApi:
+    # HTTP connections to Console are kept alive and reused across requests
+    _session: requests.Session = None
+
+    @classmethod
+    def _get_session(cls) -> requests.Session:
+        if cls._session is None:
+            cls._session = requests.Session()
+        return cls._session
+
     @staticmethod
     def _fetch_parent_entity(platform_type: str, token: str, params: Any):
-        response = requests.get(
+        response = ConsoleApi._get_session().get(
             f'{URL}/api/projects/platform-accounts',
             headers={'x-auth-token': token},
             params={'platform': platform_type, **params},
@@ -0,0 +1,83 @@
+"""
+Finality of day-breakdown insights reports.
+
+FB keeps attributing actions to a reporting day for up to DAY_REPORT_ATTRIBUTION_WINDOW_DAYS
+days after it. Past that, data for the day should not change, yet Sweep Builder keeps
+scheduling the day for collection, with ever smaller but non-zero scores.
+
+A day is considered final (settled) when it was collected past the attribution window
+and content of the report for it came out the same as last time it was collected
+(past the window). Final days of per-AdAccount day-breakdown reports are kept
+in Redis (FinalDays), so that Sweep Builder can leave them out of expectations
+without looking up JobReport of each of the days.
+"""
+import xxhash
+import ujson as json
+
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Set
+
+from common.connect.redis import get_redis
+from common.tztools import now
+from config import jobs as jobs_config
+
+_HASH_MODULO = 2 ** 64
+
+
+def is_past_attribution_window(day: date) -> bool:
+    return day + timedelta(days=jobs_config.DAY_REPORT_ATTRIBUTION_WINDOW_DAYS) < now().date()
+
+
+class DayContentHashes:
+    """
+    Hashes of content of a day-breakdown report, per reporting day
+
+    Rows come in whatever order FB pages them in, so hash of each row is combined
+    with an order-independent sum. Days in the range no rows came for get hash of no content.
+    """
+
+    def __init__(self, days: Iterable[date]):
+        self._row_hashes_sums: Dict[str, int] = {day.strftime('%Y-%m-%d'): 0 for day in days}
+        self._rows_counts: Dict[str, int] = {day: 0 for day in self._row_hashes_sums}
+
+    def add(self, row: Dict[str, Any]):
+        day = row['date_start']
+        row_hash = xxhash.xxh64(json.dumps(row, sort_keys=True)).intdigest()
+        self._row_hashes_sums[day] = (self._row_hashes_sums.get(day, 0) + row_hash) % _HASH_MODULO
+        self._rows_counts[day] = self._rows_counts.get(day, 0) + 1
+
+    def hexdigests(self) -> Dict[str, str]:
+        return {
+            day: f'{self._rows_counts[day]}:{row_hashes_sum:016x}'
+            for day, row_hashes_sum in self._row_hashes_sums.items()
+        }
+
+
+class FinalDays:
+    """
+    Reporting days known to be final, of per-AdAccount report of given type and variant
+
+    Stored as sorted set of days scored by time they were marked final at. Set expires
+    DAY_REPORT_FINALITY_TTL seconds after last day was added to it, after which days
+    are collected (and found final) again.
+    """
+
+    def __init__(self, ad_account_id: str, report_type: str, report_variant: str):
+        self.key = f'{ad_account_id}:{report_type}:{report_variant}:{self.__class__.__name__}'
+
+    def add(self, day: date):
+        pipeline = get_redis().pipeline(transaction=False)
+        # cluster pipeline takes score first, unlike the cluster client itself
+        pipeline.zadd(self.key, now().timestamp(), day.strftime('%Y-%m-%d'))
+        pipeline.expire(self.key, jobs_config.DAY_REPORT_FINALITY_TTL)
+        pipeline.execute()
+
+    def get(self, final_since: Optional[datetime] = None) -> Set[date]:
+        """
+        :param final_since: Leave out days marked final before this time
+        """
+        min_score = '-inf' if final_since is None else final_since.timestamp()
+        return {
+            datetime.strptime(day.decode('utf-8'), '%Y-%m-%d').date()
+            for day in get_redis().zrangebyscore(self.key, min_score, '+inf')
+        }
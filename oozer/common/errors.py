@@ -29,3 +29,11 @@ class InvalidJobScopeException(Exception):
 
     def __init__(self, job_scope: JobScope):
         self.job_scope = job_scope
+
+
+class TaskHandedOff(Exception):
+
+    """Raised when a task passed the rest of its job to another process (which will report on it)."""
+
+    def __init__(self, job_scope: JobScope):
+        self.job_scope = job_scope
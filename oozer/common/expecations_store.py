@@ -1,7 +1,10 @@
 import logging
 
-from queue import deque
-from typing import Optional, Callable, Generator
+import gevent.pool
+import xxhash
+
+from collections import defaultdict
+from typing import Callable, Generator, Iterable, Tuple, List, Dict, Set
 
 from common.connect.redis import get_redis
 
@@ -12,58 +15,58 @@ _sweep_aa_index_key_template = '{sweep_id}-sweep-aa-index-set'.format
 _aa_job_index_key_template = '{sweep_id}-{ad_account_id}-expectation-aa-index-set'.format
 _job_expectation_key_template = '{sweep_id}-{job_id}-expectations'.format
 
+# Number of set members we ask Redis to walk per SSCAN round trip.
+# Default of 10 makes reading a set of thousands of job IDs take hundreds of round trips.
+SSCAN_COUNT = 1000
+# Number of AdAccounts whose expectations are read concurrently
+READ_CONCURRENCY = 10
+
 
 class JobExpectationsWriter:
-    def __init__(self, sweep_id: str, cache_max_size: Optional[int] = 2000):
+    """
+    Records job IDs expected in a sweep, per AdAccount.
+
+    Redis sets dedupe on their own, but sending same job ID to Redis over and over
+    is expensive, so we remember what we already sent for the life of the writer
+    (a sweep slice). Job IDs are long strings. Instead of keeping them, we keep
+    64-bit hashes of them. Unlike with Bloom filter, chance of wrongly skipping
+    a never-seen job ID is negligible (collisions of 64-bit hashes at millions of IDs).
+
+    New members are buffered and sent to Redis in bulk (pipelined multi-member SADDs)
+    every `batch_size` additions and when the writer is closed.
+    """
+
+    def __init__(self, sweep_id: str, batch_size: int = 500):
 
         self.sweep_id = sweep_id
+        self.batch_size = batch_size
 
-        self._aa_cache = set()
-        self._aa_cache_order = deque()
-        self._aa_cache_remaining = cache_max_size
+        self._aa_cache: Set[str] = set()
+        self._job_id_hash_cache: Set[int] = set()
 
-        self._job_id_cache = set()
-        self._job_id_cache_order = deque()
-        self._job_id_cache_remaining = cache_max_size
+        # Redis key > members to add to that set
+        self._pending: Dict[str, List[str]] = defaultdict(list)
+        self._pending_count = 0
 
         self._redis_client = get_redis()
 
     def add(self, job_id: str, ad_account_id: str, entity_id: str):
-        key_template_data = {
-            'sweep_id': self.sweep_id,
-            'job_id': job_id,
-            'ad_account_id': ad_account_id,
-            'entity_id': entity_id,
-        }
-
         if ad_account_id not in self._aa_cache:
             self._aa_cache.add(ad_account_id)
-            # we are adding to cache in FIFO mode
-            self._aa_cache_order.append(ad_account_id)  # on right side
-
-            if self._aa_cache_remaining == 0:
-                # we are popping off cache in FIFO order
-                item = self._aa_cache_order.popleft()
-                self._aa_cache.remove(item)
-            else:
-                self._aa_cache_remaining -= 1
-
-            self._redis_client.sadd(_sweep_aa_index_key_template(**key_template_data), ad_account_id)
+            self._pending[_sweep_aa_index_key_template(sweep_id=self.sweep_id)].append(ad_account_id)
+            self._pending_count += 1
 
         # job-aa index record
-        if job_id not in self._job_id_cache:
-            self._job_id_cache.add(job_id)
-            # we are adding to cache in FIFO mode
-            self._job_id_cache_order.append(job_id)  # on right side
-
-            if self._job_id_cache_remaining == 0:
-                # we are popping off cache in FIFO order
-                item = self._job_id_cache_order.popleft()
-                self._job_id_cache.remove(item)
-            else:
-                self._job_id_cache_remaining -= 1
+        job_id_hash = xxhash.xxh64(job_id).intdigest()
+        if job_id_hash not in self._job_id_hash_cache:
+            self._job_id_hash_cache.add(job_id_hash)
+            self._pending[_aa_job_index_key_template(sweep_id=self.sweep_id, ad_account_id=ad_account_id)].append(
+                job_id
+            )
+            self._pending_count += 1
 
-            self._redis_client.sadd(_aa_job_index_key_template(**key_template_data), job_id)
+        if self._pending_count >= self.batch_size:
+            self.flush()
 
         # At this point we are never scheduling per-entity jobs
         # Thus, we don't need to record the expectations at per-entity level.
@@ -73,11 +76,23 @@ class JobExpectationsWriter:
         #     self.sweep_id
         # )
 
+    def flush(self):
+        if not self._pending_count:
+            return
+
+        pipeline = self._redis_client.pipeline(transaction=False)
+        for key, members in self._pending.items():
+            pipeline.sadd(key, *members)
+        pipeline.execute()
+
+        self._pending.clear()
+        self._pending_count = 0
+
     def __enter__(self) -> Callable[[str, str, str], None]:
         return self.add
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        pass
+        self.flush()
 
 
 def iter_expectations_per_ad_account(ad_account_id: str, sweep_id: str) -> Generator[str, None, None]:
@@ -86,7 +101,7 @@ def iter_expectations_per_ad_account(ad_account_id: str, sweep_id: str) -> Gener
     """
     redis = get_redis()
     aa_level_key = _aa_job_index_key_template(sweep_id=sweep_id, ad_account_id=ad_account_id)
-    for job_id in redis.sscan_iter(aa_level_key):
+    for job_id in redis.sscan_iter(aa_level_key, count=SSCAN_COUNT):
         yield job_id.decode('utf8')
 
 
@@ -96,10 +111,27 @@ def iter_expectations_ad_accounts(sweep_id: str) -> Generator[str, None, None]:
     """
     redis = get_redis()
     sweep_level_key = _sweep_aa_index_key_template(sweep_id=sweep_id)
-    for ad_account_id in redis.sscan_iter(sweep_level_key):
+    for ad_account_id in redis.sscan_iter(sweep_level_key, count=SSCAN_COUNT):
         yield ad_account_id.decode('utf8')
 
 
+def iter_expectations_per_ad_accounts(
+    ad_account_ids: Iterable[str], sweep_id: str, concurrency: int = READ_CONCURRENCY
+) -> Generator[Tuple[str, List[str]], None, None]:
+    """
+    Reads expectations of multiple AdAccounts concurrently.
+
+    Yields (AdAccount ID, list of its JobIDs) pairs in order of completion,
+    not in order of ad_account_ids.
+    """
+
+    def _read(ad_account_id: str) -> Tuple[str, List[str]]:
+        return ad_account_id, list(iter_expectations_per_ad_account(ad_account_id, sweep_id))
+
+    yield from gevent.pool.Pool(size=concurrency).imap_unordered(_read, ad_account_ids)
+
+
 def iter_expectations(sweep_id: str) -> Generator[str, None, None]:
-    for ad_account_id in iter_expectations_ad_accounts(sweep_id):
-        yield from iter_expectations_per_ad_account(ad_account_id, sweep_id)
+    ad_account_ids_iter = iter_expectations_ad_accounts(sweep_id)
+    for _, job_ids in iter_expectations_per_ad_accounts(ad_account_ids_iter, sweep_id):
+        yield from job_ids
@@ -15,14 +15,19 @@ from facebook_business.adobjects.page import Page
 from facebook_business.adobjects.pagepost import PagePost
 
 from common.enums.failure_bucket import FailureBucket
+from config import facebook as facebook_config
 from oozer.common.enum import to_fb_model, ExternalPlatformJobStatus
 from oozer.common.facebook_fields import collapse_fields_children
+from oozer.common.facebook_session_pool import get_session_pool
 
 
 class PlatformApiContext:
     """
     A simple wrapper for Facebook SDK, using local API sessions as not to
     pollute the the global default API session with initialization
+
+    Sessions come from process-wide pool (see facebook_session_pool), so
+    the HTTP connections are reused across contexts with the same token.
     """
 
     token: str = None
@@ -32,7 +37,10 @@ class PlatformApiContext:
         self.token = token
 
     def __enter__(self) -> 'PlatformApiContext':
-        self.api = FacebookAdsApi(FacebookSession(access_token=self.token))
+        if facebook_config.SESSION_POOL_ENABLED:
+            self.api = get_session_pool().get_api(self.token)
+        else:
+            self.api = FacebookAdsApi(FacebookSession(access_token=self.token))
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
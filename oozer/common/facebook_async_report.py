@@ -1,6 +1,8 @@
 from facebook_business.adobjects.adreportrun import AdReportRun
 
+from config import facebook as facebook_config
 from config.facebook import INSIGHTS_MAX_POLLING_INTERVAL, INSIGHTS_MIN_POLLING_INTERVAL
+from oozer.common.raw_paging import RawCursor, supports_raw_paging
 
 
 class FacebookReportDefinition:
@@ -103,7 +105,12 @@ class FacebookAsyncReportStatus:
 
     def iter_report_data(self, *args, **kwargs):
         if not self.is_success:
-            self.ReportFailed(f"Report is not marked as '{self.status}' - not ready for consumption.")
+            raise self.ReportFailed(f"Report is not marked as '{self.status}' - not ready for consumption.")
+
+        if facebook_config.RAW_PAGING_ENABLED and supports_raw_paging(self._report.get_insights):
+            # rows come out as dicts parsed from response body, no AdsInsights in between
+            yield from RawCursor(self._report.get_insights(*args, pending=True, **kwargs))
+            return
 
         # self._report.get_insights() returns a *GENERATOR*
         # that transparently pages behind the scenes
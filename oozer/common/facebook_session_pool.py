@@ -0,0 +1,141 @@
+"""
+Process-wide pool of Facebook API sessions, one per token.
+
+Every FacebookSession carries its own `requests.Session` and, with it, its own
+pool of HTTP connections. Building a new one per job (or per access check)
+means new TLS handshake to graph.facebook.com for nearly every request.
+
+Here sessions are kept per token and reused across jobs, with HTTP connection
+pools large enough for all greenlets of the worker to share them.
+Sessions not used for a while are closed, and when there are too many,
+least recently used ones go first.
+"""
+import logging
+import time
+
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import requests.adapters
+
+from facebook_business.api import FacebookAdsApi, FacebookSession
+
+from common.measurement import Measure
+from config import facebook as facebook_config
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledApi:
+    def __init__(self, api: FacebookAdsApi):
+        self.api = api
+        self.last_used = time.time()
+        # what was already reported to metrics
+        self.reported_requests = 0
+        self.reported_connections = 0
+
+    @property
+    def http_session(self) -> requests.Session:
+        return self.api._session.requests
+
+    def connection_stats(self) -> Tuple[int, int]:
+        """
+        :return: Total number of HTTP requests made and connections opened through this session
+        """
+        requests_count = connections_count = 0
+        # same adapter is mounted for http and https
+        adapters = {id(adapter): adapter for adapter in self.http_session.adapters.values()}
+        for adapter in adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                requests_count += pool.num_requests
+                connections_count += pool.num_connections
+        return requests_count, connections_count
+
+    def report_connection_stats(self):
+        requests_count, connections_count = self.connection_stats()
+        if requests_count > self.reported_requests:
+            Measure.increment(f'{__name__}.http_requests')(requests_count - self.reported_requests)
+            self.reported_requests = requests_count
+        if connections_count > self.reported_connections:
+            Measure.increment(f'{__name__}.http_connections_opened')(connections_count - self.reported_connections)
+            self.reported_connections = connections_count
+
+    def close(self):
+        # Jobs still holding on to the api are fine. Closed session opens new connections when used again.
+        self.report_connection_stats()
+        self.http_session.close()
+
+
+class SessionPool:
+    """
+    Bounded LRU of FacebookAdsApi instances keyed by token, with idle eviction
+    """
+
+    def __init__(self, max_size: int, idle_timeout: float, connections_per_host: int):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.connections_per_host = connections_per_host
+        self._apis: 'OrderedDict[str, _PooledApi]' = OrderedDict()
+
+    def _create(self, token: str) -> FacebookAdsApi:
+        session = FacebookSession(access_token=token)
+        # pool_maxsize is how many connections to one host are kept open for reuse.
+        # All greenlets of the worker may talk to graph.facebook.com with the same token at once.
+        adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=self.connections_per_host)
+        session.requests.mount('https://', adapter)
+        session.requests.mount('http://', adapter)
+        return FacebookAdsApi(session)
+
+    def _evict(self, token: str, reason: str):
+        pooled = self._apis.pop(token)
+        pooled.close()
+        Measure.increment(f'{__name__}.evicted', tags={'reason': reason})(1)
+
+    def evict_idle(self, now: Optional[float] = None):
+        now = now or time.time()
+        # ordered from least recently used
+        for token, pooled in list(self._apis.items()):
+            if now - pooled.last_used < self.idle_timeout:
+                break
+            self._evict(token, 'idle')
+
+    def get_api(self, token: str) -> FacebookAdsApi:
+        now = time.time()
+        self.evict_idle(now)
+
+        pooled = self._apis.get(token)
+        if pooled is None:
+            Measure.increment(f'{__name__}.miss', sample_rate=0.1)(1)
+            pooled = self._apis[token] = _PooledApi(self._create(token))
+            while len(self._apis) > self.max_size:
+                self._evict(next(iter(self._apis)), 'size')
+        else:
+            Measure.increment(f'{__name__}.hit', sample_rate=0.1)(1)
+            self._apis.move_to_end(token)
+            pooled.report_connection_stats()
+
+        pooled.last_used = now
+        return pooled.api
+
+    def clear(self):
+        for token in list(self._apis):
+            self._evict(token, 'clear')
+
+    def __len__(self):
+        return len(self._apis)
+
+
+_session_pool: Optional[SessionPool] = None
+
+
+def get_session_pool() -> SessionPool:
+    global _session_pool
+    if _session_pool is None:
+        _session_pool = SessionPool(
+            facebook_config.SESSION_POOL_MAX_SIZE,
+            facebook_config.SESSION_POOL_IDLE_TIMEOUT,
+            facebook_config.SESSION_POOL_CONNECTIONS_PER_HOST,
+        )
+    return _session_pool
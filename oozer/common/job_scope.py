@@ -1,5 +1,5 @@
 from datetime import datetime, date
-from typing import List, Union
+from typing import Any, Dict, List, Union
 
 from common.enums.jobtype import detect_job_type
 from common.id_tools import generate_id
@@ -35,6 +35,12 @@ class JobScope:
     score: int = None
     running_time: int = None
     datapoint_count: int = None
+    # hashes of collected content per reporting day ('YYYY-MM-DD'), for day-breakdown reports
+    content_hashes: Dict[str, str] = None
+    # IDs of all entities of a job batched from per-entity jobs (entity_id is the first of them)
+    entity_ids: List[str] = None
+    # lifetime collection scope (see oozer.metrics.recent_delivery) async report was submitted with
+    lifetime_collection_scope: Dict[str, Any] = None
 
     # Indicates that this is a synthetically created instance of JobScope
     # (likely by the worker code to indicate some sub-level of work done)
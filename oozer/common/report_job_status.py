@@ -1,14 +1,19 @@
 import logging
+import math
 
 from datetime import datetime, date
-from typing import Any
+from typing import Any, List, Optional
 
 from boto3.resources.model import Action
+from pynamodb.exceptions import DoesNotExist
 
 from common.enums.failure_bucket import FailureBucket
 from common.enums.reporttype import ReportType
+from common.measurement import Measure
 from common.store.jobreport import JobReport
+from common.tztools import date_range
 from oozer.common import cold_storage
+from oozer.common.day_finality import FinalDays, is_past_attribution_window
 from oozer.common.enum import ExternalPlatformJobStatus
 from oozer.common.job_scope import JobScope
 
@@ -27,6 +32,64 @@ def _set_or_remove(attr, value=None) -> Action:
     return attr.set(value)
 
 
+def _get_report_job_scopes(job_scope: JobScope) -> List[JobScope]:
+    """
+    Multi-day day-breakdown jobs are coalesced from single day jobs (see sweep_builder.persister.iter_coalesced).
+    Their status is recorded for each of the days, as single day jobs are what Sweep Builder scores.
+    Same goes for per-entity jobs batched into one (see sweep_builder.persister.iter_batched).
+    """
+    if job_scope.entity_ids:
+        return [
+            JobScope(job_scope.to_dict(), entity_id=entity_id, entity_ids=None) for entity_id in job_scope.entity_ids
+        ]
+
+    is_coalesced = (
+        job_scope.report_type in ReportType.ALL_DAY_BREAKDOWNS
+        and isinstance(job_scope.range_start, date)
+        and isinstance(job_scope.range_end, date)
+        and job_scope.range_end > job_scope.range_start
+    )
+    if not is_coalesced:
+        return [job_scope]
+
+    return [
+        JobScope(job_scope.to_dict(), range_start=day, range_end=None)
+        for day in date_range(job_scope.range_start, job_scope.range_end)
+    ]
+
+
+def _get_finality_actions(day_job_scope: JobScope) -> List[Action]:
+    """
+    Day is final once collected past attribution window twice in a row with same content.
+    See oozer.common.day_finality
+    """
+    day = day_job_scope.range_start
+    content_hash = day_job_scope.content_hashes.get(_to_date_string_if_set(day))
+    if content_hash is None or not is_past_attribution_window(day):
+        return []
+
+    try:
+        last_content_hash = JobReport.get(day_job_scope.job_id).last_content_hash
+    except DoesNotExist:
+        last_content_hash = None
+
+    if content_hash != last_content_hash:
+        return [JobReport.last_content_hash.set(content_hash)]
+
+    FinalDays(day_job_scope.ad_account_id, day_job_scope.report_type, day_job_scope.report_variant).add(day)
+    Measure.increment(
+        f'{__name__}.final_days',
+        tags={'ad_account_id': day_job_scope.ad_account_id, 'report_type': day_job_scope.report_type},
+    )(1)
+    return [JobReport.last_content_hash.set(content_hash), JobReport.final_dt.set(datetime.utcnow())]
+
+
+def _per_job(value: Optional[int], jobs_count: int) -> Optional[int]:
+    # we don't know how running time and datapoints were split among days (or entities).
+    # Even split is good enough for sizing.
+    return value if value is None else math.ceil(value / jobs_count)
+
+
 def _report_job_done_to_cold_store(job_scope: JobScope):
     reporting_job_scope = JobScope(
         sweep_id=job_scope.sweep_id, ad_account_id=job_scope.ad_account_id, report_type=ReportType.sync_status
@@ -68,13 +131,17 @@ def report_job_status(stage_id: int, job_scope: JobScope):
     is_done = False
     actions = None
 
+    report_job_scopes = _get_report_job_scopes(job_scope)
+    running_time = _per_job(job_scope.running_time, len(report_job_scopes))
+    datapoint_count = _per_job(job_scope.datapoint_count, len(report_job_scopes))
+
     if stage_id == ExternalPlatformJobStatus.Done:
         actions = [
             JobReport.last_success_dt.set(datetime.utcnow()),
             JobReport.last_success_sweep_id.set(job_scope.sweep_id),
             JobReport.fails_in_row.remove(),
-            _set_or_remove(JobReport.last_total_running_time, job_scope.running_time),
-            _set_or_remove(JobReport.last_total_datapoint_count, job_scope.datapoint_count),
+            _set_or_remove(JobReport.last_total_running_time, running_time),
+            _set_or_remove(JobReport.last_total_datapoint_count, datapoint_count),
         ]
         is_done = True
     elif stage_id > 0:
@@ -91,8 +158,8 @@ def report_job_status(stage_id: int, job_scope: JobScope):
             JobReport.fails_in_row.add(1),
             # last_failure_error=?
             _set_or_remove(JobReport.last_failure_bucket, status_bucket),
-            _set_or_remove(JobReport.last_partial_running_time, job_scope.running_time),
-            _set_or_remove(JobReport.last_partial_datapoint_count, job_scope.datapoint_count),
+            _set_or_remove(JobReport.last_partial_running_time, running_time),
+            _set_or_remove(JobReport.last_partial_datapoint_count, datapoint_count),
         ]
 
     if actions:
@@ -100,7 +167,13 @@ def report_job_status(stage_id: int, job_scope: JobScope):
             f'[job-status][{job_scope.sweep_id}] Job "{job_scope.job_id}" '
             f'at stage "{stage_id}" with actions {actions}'
         )
-        JobReport(job_scope.job_id).update(actions=actions)
+        for report_job_scope in report_job_scopes:
+            job_actions = actions
+            if is_done and job_scope.content_hashes is not None:
+                job_actions = actions + _get_finality_actions(report_job_scope)
+            JobReport(report_job_scope.job_id).update(actions=job_actions)
 
     if is_done and job_scope.namespace == JobScope.namespace:
-        _report_job_done_to_cold_store(job_scope)
+        # batched job is as good as done job of each of its entities
+        for done_job_scope in report_job_scopes if job_scope.entity_ids else [job_scope]:
+            _report_job_done_to_cold_store(done_job_scope)
@@ -3,13 +3,16 @@ import random
 import ujson as json
 
 from collections import namedtuple, OrderedDict, defaultdict
-from typing import List
+from typing import Dict, List, Optional
 
 from common.bugsnag import BugSnagContextData
 from common.connect.redis import get_redis
+from common.enums.entity import Entity
 from common.enums.jobtype import detect_job_type
-from common.id_tools import parse_id_parts
+from common.enums.reporttype import ReportType
+from common.id_tools import generate_id, parse_id_parts, JobIdParts
 from common.measurement import Measure
+from config import looper as looper_config
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +21,21 @@ class NotSet:
     pass
 
 
+def get_parent_job_id(job_id_parts: JobIdParts) -> Optional[str]:
+    """
+    ID of per-AdAccount ("wholesale") insights job that collects everything per-entity insights job does
+
+    Per-entity insights jobs come from task breakdown of per-AdAccount ones. Other jobs have no parent job.
+    """
+    if job_id_parts.report_type not in ReportType.ALL_METRICS or job_id_parts.entity_type not in (
+        Entity.Campaign,
+        Entity.AdSet,
+        Entity.Ad,
+    ):
+        return None
+    return generate_id(**{**job_id_parts._asdict(), 'entity_type': None, 'entity_id': None})
+
+
 class _JobsWriter:
     GLOBAL_SHARD_NAME: str = 'global'
 
@@ -57,6 +75,7 @@ class _JobsWriter:
         self.cache_max_size = 20000
         self.cnts = defaultdict(int)
         self.cnts_global_jobs = 0
+        self.child_job_cnts = defaultdict(int)
         self.redis_client = get_redis()
         self.sweep_id = sorted_jobs_queue_interface.sweep_id
         self.sorted_jobs_queue_interface = sorted_jobs_queue_interface
@@ -128,6 +147,10 @@ class _JobsWriter:
             # Thus, we just add to the batch and move on
             self.batch[job_id] = score
             self.cnts[key_cnts] += 1
+            # only Looper's wholesale dedup needs to know (see oozer.producer)
+            parent_job_id = looper_config.WHOLESALE_DEDUP_ENABLED and get_parent_job_id(job_id_parts)
+            if parent_job_id:
+                self.child_job_cnts[parent_job_id] += 1
         else:  # this is some per-Parent job
             # There is a chance it's in the larger cache with same exact score
             if self.cache.get(job_id) == score:
@@ -153,6 +176,9 @@ class _JobsWriter:
         if self.batch:  # some sub-batch_size leftovers
             self.flush()
 
+        if looper_config.WHOLESALE_DEDUP_ENABLED and self.child_job_cnts:
+            self.redis_client.hmset(self.sorted_jobs_queue_interface.get_child_job_counts_key(), self.child_job_cnts)
+
         cnt = 0
         for (job_type, ad_account_id, report_type, report_variant), cnts in self.cnts.items():
             Measure.counter(
@@ -337,6 +363,16 @@ class SortedJobsQueue:
     def get_queue_key_ad_account(self) -> str:
         return f'{self._queue_key_base}-ad_account_id'
 
+    def get_child_job_counts_key(self) -> str:
+        return f'{self._queue_key_base}-child_job_counts'
+
+    def get_child_job_counts(self) -> Dict[str, int]:
+        """Number of per-entity jobs queued, per ID of their per-AdAccount job (see get_parent_job_id)."""
+        return {
+            parent_job_id.decode('utf8'): int(cnt)
+            for parent_job_id, cnt in get_redis().hgetall(self.get_child_job_counts_key()).items()
+        }
+
     def get_queue_keys_range(self) -> List[str]:
         # still same 10 shards
         return [self.get_queue_key(shard_id=i) for i in range(0, 10)]  # last arg is exclusive not inclusive
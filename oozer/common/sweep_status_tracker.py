@@ -65,6 +65,14 @@ class SweepStatusTracker:
             self.redis.hincrby(self._gen_key(AGGREGATE_RECORD_MARKER), failure_bucket)
             self.redis.incrby(self._gen_key(IN_PROGRESS_RECORD_MARKER), -1)
 
+    def report_handed_off(self):
+        """
+        Job that reported WorkingOnIt passed the rest of its work on to someone else
+
+        That someone will report WorkingOnIt and final status in turn.
+        """
+        self.redis.incrby(self._gen_key(IN_PROGRESS_RECORD_MARKER), -1)
+
     def _get_aggregate_data(self) -> Dict[int, int]:
         # This mess is here just to get through the annoyance
         # of beating what used to be ints as keys AND values
@@ -0,0 +1,148 @@
+"""
+In-sweep retries of jobs that failed on throttling.
+
+Celery tasks are not retried (see common.celeryapp.CeleryTask.max_retries), so a throttled job
+normally waits for next sweep, where it is expected, scored and queued all over again,
+even when the throttling would have cleared within a minute or two.
+
+Throttled jobs are instead put into a delayed retry lane of the sweep (ThrottledRetries),
+scored by time they are ready to be retried at, and Looper lets them out again, ahead of new jobs,
+once they are due (see oozer.producer.TaskProducer). Each job gets up to THROTTLED_RETRY_BUDGET
+retries per sweep. Jobs that would not be ready within THROTTLED_RETRY_MAX_DELAY are left to next sweep,
+as are jobs failing once Looper is done with the lane (see ThrottledRetries.close).
+"""
+import logging
+import pickle
+import time
+
+from typing import List, Optional
+
+import ujson as json
+
+from facebook_business.exceptions import FacebookRequestError
+
+from common.connect.redis import get_redis
+from common.enums.failure_bucket import FailureBucket
+from common.measurement import Measure
+from config import looper as looper_config
+from oozer.common.job_scope import JobScope
+
+logger = logging.getLogger(__name__)
+
+# seconds to wait before first retry, per kind of throttling. Doubles with each retry.
+THROTTLING_BACKOFF = {
+    FailureBucket.Throttling: 60,
+    FailureBucket.UserThrottling: 60,
+    FailureBucket.AdAccountThrottling: 120,
+    FailureBucket.ApplicationThrottling: 300,
+}
+
+_BUSINESS_USE_CASE_USAGE_HEADER = 'x-business-use-case-usage'
+
+
+def get_estimated_time_to_regain_access(exc: Exception) -> Optional[int]:
+    """
+    Seconds FB expects the throttling to last, as told in business use case usage header of the response
+    """
+    if not isinstance(exc, FacebookRequestError):
+        return None
+
+    try:
+        headers = {name.lower(): value for name, value in (exc.http_headers() or {}).items()}
+        usage = json.loads(headers.get(_BUSINESS_USE_CASE_USAGE_HEADER) or '{}')
+        minutes = [
+            use_case_usage.get('estimated_time_to_regain_access') or 0
+            for use_cases_usage in usage.values()
+            for use_case_usage in use_cases_usage
+        ]
+    except (ValueError, AttributeError, TypeError):
+        return None
+    return max(minutes) * 60 if minutes else None
+
+
+class ThrottledRetries:
+    """
+    Throttled jobs of a sweep waiting to be retried
+
+    Jobs are kept as sorted set of job IDs scored by time they are ready at,
+    with job scopes and retry counts kept aside. All of it expires with the sweep.
+    """
+
+    def __init__(self, sweep_id: str):
+        self.sweep_id = sweep_id
+        self.key = f'{sweep_id}-throttled-retries'
+        self.job_scopes_key = f'{self.key}-job-scopes'
+        self.attempts_key = f'{self.key}-attempts'
+        self.closed_key = f'{self.key}-closed'
+
+    def push(self, job_scope: JobScope, failure_bucket: int, exc: Exception = None) -> bool:
+        """
+        :return: Whether the job is going to be retried
+        """
+        job_id = job_scope.job_id
+        tags = {'ad_account_id': job_scope.ad_account_id, 'failure_bucket': failure_bucket}
+        redis = get_redis()
+
+        # nobody is going to let the job out anymore
+        if redis.exists(self.closed_key):
+            Measure.increment(f'{__name__}.lane_closed', tags=tags)(1)
+            return False
+
+        attempt = int(redis.hget(self.attempts_key, job_id) or 0) + 1
+        if attempt > looper_config.THROTTLED_RETRY_BUDGET:
+            Measure.increment(f'{__name__}.budget_exhausted', tags=tags)(1)
+            return False
+
+        delay = THROTTLING_BACKOFF.get(failure_bucket, THROTTLING_BACKOFF[FailureBucket.Throttling]) * 2 ** (
+            attempt - 1
+        )
+        # no point retrying before FB lets us back in
+        delay = max(delay, get_estimated_time_to_regain_access(exc) or 0)
+        if delay > looper_config.THROTTLED_RETRY_MAX_DELAY:
+            Measure.increment(f'{__name__}.too_late', tags=tags)(1)
+            return False
+
+        # fresh start for the retried job
+        retry_job_scope = JobScope(job_scope.to_dict(), running_time=None, datapoint_count=None)
+
+        pipeline = redis.pipeline(transaction=False)
+        pipeline.hset(self.attempts_key, job_id, attempt)
+        pipeline.hset(self.job_scopes_key, job_id, pickle.dumps(retry_job_scope))
+        # cluster pipeline takes score first, unlike the cluster client itself
+        pipeline.zadd(self.key, time.time() + delay, job_id)
+        for key in (self.key, self.job_scopes_key, self.attempts_key):
+            pipeline.expire(key, looper_config.RUN_SWEEP_TIMEOUT)
+        pipeline.execute()
+
+        logger.info(f'{job_scope} to be retried in {delay} seconds (attempt {attempt})')
+        Measure.increment(f'{__name__}.pushed', tags=tags)(1)
+        return True
+
+    def pop_due(self, limit: int = 100) -> List[JobScope]:
+        """
+        Job scopes of jobs ready to be retried, taken out of the lane
+        """
+        redis = get_redis()
+        job_scopes = []
+        for job_id in redis.zrangebyscore(self.key, '-inf', time.time(), start=0, num=limit):
+            # whoever removes the job from the lane gets to retry it
+            if not redis.zrem(self.key, job_id):
+                continue
+            job_scope_data = redis.hget(self.job_scopes_key, job_id)
+            if job_scope_data is not None:
+                job_scopes.append(pickle.loads(job_scope_data))
+        return job_scopes
+
+    def get_next_ready_time(self) -> Optional[float]:
+        """
+        Time the next job in the lane is ready to be retried at, None when the lane is empty
+        """
+        for _, ready_at in get_redis().zrange(self.key, 0, 0, withscores=True):
+            return float(ready_at)
+        return None
+
+    def close(self):
+        """
+        Jobs failing on throttling from now on are not pushed, so that they are left to next sweep
+        """
+        get_redis().set(self.closed_key, 1, ex=looper_config.RUN_SWEEP_TIMEOUT)
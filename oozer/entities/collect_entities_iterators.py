@@ -1,11 +1,17 @@
 import functools
+from contextlib import ExitStack
 from typing import List, Generator, Callable, Dict, Union, Tuple, Any
 
+from facebook_business.exceptions import FacebookRequestError
+
 from common.enums.entity import Entity
 from common.id_tools import generate_universal_id, NAMESPACE_RAW
+from common.measurement import Measure
 from common.page_tokens import PageTokenManager
 from common.tokens import PlatformTokenManager
-from oozer.common.cold_storage import ChunkDumpStore
+from config import facebook as facebook_config
+from config import jobs as jobs_config
+from oozer.common.cold_storage import ChunkDumpStore, SpoolingChunkStore
 from oozer.common.enum import (
     ENUM_VALUE_FB_MODEL_MAP,
     FB_ADACCOUNT_MODEL,
@@ -26,12 +32,28 @@ from oozer.common.facebook_api import (
     PlatformApiContext,
     get_additional_params,
 )
+from oozer.common.adaptive_page_size import AdaptivePageSize, iter_adaptively, _is_too_much_data
 from oozer.common.job_scope import JobScope
+from oozer.common.raw_paging import raw_getter, supports_raw_paging
 from oozer.common.vendor_data import add_vendor_data
-from oozer.entities.feedback_entity_task import feedback_entity_task
+from oozer.entities.entity_hash import EntityHashStore, _checksum_entity
+from oozer.entities.entity_hierarchy import HIERARCHY_ENTITY_TYPES, iter_nested_entity_hierarchy
+from oozer.entities.entity_watermark import EntityWatermark
+from oozer.entities.inline_comments import (
+    PagePostCommentCounts,
+    PagePostsPendingComments,
+    get_inline_comments_field,
+    pop_inline_comments,
+)
+from oozer.entities.feedback_entity_task import EntityFeedbackBuffer
 
 DEFAULT_CHUNK_SIZE = 200
 
+# entity types EntityHash knows which fields to consider for
+CHANGE_DETECTION_ENTITY_TYPES = {Entity.Campaign, Entity.AdSet, Entity.Ad}
+# entity types FB allows to filter by updated_time
+INCREMENTAL_ENTITY_TYPES = {Entity.Campaign, Entity.AdSet, Entity.Ad}
+
 
 def _extract_token_entity_type_parent_entity(
     job_scope: JobScope, allowed_entity_types: List[str], parent_entity_type: str, parent_entity_id_key: str
@@ -61,6 +83,8 @@ def _iterate_native_entities_per_parent(
     entity_type: str,
     fields: List[str] = None,
     page_size: int = None,
+    parent_id: str = None,
+    updated_since: int = None,
 ) -> Generator:
     """
     Generic getter for entities from the parent's edge from FB API
@@ -75,19 +99,40 @@ def _iterate_native_entities_per_parent(
     if not getter_method:
         raise ValueError(f'Value of "entity_type" argument must be one of does not have getter method.')
 
+    if facebook_config.RAW_PAGING_ENABLED and supports_raw_paging(getter_method):
+        # entities come out as plain dicts
+        getter_method = raw_getter(getter_method)
+
     fields_to_fetch = fields or get_default_fields(fb_model_klass)
-    page_size = page_size or get_default_page_size(fb_model_klass)
     additional_params = get_additional_params(fb_model_klass)
     params = {'summary': False, **additional_params}
+    if updated_since is not None:
+        params['filtering'] = [{'field': 'updated_time', 'operator': 'GREATER_THAN', 'value': updated_since}]
+
+    if facebook_config.ADAPTIVE_PAGE_SIZE_ENABLED and parent_id and not page_size:
+        # explicitly requested page size wins over learned one
+        page_sizer = AdaptivePageSize(parent_id, entity_type, get_default_page_size(fb_model_klass))
+        yield from iter_adaptively(getter_method, fields_to_fetch, params, page_sizer)
+        return
 
+    page_size = page_size or get_default_page_size(fb_model_klass)
     if page_size:
         params['limit'] = page_size
 
     yield from getter_method(fields=fields_to_fetch, params=params)
 
 
+def _export_entity(entity: Any) -> Dict[str, Any]:
+    # with raw paging, entities are plain dicts already
+    return entity if isinstance(entity, dict) else entity.export_all_data()
+
+
 def iter_native_entities_per_adaccount(
-    ad_account: FB_ADACCOUNT_MODEL, entity_type: str, fields: List[str] = None, page_size: int = None
+    ad_account: FB_ADACCOUNT_MODEL,
+    entity_type: str,
+    fields: List[str] = None,
+    page_size: int = None,
+    updated_since: int = None,
 ) -> Generator[
     Union[
         FB_CAMPAIGN_MODEL,
@@ -102,6 +147,8 @@ def iter_native_entities_per_adaccount(
 ]:
     """
     Generic getter for entities from the AdAccount edge
+
+    :param updated_since: When given, only entities updated after this unix timestamp are returned
     """
 
     def get_augmented_account_ad_videos(fields, params):
@@ -119,7 +166,42 @@ def iter_native_entities_per_adaccount(
         FB_CUSTOM_AUDIENCE_MODEL: ad_account.get_custom_audiences,
     }
 
-    return _iterate_native_entities_per_parent(Entity.AA_SCOPED, getter_method_map, entity_type, fields, page_size)
+    return _iterate_native_entities_per_parent(
+        Entity.AA_SCOPED,
+        getter_method_map,
+        entity_type,
+        fields,
+        page_size,
+        parent_id=ad_account['id'],
+        updated_since=updated_since,
+    )
+
+
+def iter_native_entity_hierarchy_per_adaccount(
+    ad_account: FB_ADACCOUNT_MODEL,
+) -> Generator[Tuple[str, Dict[str, Any]], None, None]:
+    """
+    Campaigns, AdSets and Ads of the AdAccount in one pass, as (entity type, entity data) pairs
+
+    See oozer.entities.entity_hierarchy. When FB finds nested pages too large, falls back to paging
+    the AdAccount edges one after another. Entities given out before that are not given out again.
+    """
+    seen_entity_ids = {entity_type: set() for entity_type in HIERARCHY_ENTITY_TYPES}
+    try:
+        for entity_type, entity_data in iter_nested_entity_hierarchy(ad_account):
+            seen_entity_ids[entity_type].add(entity_data['id'])
+            yield entity_type, entity_data
+        return
+    except FacebookRequestError as ex:
+        if not _is_too_much_data(ex):
+            raise
+
+    Measure.increment(f'{__name__}.entity_hierarchy_fallback')(1)
+    for entity_type in HIERARCHY_ENTITY_TYPES:
+        for entity in iter_native_entities_per_adaccount(ad_account, entity_type):
+            entity_data = _export_entity(entity)
+            if entity_data['id'] not in seen_entity_ids[entity_type]:
+                yield entity_type, entity_data
 
 
 def iter_native_entities_per_page(
@@ -131,7 +213,7 @@ def iter_native_entities_per_page(
     getter_method_map = {FB_PAGE_POST_MODEL: page.get_posts, FB_AD_VIDEO_MODEL: page.get_videos}
 
     return _iterate_native_entities_per_parent(
-        [Entity.PagePost, Entity.PageVideo], getter_method_map, entity_type, fields, page_size
+        [Entity.PagePost, Entity.PageVideo], getter_method_map, entity_type, fields, page_size, parent_id=page['id']
     )
 
 
@@ -183,15 +265,37 @@ def iter_collect_entities_per_adaccount(job_scope: JobScope) -> Generator[Dict[s
         job_scope, Entity.AA_SCOPED, Entity.AdAccount, 'ad_account_id'
     )
 
-    entities = iter_native_entities_per_adaccount(root_fb_entity, entity_type)
+    if jobs_config.ENTITY_HIERARCHICAL_COLLECTION_ENABLED and entity_type == Entity.Campaign:
+        yield from _iter_collect_entity_hierarchy_per_adaccount(job_scope, token, root_fb_entity)
+        return
+
+    incremental = jobs_config.ENTITY_INCREMENTAL_COLLECTION_ENABLED and entity_type in INCREMENTAL_ENTITY_TYPES
+    watermark = EntityWatermark(job_scope.ad_account_id, entity_type, enabled=incremental)
+
+    entities = iter_native_entities_per_adaccount(root_fb_entity, entity_type, updated_since=watermark.updated_since)
 
     record_id_base_data = job_scope.to_dict()
     record_id_base_data.update(entity_type=entity_type, report_variant=None)
 
     token_manager = PlatformTokenManager.from_job_scope(job_scope)
-    with ChunkDumpStore(job_scope, chunk_size=DEFAULT_CHUNK_SIZE) as store:
+    detect_changes = jobs_config.ENTITY_CHANGE_DETECTION_ENABLED and entity_type in CHANGE_DETECTION_ENTITY_TYPES
+    fb_model_klass = ENUM_VALUE_FB_MODEL_MAP[entity_type]
+    # AdSets with full targeting specs and AdCreatives are orders of magnitude larger
+    # than other entities. Chunking by bytes keeps both memory use and object sizes in check.
+    # (Entity hashes and watermark are saved only after the store is done and all chunks are uploaded)
+    entity_hashes = EntityHashStore(
+        job_scope.ad_account_id, entity_type, enabled=detect_changes, prune_unseen=not watermark.is_incremental
+    )
+    with watermark, entity_hashes, SpoolingChunkStore(job_scope) as store, EntityFeedbackBuffer(
+        entity_type
+    ) as feedback:
         for cnt, entity in enumerate(entities):
-            entity_data = entity.export_all_data()
+            entity_data = _export_entity(entity)
+            watermark.observe(entity_data)
+            is_changed = True
+            if detect_changes:
+                entity_hash = _checksum_entity(entity_data, fb_model_klass=fb_model_klass)
+                is_changed = entity_hashes.is_changed(entity_data['id'], entity_hash)
             entity_data = add_vendor_data(
                 entity_data,
                 id=generate_universal_id(
@@ -202,12 +306,13 @@ def iter_collect_entities_per_adaccount(job_scope: JobScope) -> Generator[Dict[s
                 ),
             )
 
-            # Store the individual datum, use job context for the cold
-            # storage thing to divine whatever it needs from the job context
-            store(entity_data)
+            if is_changed:
+                # Store the individual datum, use job context for the cold
+                # storage thing to divine whatever it needs from the job context
+                store(entity_data)
 
-            # Signal to the system the new entity
-            feedback_entity_task.delay(entity_data, entity_type)
+                # Signal to the system the new entity
+                feedback(entity_data)
 
             yield entity_data
 
@@ -221,6 +326,63 @@ def iter_collect_entities_per_adaccount(job_scope: JobScope) -> Generator[Dict[s
     token_manager.report_usage(token)
 
 
+def _iter_collect_entity_hierarchy_per_adaccount(
+    job_scope: JobScope, token: str, ad_account: FB_ADACCOUNT_MODEL
+) -> Generator[Dict[str, Any], None, None]:
+    """
+    Collects Campaigns, AdSets and Ads of an ad account in one pass
+
+    Entities of each type are stored and fed back the same way their own entity jobs would.
+    Collection is always a full one, so entity watermarks are left alone.
+    """
+    token_manager = PlatformTokenManager.from_job_scope(job_scope)
+    detect_changes = jobs_config.ENTITY_CHANGE_DETECTION_ENABLED
+
+    with ExitStack() as stack:
+        # entered in this order, so that entity hashes are saved only after the stores are done
+        entity_hashes = {
+            entity_type: stack.enter_context(
+                EntityHashStore(job_scope.ad_account_id, entity_type, enabled=detect_changes)
+            )
+            for entity_type in HIERARCHY_ENTITY_TYPES
+        }
+        stores = {
+            entity_type: stack.enter_context(
+                SpoolingChunkStore(JobScope(job_scope.to_dict(), report_variant=entity_type))
+            )
+            for entity_type in HIERARCHY_ENTITY_TYPES
+        }
+        feedbacks = {
+            entity_type: stack.enter_context(EntityFeedbackBuffer(entity_type))
+            for entity_type in HIERARCHY_ENTITY_TYPES
+        }
+
+        record_id_base_data = {
+            entity_type: {**job_scope.to_dict(), 'entity_type': entity_type, 'report_variant': None}
+            for entity_type in HIERARCHY_ENTITY_TYPES
+        }
+
+        for cnt, (entity_type, entity_data) in enumerate(iter_native_entity_hierarchy_per_adaccount(ad_account)):
+            is_changed = True
+            if detect_changes:
+                entity_hash = _checksum_entity(entity_data, fb_model_klass=ENUM_VALUE_FB_MODEL_MAP[entity_type])
+                is_changed = entity_hashes[entity_type].is_changed(entity_data['id'], entity_hash)
+            entity_data = add_vendor_data(
+                entity_data, id=generate_universal_id(entity_id=entity_data['id'], **record_id_base_data[entity_type]),
+            )
+
+            if is_changed:
+                stores[entity_type](entity_data)
+                feedbacks[entity_type](entity_data)
+
+            yield entity_data
+
+            if cnt % 1000 == 0:
+                token_manager.report_usage(token, 5)
+
+    token_manager.report_usage(token)
+
+
 def _augment_page_post(page_post: Dict[str, Any]) -> Dict[str, Any]:
     """
         Augment page posts to reflect changes in version 3.3
@@ -248,6 +410,26 @@ def _augment_page_post(page_post: Dict[str, Any]) -> Dict[str, Any]:
     return page_post
 
 
+def _store_inline_comments(
+    job_scope: JobScope, store: ChunkDumpStore, comment_counts: PagePostCommentCounts, page_post_data: Dict[str, Any],
+):
+    """
+    Stores Comments collected inline with the PagePost, same as per-PagePost job would
+    """
+    comments, total_count = pop_inline_comments(page_post_data)
+    comment_counts.observe(page_post_data['id'], len(comments), total_count)
+
+    record_id_base_data = job_scope.to_dict()
+    record_id_base_data.update(entity_type=Entity.Comment, report_variant=None)
+    for comment_data in comments:
+        comment_data = add_vendor_data(
+            comment_data, id=generate_universal_id(entity_id=comment_data.get('id'), **record_id_base_data)
+        )
+        comment_data['page_id'] = job_scope.ad_account_id
+        comment_data['page_post_id'] = page_post_data['id']
+        store(comment_data)
+
+
 def iter_collect_entities_per_page(job_scope: JobScope) -> Generator[Dict[str, Any], None, None]:
     """
     Collects an arbitrary entity for a page
@@ -256,7 +438,12 @@ def iter_collect_entities_per_page(job_scope: JobScope) -> Generator[Dict[str, A
         job_scope, [Entity.PagePost, Entity.PageVideo], Entity.Page, 'ad_account_id'
     )
 
-    entities = iter_native_entities_per_page(root_fb_entity, entity_type)
+    collect_comments_inline = entity_type == Entity.PagePost and jobs_config.PAGE_POST_INLINE_COMMENTS_ENABLED
+    fields = None
+    if collect_comments_inline:
+        fields = list(get_default_fields(FB_PAGE_POST_MODEL)) + [get_inline_comments_field()]
+
+    entities = iter_native_entities_per_page(root_fb_entity, entity_type, fields=fields)
 
     record_id_base_data = job_scope.to_dict()
     record_id_base_data.update(entity_type=entity_type, report_variant=None)
@@ -267,10 +454,21 @@ def iter_collect_entities_per_page(job_scope: JobScope) -> Generator[Dict[str, A
         chunk_size=DEFAULT_CHUNK_SIZE,
         bucket_type=ColdStoreBucketType.RAW_BUCKET,
         custom_namespace=NAMESPACE_RAW,
-    ) as raw_store:
+    ) as raw_store, EntityFeedbackBuffer(entity_type) as feedback, ExitStack() as exit_stack:
+        if collect_comments_inline:
+            comments_store = exit_stack.enter_context(
+                ChunkDumpStore(
+                    JobScope(job_scope.to_dict(), report_variant=Entity.Comment), chunk_size=DEFAULT_CHUNK_SIZE
+                )
+            )
+            comment_counts = exit_stack.enter_context(PagePostCommentCounts(job_scope.ad_account_id))
+
         cnt = 0
         for entity in entities:
-            entity_data = entity.export_all_data()
+            entity_data = _export_entity(entity)
+
+            if collect_comments_inline:
+                _store_inline_comments(job_scope, comments_store, comment_counts, entity_data)
 
             entity_data = add_vendor_data(
                 entity_data, id=generate_universal_id(entity_id=entity_data.get('id'), **record_id_base_data)
@@ -287,7 +485,7 @@ def iter_collect_entities_per_page(job_scope: JobScope) -> Generator[Dict[str, A
             store(entity_data)
 
             # Signal to the system the new entity
-            feedback_entity_task.delay(entity_data, entity_type)
+            feedback(entity_data)
 
             yield entity_data
             cnt += 1
@@ -322,9 +520,9 @@ def iter_collect_entities_per_page_graph(job_scope: JobScope) -> Generator[Dict[
         chunk_size=DEFAULT_CHUNK_SIZE,
         bucket_type=ColdStoreBucketType.RAW_BUCKET,
         custom_namespace=NAMESPACE_RAW,
-    ) as raw_store:
+    ) as raw_store, EntityFeedbackBuffer(entity_type) as feedback:
         for entity in entities:
-            entity_data = entity.export_all_data()
+            entity_data = _export_entity(entity)
             entity_data = add_vendor_data(
                 entity_data, id=generate_universal_id(entity_id=entity_data.get('id'), **record_id_base_data)
             )
@@ -340,7 +538,7 @@ def iter_collect_entities_per_page_graph(job_scope: JobScope) -> Generator[Dict[
             store(entity_data)
 
             # Signal to the system the new entity
-            feedback_entity_task.delay(entity_data, entity_type)
+            feedback(entity_data)
             yield entity_data
 
 
@@ -362,7 +560,7 @@ def iter_collect_entities_per_page_post(job_scope: JobScope) -> Generator[Dict[s
 
     with ChunkDumpStore(job_scope, chunk_size=DEFAULT_CHUNK_SIZE) as store:
         for entity in entities:
-            entity_data = entity.export_all_data()
+            entity_data = _export_entity(entity)
             entity_data = add_vendor_data(
                 entity_data, id=generate_universal_id(entity_id=entity_data.get('id'), **record_id_base_data)
             )
@@ -374,3 +572,7 @@ def iter_collect_entities_per_page_post(job_scope: JobScope) -> Generator[Dict[s
             store(entity_data)
 
             yield entity_data
+
+    if jobs_config.PAGE_POST_INLINE_COMMENTS_ENABLED:
+        # all Comments of the PagePost are collected now
+        PagePostsPendingComments(job_scope.ad_account_id).remove(job_scope.entity_id)
@@ -2,7 +2,11 @@ import xxhash
 
 from collections import namedtuple
 from facebook_business.adobjects import ad
+from typing import Dict, List, Set
 
+from common.connect.redis import get_redis
+from common.measurement import Measure
+from config import jobs as jobs_config
 from oozer.common.enum import FB_CAMPAIGN_MODEL, FB_ADSET_MODEL, FB_AD_MODEL
 from oozer.common.facebook_api import get_default_fields
 from oozer.common.job_context import JobContext
@@ -20,13 +24,14 @@ class EntityHash(namedtuple('EntityHash', ['data', 'fields'])):
         return self.data == other.data and self.fields == other.fields
 
 
-def _checksum_entity(entity, fields=None) -> EntityHash:
+def _checksum_entity(entity, fields=None, fb_model_klass=None) -> EntityHash:
     """
     Compute a hash of the entity fields that we consider stable, to be able
     to tell apart entities that have / have not changed in between runs.
 
     This method requires an intrinsic knowledge of "what the entity is".
 
+    :param entity: SDK object, or plain dict of its data (then fb_model_klass says what it is)
     :return EntityHash: The hashes for the entity itself and
         and fields hashed
     """
@@ -34,12 +39,13 @@ def _checksum_entity(entity, fields=None) -> EntityHash:
     # Drop fields we don't care about
     blacklist = {FB_CAMPAIGN_MODEL: [], FB_ADSET_MODEL: [], FB_AD_MODEL: [ad.Ad.Field.recommendations]}
 
-    fields = fields or get_default_fields(entity.__class__)
+    fb_model_klass = fb_model_klass or entity.__class__
+    fields = fields or get_default_fields(fb_model_klass)
 
     # Run through blacklist
-    fields = filter(lambda f: f not in blacklist[entity.__class__], fields)
+    fields = filter(lambda f: f not in blacklist[fb_model_klass], fields)
 
-    raw_data = entity.export_all_data()
+    raw_data = entity if isinstance(entity, dict) else entity.export_all_data()
 
     data_hash = xxhash.xxh64()
     fields_hash = xxhash.xxh64()
@@ -62,3 +68,82 @@ def _checksum_from_job_context(job_context: JobContext, entity_id: str) -> Entit
     """
     current_hash_raw = job_context.entity_checksums.get(entity_id, (None, None))
     return EntityHash(*current_hash_raw)
+
+
+class EntityHashStore:
+    """
+    Last collected EntityHash of every entity of one type in an ad account, kept in one Redis hash
+
+    Example::
+
+        with EntityHashStore(ad_account_id, entity_type) as entity_hashes:
+            for entity in entities:
+                if entity_hashes.is_changed(entity['id'], _checksum_entity(entity)):
+                    store(entity)
+
+    New hashes are written only when the block exits without error, as only then
+    we know changed entities made it to cold storage.
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(self, ad_account_id: str, entity_type: str, enabled: bool = True, prune_unseen: bool = True):
+        """
+        :param enabled: When not, store does nothing and reports all entities as changed
+        :param prune_unseen: Whether to forget entities not seen in this collection.
+            Off when only some of the entities are collected (incremental collection).
+        """
+        self.enabled = enabled
+        self.prune_unseen = prune_unseen
+        self.ad_account_id = ad_account_id
+        self.entity_type = entity_type
+        self.key = f'{ad_account_id}:{entity_type}:{self.__class__.__name__}'
+        self.redis = get_redis()
+
+        self._known: Dict[str, str] = {}
+        self._changed: Dict[str, str] = {}
+        self._seen: Set[str] = set()
+
+    def __enter__(self) -> 'EntityHashStore':
+        if not self.enabled:
+            return self
+        self._known = {
+            entity_id.decode('utf8'): value.decode('utf8') for entity_id, value in self.redis.hgetall(self.key).items()
+        }
+        return self
+
+    def is_changed(self, entity_id: str, entity_hash: EntityHash) -> bool:
+        if not self.enabled:
+            return True
+        value = entity_hash.data + entity_hash.fields
+        self._seen.add(entity_id)
+        if self._known.get(entity_id) == value:
+            return False
+        self._changed[entity_id] = value
+        return True
+
+    def _save(self, gone: List[str]):
+        pipeline = self.redis.pipeline(transaction=False)
+        changed = list(self._changed.items())
+        for start in range(0, len(changed), self.BATCH_SIZE):
+            pipeline.hmset(self.key, dict(changed[start : start + self.BATCH_SIZE]))
+        for start in range(0, len(gone), self.BATCH_SIZE):
+            pipeline.hdel(self.key, *gone[start : start + self.BATCH_SIZE])
+        if not self._known and changed:
+            # Expiry is set only on creation, so that all entities are written out again once in a while
+            pipeline.expire(self.key, jobs_config.ENTITY_HASH_TTL)
+        pipeline.execute()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self.enabled or exc_type is not None:
+            return
+
+        if self._seen:
+            Measure.histogram(
+                f'{__name__}.change_rate', tags={'ad_account_id': self.ad_account_id, 'entity_type': self.entity_type}
+            )(len(self._changed) / len(self._seen))
+
+        # entities no longer there
+        gone = [entity_id for entity_id in self._known if entity_id not in self._seen] if self.prune_unseen else []
+        if self._changed or gone:
+            self._save(gone)
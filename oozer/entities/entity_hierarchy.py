@@ -0,0 +1,87 @@
+"""
+Collection of Campaigns, AdSets and Ads of an AdAccount in one pass, through nested field expansion.
+
+Instead of paging each of the three AdAccount edges separately, Campaigns are asked for
+with their AdSets, and AdSets' Ads, expanded in place::
+
+    act_123/campaigns?fields=id,name,...,adsets.limit(25){id,name,...,ads.limit(50){id,name,...}}&limit=10
+
+Every nested edge comes with paging of its own. When a Campaign has more AdSets (or an AdSet more Ads)
+than fit the nested limit, rest of them is paged from "next" URL of the nested edge.
+"""
+from typing import Any, Dict, Generator, List, Sequence, Tuple
+
+from facebook_business.api import FacebookAdsApi
+
+from common.enums.entity import Entity
+from common.measurement import Measure
+from config import jobs as jobs_config
+from oozer.common.enum import ENUM_VALUE_FB_MODEL_MAP, FB_ADACCOUNT_MODEL
+from oozer.common.facebook_api import get_default_fields
+from oozer.common.raw_paging import RawCursor
+
+HIERARCHY_ENTITY_TYPES = (Entity.Campaign, Entity.AdSet, Entity.Ad)
+
+_NESTED_EDGE_NAMES = {Entity.AdSet: 'adsets', Entity.Ad: 'ads'}
+
+
+def _get_limit(entity_type: str) -> int:
+    return {
+        Entity.Campaign: jobs_config.ENTITY_HIERARCHY_CAMPAIGN_LIMIT,
+        Entity.AdSet: jobs_config.ENTITY_HIERARCHY_ADSET_LIMIT,
+        Entity.Ad: jobs_config.ENTITY_HIERARCHY_AD_LIMIT,
+    }[entity_type]
+
+
+def get_nested_fields(entity_types: Sequence[str] = HIERARCHY_ENTITY_TYPES) -> List[str]:
+    """
+    Fields of first of the entity types, with the rest of them expanded in place, one in another
+    """
+    entity_type, child_entity_types = entity_types[0], entity_types[1:]
+    fields = list(get_default_fields(ENUM_VALUE_FB_MODEL_MAP[entity_type]))
+    if child_entity_types:
+        child_entity_type = child_entity_types[0]
+        child_fields = ','.join(get_nested_fields(child_entity_types))
+        fields.append(
+            f'{_NESTED_EDGE_NAMES[child_entity_type]}.limit({_get_limit(child_entity_type)}){{{child_fields}}}'
+        )
+    return fields
+
+
+def _iter_flattened(
+    api: FacebookAdsApi, entity_data: Dict[str, Any], entity_types: Sequence[str]
+) -> Generator[Tuple[str, Dict[str, Any]], None, None]:
+    entity_type, child_entity_types = entity_types[0], entity_types[1:]
+    nested_edge = entity_data.pop(_NESTED_EDGE_NAMES[child_entity_types[0]], None) if child_entity_types else None
+
+    yield entity_type, entity_data
+
+    # FB leaves out nested edges with nothing in them
+    if nested_edge is None:
+        return
+
+    for child_entity_data in nested_edge.get('data', []):
+        yield from _iter_flattened(api, child_entity_data, child_entity_types)
+
+    next_url = nested_edge.get('paging', {}).get('next')
+    if next_url:
+        Measure.increment(f'{__name__}.nested_edge_paged', tags={'entity_type': child_entity_types[0]})(1)
+        for child_entity_data in RawCursor.from_next_url(api, next_url):
+            yield from _iter_flattened(api, child_entity_data, child_entity_types)
+
+
+def iter_nested_entity_hierarchy(ad_account: FB_ADACCOUNT_MODEL) -> Generator[Tuple[str, Dict[str, Any]], None, None]:
+    """
+    Campaigns, AdSets and Ads of the AdAccount as (entity type, entity data) pairs
+
+    Entities are plain dicts, like with raw paging (see oozer.common.raw_paging),
+    and each comes out right before its children.
+    """
+    campaigns = RawCursor(
+        ad_account.get_campaigns(
+            fields=get_nested_fields(), params={'summary': False, 'limit': _get_limit(Entity.Campaign)}, pending=True,
+        )
+    )
+    api = ad_account.get_api_assured()
+    for campaign_data in campaigns:
+        yield from _iter_flattened(api, campaign_data, HIERARCHY_ENTITY_TYPES)
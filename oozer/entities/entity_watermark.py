@@ -0,0 +1,96 @@
+import time
+
+from dateutil.parser import parse as parse_iso_datetime_string
+from typing import Any, Dict, Optional
+
+from common.connect.redis import get_redis
+from common.measurement import Measure
+from config import jobs as jobs_config
+
+
+class EntityWatermark:
+    """
+    High-water updated_time of entities of one type in an ad account, as of last successful collection
+
+    Example::
+
+        watermark = EntityWatermark(ad_account_id, entity_type)
+        entities = get_entities(updated_since=watermark.updated_since)
+        with watermark:
+            for entity in entities:
+                watermark.observe(entity)
+                store(entity)
+
+    When there is no watermark yet, or last full collection is older than
+    ENTITY_FULL_COLLECTION_INTERVAL, updated_since is None and all entities are to be collected.
+    New watermark is written only when the block exits without error.
+    """
+
+    def __init__(self, ad_account_id: str, entity_type: str, enabled: bool = True):
+        """
+        :param enabled: When not, watermark does nothing and all entities are to be collected every time
+        """
+        self.enabled = enabled
+        self.ad_account_id = ad_account_id
+        self.entity_type = entity_type
+        self.key = f'{ad_account_id}:{entity_type}:{self.__class__.__name__}'
+
+        self.started_at = int(time.time())
+        self.is_incremental = False
+        self._stored_updated_time: Optional[int] = None
+        self._high_water: Optional[int] = None
+
+        if not enabled:
+            return
+
+        self.redis = get_redis()
+        stored = self.redis.hgetall(self.key)
+        updated_time = stored.get(b'updated_time')
+        full_collected_at = stored.get(b'full_collected_at')
+        if updated_time is not None and full_collected_at is not None:
+            self._stored_updated_time = self._high_water = int(updated_time)
+            self.is_incremental = self.started_at - int(full_collected_at) < jobs_config.ENTITY_FULL_COLLECTION_INTERVAL
+
+        Measure.increment(
+            f'{__name__}.collection_mode',
+            tags={'entity_type': entity_type, 'mode': 'incremental' if self.is_incremental else 'full'},
+        )(1)
+
+    @property
+    def updated_since(self) -> Optional[int]:
+        """
+        :return: Unix timestamp entities updated after are to be collected, or None for all entities
+        """
+        if not self.is_incremental:
+            return None
+        return self._stored_updated_time - jobs_config.ENTITY_INCREMENTAL_OVERLAP
+
+    def observe(self, entity_data: Dict[str, Any]):
+        updated_time = entity_data.get('updated_time')
+        if not updated_time:
+            return
+        updated_time = int(parse_iso_datetime_string(updated_time).timestamp())
+        if self._high_water is None or updated_time > self._high_water:
+            self._high_water = updated_time
+
+    def __enter__(self) -> 'EntityWatermark':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self.enabled or exc_type is not None:
+            return
+
+        mapping = {}
+        if self.is_incremental:
+            if self._high_water != self._stored_updated_time:
+                mapping['updated_time'] = self._high_water
+        else:
+            # Nothing seen in full collection means nothing was updated before it started
+            mapping['updated_time'] = self.started_at if self._high_water is None else self._high_water
+            mapping['full_collected_at'] = self.started_at
+
+        if mapping:
+            pipeline = self.redis.pipeline(transaction=False)
+            pipeline.hmset(self.key, mapping)
+            pipeline.expire(self.key, jobs_config.ENTITY_WATERMARK_TTL)
+            pipeline.execute()
@@ -1,8 +1,9 @@
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple, Type
 
 from dateutil.parser import parse as parse_iso_datetime_string
 
+from common.store.base import BaseModel
 from common.store.entities import ENTITY_TYPE_MODEL_MAP, AdAccountEntity
 from common.store.scope import DEFAULT_SCOPE
 from common.tztools import dt_to_other_timezone, now
@@ -30,6 +31,30 @@ def _parse_fb_datetime(value) -> Optional[datetime]:
 
 _eol_status = {'ARCHIVED', 'DELETED'}
 
+# Everything _upsert_regular_entity looks at. Rest of the entity is of no interest to feedback.
+FEEDBACK_FIELDS = (
+    'id',
+    'account_id',
+    'page_id',
+    'campaign_id',
+    'adset_id',
+    'created_time',
+    'updated_time',
+    'time_created',
+    'time_updated',
+    'configured_status',
+    'effective_status',
+    'status',
+)
+
+
+def trim_entity_data(entity_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Leaves only the fields needed to feedback the entity, so that
+    what is sent over the broker stays small
+    """
+    return {field: entity_data[field] for field in FEEDBACK_FIELDS if entity_data.get(field) is not None}
+
 
 def feedback_entity(entity_data: Dict[str, Any], entity_type: str):
     """
@@ -70,7 +95,14 @@ def determine_ad_account_id(entity_data: Dict[str, Any], entity_type: str) -> st
     return ad_account_id
 
 
-def _upsert_regular_entity(entity_data: Dict[str, Any], entity_type: str):
+def prepare_regular_entity_upsert(
+    entity_data: Dict[str, Any], entity_type: str
+) -> Tuple[Type[BaseModel], str, str, Dict[str, Any]]:
+    """
+    Works out what to write for a (non ad account) entity
+
+    :return: Model, ad account id, entity id and the upsert data
+    """
     if entity_type not in Entity.ALL:
         raise ValueError(f'Argument "entity_type" must be one of {Entity.ALL}. Received "{entity_type}" instead.')
     if not isinstance(entity_data, dict):
@@ -127,5 +159,10 @@ def _upsert_regular_entity(entity_data: Dict[str, Any], entity_type: str):
     if eol:
         upsert_data['eol'] = Model.eol | eol  # allow previously computed value to stand against new value
 
+    return Model, ad_account_id, entity_id, upsert_data
+
+
+def _upsert_regular_entity(entity_data: Dict[str, Any], entity_type: str):
+    Model, ad_account_id, entity_id, upsert_data = prepare_regular_entity_upsert(entity_data, entity_type)
     if upsert_data:
         Model.upsert(ad_account_id, entity_id, **upsert_data)
@@ -1,9 +1,18 @@
 import logging
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
+
+import gevent
+import gevent.pool
 from pynamodb.exceptions import PutError, UpdateError
 
 from common.error_inspector import ErrorInspector
-from oozer.entities.feedback_entity import feedback_entity, determine_ad_account_id
+from config import jobs as jobs_config
+from oozer.entities.feedback_entity import (
+    feedback_entity,
+    determine_ad_account_id,
+    prepare_regular_entity_upsert,
+    trim_entity_data,
+)
 from common.celeryapp import get_celery_app
 from common.measurement import Measure
 
@@ -49,3 +58,95 @@ def feedback_entity_task(entity_data: Dict[str, Any], entity_type: str):
             logger.info(str(ex))
         else:
             raise
+
+
+def _extract_tags_for_feedback_entities(entities_data: List[Dict[str, Any]], entity_type: str, *__, **___):
+    ad_account_id = determine_ad_account_id(entities_data[0], entity_type) if entities_data else None
+    return {'entity_type': entity_type, 'ad_account_id': ad_account_id}
+
+
+def _upsert_regular_entity_with_retries(entity_data: Dict[str, Any], entity_type: str) -> bool:
+    """
+    :return: Whether the entity got written. False when throughput kept being exceeded even after retries.
+    """
+    Model, ad_account_id, entity_id, upsert_data = prepare_regular_entity_upsert(entity_data, entity_type)
+    retries = jobs_config.ENTITY_FEEDBACK_THROUGHPUT_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            Model.upsert(ad_account_id, entity_id, **upsert_data)
+            return True
+        except UpdateError as ex:
+            if not ErrorInspector.is_dynamo_throughput_error(ex):
+                raise
+            if attempt == retries:
+                logger.info(str(ex))
+            else:
+                gevent.sleep(jobs_config.ENTITY_FEEDBACK_THROUGHPUT_BACKOFF * 2 ** attempt)
+    return False
+
+
+@app.task
+@Measure.timer(
+    __name__,
+    function_name_as_metric=True,
+    extract_tags_from_arguments=_extract_tags_for_feedback_entities,
+    sample_rate=0.1,
+)
+@Measure.counter(
+    __name__,
+    function_name_as_metric=True,
+    count_once=True,
+    extract_tags_from_arguments=_extract_tags_for_feedback_entities,
+    sample_rate=0.1,
+)
+def feedback_entities_task(entities_data: List[Dict[str, Any]], entity_type: str):
+    """
+    Batched version of feedback_entity_task for entities of one type (other than ad account)
+
+    Entities are written with conditional updates (so that bol / eol already in the store stand),
+    a few at a time, to not eat all of table's write capacity at once.
+
+    :param entities_data: The entities we're feeding back to the system, trimmed to feedback fields
+    :param entity_type: Type of the entities, a string representation
+    """
+    pool = gevent.pool.Pool(size=jobs_config.ENTITY_FEEDBACK_CONCURRENCY)
+    written = pool.imap_unordered(
+        lambda entity_data: _upsert_regular_entity_with_retries(entity_data, entity_type), entities_data
+    )
+    not_written = sum(1 for is_written in written if not is_written)
+    if not_written:
+        Measure.counter(
+            feedback_entities_task.__name__ + '.throughput_exceptions',
+            tags=_extract_tags_for_feedback_entities(entities_data, entity_type),
+        ).increment(not_written)
+
+
+class EntityFeedbackBuffer:
+    """
+    Collects entities to feedback during a collection task and sends
+    them out in batches, with only the fields feedback needs.
+
+    Use as a context manager, so that what is left in the buffer gets sent out at the end.
+    """
+
+    def __init__(self, entity_type: str, batch_size: Optional[int] = None):
+        self.entity_type = entity_type
+        self.batch_size = batch_size or jobs_config.ENTITY_FEEDBACK_BATCH_SIZE
+        self._buffer: List[Dict[str, Any]] = []
+
+    def __call__(self, entity_data: Dict[str, Any]):
+        self._buffer.append(trim_entity_data(entity_data))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            feedback_entities_task.delay(self._buffer, self.entity_type)
+            self._buffer = []
+
+    def __enter__(self) -> 'EntityFeedbackBuffer':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # entities collected before a failure are in cold storage already, so they are fed back too
+        self.flush()
@@ -1,5 +1,8 @@
 import logging
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Set, Type
 
+import gevent.pool
 from pynamodb.exceptions import PutError
 
 from common.error_inspector import ErrorInspector
@@ -8,10 +11,13 @@ from common.celeryapp import get_celery_app
 from common.enums.entity import Entity
 from facebook_business.exceptions import FacebookRequestError
 from common.page_tokens import PageTokenManager
-from common.store.entities import AdAccountEntity, PageEntity
+from common.store.entities import AdAccountEntity, ConsoleEntityMixin, PageEntity
 from common.tokens import PlatformTokenManager
+from config import facebook as facebook_config
+from config import jobs as jobs_config
 from oozer.common.console_api import ConsoleApi
-from oozer.common.facebook_api import PlatformApiContext, get_default_fields
+from oozer.common.enum import to_fb_model
+from oozer.common.facebook_api import PlatformApiContext
 from oozer.common.helpers import extract_tags_for_celery_fb_task
 from oozer.common.job_scope import JobScope
 from oozer.reporting import reported_task
@@ -75,11 +81,108 @@ def _have_entity_access(entity_type: str, entity_id: str, access_token: str) ->
     """
     with PlatformApiContext(access_token) as fb_ctx:
         entity = fb_ctx.to_fb_model(entity_id, entity_type)
-        fields = get_default_fields(entity.__class__)
-        entity_data = entity.api_get(fields=fields)
+        # reading just the ID is as good a test of access as reading all of the fields
+        entity.api_get(fields=['id'])
         return True
 
 
+def _get_accessible_entity_ids(entity_type: str, entity_ids: List[str], access_token: str) -> Set[str]:
+    """
+    Entities of the given ones we have access to, tested with one multiple ID read (ids=...) of just their IDs
+
+    FB fails the whole read when any of the entities is not accessible, in which case
+    the entities are tested one by one.
+    """
+    fbids = {to_fb_model(entity_id, entity_type).get_id(): entity_id for entity_id in entity_ids}
+    try:
+        with PlatformApiContext(access_token) as fb_ctx:
+            response = fb_ctx.api.call(
+                'GET', ('',), params={'ids': ','.join(fbids), 'fields': 'id'}, url_override=facebook_config.GRAPH_URL
+            ).json()
+        return {fbids[fbid] for fbid in response if fbid in fbids}
+    except FacebookRequestError:
+        Measure.increment(f'{__name__}.access_check_fallback', tags={'entity_type': entity_type})(1)
+
+    accessible_entity_ids = set()
+    for entity_id in entity_ids:
+        try:
+            if _have_entity_access(entity_type, entity_id, access_token):
+                accessible_entity_ids.add(entity_id)
+        except FacebookRequestError:
+            logger.exception(f'Error when testing account accessibility {entity_type} {entity_id}')
+    return accessible_entity_ids
+
+
+def _upsert_entity_from_console(
+    entity_type: str, entity_model: Type[ConsoleEntityMixin], job_scope: JobScope, entity, is_accessible: bool
+) -> bool:
+    """
+    :return: Whether the entity got written. False when throughput was exceeded.
+    """
+    entity_id = entity['ad_account_id']
+    is_active = entity.get('active', True)
+    tags = {
+        'entity_type': entity_type,
+        'entity_id': entity_id,
+        'is_accessible': is_accessible,
+        'is_active': is_active,
+    }
+    Measure.counter('console_entity_import', tags=tags).increment()
+
+    try:
+        logger.warning(f'Importing {entity_type} {entity_id} is_accessible: {is_accessible} is_active: {is_active}')
+        entity_model.upsert_entity_from_console(job_scope, entity, is_accessible)
+        return True
+    except PutError as ex:
+        if ErrorInspector.is_dynamo_throughput_error(ex):
+            # just log and get out. Next time around we'll pick it up
+            ErrorInspector.inspect(ex)
+            return False
+        raise
+
+
+def _import_entities_concurrently(
+    entity_type: str,
+    entity_model: Type[ConsoleEntityMixin],
+    get_access_token: Callable[[str], str],
+    entities: List[Dict[str, Any]],
+    job_scope: JobScope,
+) -> int:
+    """
+    Same as importing entities one by one, but with access tests batched per access token
+    and all of it done CONSOLE_IMPORT_CONCURRENCY requests at a time
+    """
+    tags = {'entity_type': entity_type}
+    pool = gevent.pool.Pool(size=jobs_config.CONSOLE_IMPORT_CONCURRENCY)
+
+    with Measure.timer(f'{__name__}.access_check', tags=tags):
+        entity_ids_per_token = defaultdict(list)
+        for entity in entities:
+            entity_id = entity['ad_account_id']
+            entity_ids_per_token[get_access_token(entity_id)].append(entity_id)
+
+        batch_size = jobs_config.CONSOLE_IMPORT_ACCESS_CHECK_BATCH_SIZE
+        batches = [
+            (entity_ids[start : start + batch_size], access_token)
+            for access_token, entity_ids in entity_ids_per_token.items()
+            for start in range(0, len(entity_ids), batch_size)
+        ]
+        accessible_entity_ids = set()
+        for batch_accessible_entity_ids in pool.imap_unordered(
+            lambda batch: _get_accessible_entity_ids(entity_type, *batch), batches
+        ):
+            accessible_entity_ids |= batch_accessible_entity_ids
+
+    with Measure.timer(f'{__name__}.upsert', tags=tags):
+        written = pool.imap(
+            lambda entity: _upsert_entity_from_console(
+                entity_type, entity_model, job_scope, entity, entity['ad_account_id'] in accessible_entity_ids
+            ),
+            entities,
+        )
+        return sum(1 for is_written in written if is_written)
+
+
 def _import_entities_from_console(entity_type: str, job_scope: JobScope):
     page_token_manager = PageTokenManager(JobScope.namespace, job_scope.sweep_id)
     ad_account_token_manager = PlatformTokenManager(JobScope.namespace, job_scope.sweep_id)
@@ -104,11 +207,15 @@ def _import_entities_from_console(entity_type: str, job_scope: JobScope):
         )
     entity_extractor, entity_model, get_access_token = entity_type_map[entity_type]
 
-    entities = entity_extractor(job_scope.token)
+    with Measure.timer(f'{__name__}.console_fetch', tags={'entity_type': entity_type}):
+        entities = list(_get_entities_to_import(entity_extractor(job_scope.token), 'ad_account_id'))
+
+    if jobs_config.CONSOLE_IMPORT_CONCURRENCY_ENABLED:
+        return _import_entities_concurrently(entity_type, entity_model, get_access_token, entities, job_scope)
+
     imported_entities = 0
-    for entity in _get_entities_to_import(entities, 'ad_account_id'):
+    for entity in entities:
         entity_id = entity['ad_account_id']
-        is_active = entity.get('active', True)
         access_token = get_access_token(entity_id)
         is_accessible = False
         try:
@@ -117,24 +224,9 @@ def _import_entities_from_console(entity_type: str, job_scope: JobScope):
             #  On purpose not sending to inspector, since that would result in 'unknown' exceptions in ddog.
             # We use other metric for tracking accounts that were not imported.
             logger.exception(f'Error when testing account accessibility {entity_type} {entity_id}')
-        tags = {
-            'entity_type': entity_type,
-            'entity_id': entity_id,
-            'is_accessible': is_accessible,
-            'is_active': is_active,
-        }
-        Measure.counter('console_entity_import', tags=tags).increment()
 
-        try:
-            logger.warning(f'Importing {entity_type} {entity_id} is_accessible: {is_accessible} is_active: {is_active}')
-            entity_model.upsert_entity_from_console(job_scope, entity, is_accessible)
+        if _upsert_entity_from_console(entity_type, entity_model, job_scope, entity, is_accessible):
             imported_entities += 1
-        except PutError as ex:
-            if ErrorInspector.is_dynamo_throughput_error(ex):
-                # just log and get out. Next time around we'll pick it up
-                ErrorInspector.inspect(ex)
-            else:
-                raise
     return imported_entities
 
 
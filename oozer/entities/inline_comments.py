@@ -0,0 +1,123 @@
+"""
+Collection of Comments inline with PagePosts of a Page.
+
+Instead of a separate per-PagePost Comments job for every PagePost, PagePosts are asked for
+with first PAGE_POST_INLINE_COMMENTS_LIMIT of their Comments expanded in place, along with
+total count of their Comments::
+
+    page_id/posts?fields=id,message,...,comments.limit(25).summary(true).filter(stream){id,message,...}
+
+Only PagePosts with more Comments than that, whose count of Comments changed since it was last
+seen, are noted (PagePostsPendingComments) for Sweep Builder to expect per-PagePost Comments job for.
+"""
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from common.connect.redis import get_redis
+from common.measurement import Measure
+from config import jobs as jobs_config
+from oozer.common.enum import FB_COMMENT_MODEL
+from oozer.common.facebook_api import get_default_fields
+
+_INLINE_COMMENTS_EDGE_NAME = 'comments'
+
+
+def get_inline_comments_field() -> str:
+    comment_fields = ','.join(get_default_fields(FB_COMMENT_MODEL))
+    return (
+        f'{_INLINE_COMMENTS_EDGE_NAME}.limit({jobs_config.PAGE_POST_INLINE_COMMENTS_LIMIT})'
+        f'.summary(true).filter(stream){{{comment_fields}}}'
+    )
+
+
+def pop_inline_comments(page_post_data: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """
+    Comments expanded in PagePost data, and total count of Comments of the PagePost
+
+    Total count is None when FB did not say (no summary), in which case
+    Comments of the PagePost are to be collected by per-PagePost job.
+    """
+    comments_edge = page_post_data.pop(_INLINE_COMMENTS_EDGE_NAME, None)
+    if comments_edge is None:
+        # FB leaves out edges with nothing in them
+        return [], 0
+
+    total_count = comments_edge.get('summary', {}).get('total_count')
+    return comments_edge.get('data', []), total_count
+
+
+class PagePostsPendingComments:
+    """
+    PagePosts of a Page whose Comments did not all fit inline, and are to be collected by per-PagePost job
+    """
+
+    def __init__(self, page_id: str):
+        self.key = f'{page_id}:{self.__class__.__name__}'
+
+    def add(self, page_post_ids: Set[str]):
+        if not page_post_ids:
+            return
+        pipeline = get_redis().pipeline(transaction=False)
+        pipeline.sadd(self.key, *page_post_ids)
+        pipeline.expire(self.key, jobs_config.PAGE_POST_COMMENT_COUNTS_TTL)
+        pipeline.execute()
+
+    def remove(self, page_post_id: str):
+        get_redis().srem(self.key, page_post_id)
+
+    def get_all(self) -> Set[str]:
+        return {page_post_id.decode('utf-8') for page_post_id in get_redis().smembers(self.key)}
+
+
+class PagePostCommentCounts:
+    """
+    Counts of Comments of PagePosts of a Page, as of last PagePosts collection
+
+    Example::
+
+        with PagePostCommentCounts(page_id) as comment_counts:
+            for page_post_data in page_posts:
+                comments, total_count = pop_inline_comments(page_post_data)
+                comment_counts.observe(page_post_data['id'], len(comments), total_count)
+
+    PagePosts that have Comments not collected inline and changed count of them
+    are noted as pending Comments collection when the block exits.
+    """
+
+    def __init__(self, page_id: str):
+        self.page_id = page_id
+        self.key = f'{page_id}:{self.__class__.__name__}'
+        self.redis = get_redis()
+        self._stored_counts = {
+            page_post_id.decode('utf-8'): int(count) for page_post_id, count in self.redis.hgetall(self.key).items()
+        }
+        self._counts: Dict[str, int] = {}
+        self._pending_page_post_ids: Set[str] = set()
+
+    def observe(self, page_post_id: str, inline_count: int, total_count: Optional[int]):
+        if total_count is None:
+            self._pending_page_post_ids.add(page_post_id)
+            return
+
+        self._counts[page_post_id] = total_count
+        if total_count > inline_count and total_count != self._stored_counts.get(page_post_id):
+            self._pending_page_post_ids.add(page_post_id)
+
+    def __enter__(self) -> 'PagePostCommentCounts':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # comments collected inline were stored, even if the collection broke later on
+        if self._counts:
+            pipeline = self.redis.pipeline(transaction=False)
+            pipeline.hmset(self.key, self._counts)
+            pipeline.expire(self.key, jobs_config.PAGE_POST_COMMENT_COUNTS_TTL)
+            pipeline.execute()
+
+        PagePostsPendingComments(self.page_id).add(self._pending_page_post_ids)
+
+        Measure.counter(f'{__name__}.page_posts_pending_comments', tags={'page_id': self.page_id}).increment(
+            len(self._pending_page_post_ids)
+        )
+        Measure.counter(f'{__name__}.page_posts_comments_inline', tags={'page_id': self.page_id}).increment(
+            len(self._counts) - len(self._pending_page_post_ids & self._counts.keys())
+        )
@@ -42,7 +42,7 @@ def run_tasks(sweep_id: str) -> Tuple[int, Pulse]:
 
     last_score = None
     with TaskOozer(sweep_id, sweep_tracker, pulse_review_interval, stop_oozing_time) as oozer:
-        for celery_task, job_scope, job_context, score in producer.iter_tasks():
+        for celery_task, job_scope, job_context, score in producer.iter_tasks(stop_oozing_time):
             last_score = score
             if oozer.should_terminate():
                 break
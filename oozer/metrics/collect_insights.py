@@ -1,25 +1,33 @@
-import functools
 import gevent
 
 from datetime import datetime, date
 from facebook_business.adobjects.adreportrun import AdReportRun
 from facebook_business.adobjects.adsinsights import AdsInsights
-from typing import Dict, Any, Generator
+from facebook_business.exceptions import FacebookRequestError
+from pynamodb.exceptions import DoesNotExist
+from typing import Dict, Any, Generator, Iterable, Optional
 
 from common.enums.entity import Entity
+from common.enums.failure_bucket import FailureBucket
 from common.enums.reporttype import ReportType
+from common.measurement import Measure
+from common.store.jobreport import JobReport
 from common.tokens import PlatformTokenManager
+from common.tztools import date_range
+from config import facebook as facebook_config
+from config import jobs as jobs_config
 from oozer.common.cold_storage import batch_store
 from oozer.common.cold_storage.batch_store import BaseStoreHandler
+from oozer.common.day_finality import DayContentHashes
 from oozer.common.enum import ReportEntityApiKind
-from oozer.common.facebook_api import PlatformApiContext
+from oozer.common.facebook_api import PlatformApiContext, FacebookApiErrorInspector
 from oozer.common.facebook_async_report import FacebookAsyncReportStatus
 from oozer.common.job_scope import JobScope
-from oozer.common.vendor_data import add_vendor_data
+from oozer.common.raw_paging import RawCursor, supports_raw_paging
 
 from oozer.metrics.constants import ENUM_LEVEL_MAP, REPORT_TYPE_FB_BREAKDOWN_ENUM, DEFAULT_REPORT_FIELDS
-from oozer.metrics.field_transformation import FieldTransformation
-from oozer.metrics.vendor_data_extractor import report_type_vendor_data_extractor_map
+from oozer.metrics.recent_delivery import DELIVERY_AWARE_LEVELS, LifetimeCollectionScope, RecentDeliveryObserver
+from oozer.metrics.row_processor import InsightsRowProcessor
 
 
 def _convert_and_validate_date_format(dt) -> str:
@@ -40,13 +48,62 @@ def _convert_and_validate_date_format(dt) -> str:
     return dt.strftime('%Y-%m-%d')
 
 
+# Typical number of rows per entity per day, for report types we are comfortable guessing for.
+# Reports by geography vary in size too much to guess.
+_ROWS_PER_ENTITY_DAY = {
+    ReportType.lifetime: 1,
+    ReportType.day: 1,
+    # 7 age brackets x 3 genders
+    ReportType.day_age_gender: 21,
+    ReportType.day_hour: 24,
+    # publisher platform x platform position
+    ReportType.day_platform: 20,
+}
+
+
+def estimate_report_size(job_scope: JobScope) -> Optional[int]:
+    """
+    Guesses number of rows the insights report for the job will have
+
+    Size of the same report last time it was collected wins. Otherwise, only reports
+    for single entity are guessed, from report type and number of days in the range.
+    Per-parent reports' size depends on number of children at the level, which we don't know.
+
+    :return: Expected number of rows, or None when it cannot be guessed
+    """
+    try:
+        last_report = JobReport.get(job_scope.job_id)
+        if last_report.last_total_datapoint_count is not None:
+            return last_report.last_total_datapoint_count
+    except DoesNotExist:
+        pass
+
+    if not job_scope.entity_id:
+        return None
+
+    rows_per_day = _ROWS_PER_ENTITY_DAY.get(job_scope.report_type)
+    if rows_per_day is None or job_scope.report_type == ReportType.lifetime:
+        return rows_per_day
+
+    range_start = datetime.strptime(_convert_and_validate_date_format(job_scope.range_start), '%Y-%m-%d')
+    range_end = datetime.strptime(
+        _convert_and_validate_date_format(job_scope.range_end or job_scope.range_start), '%Y-%m-%d'
+    )
+    return rows_per_day * ((range_end - range_start).days + 1)
+
+
 class JobScopeParsed:
     report_params: Dict[str, Any] = None
     datum_handler: BaseStoreHandler = None
     report_root_fb_entity = None
     report_entity_kind: str = None
 
-    def __init__(self, job_scope: JobScope, report_entity_api_kind: str):
+    def __init__(
+        self, job_scope: JobScope, report_entity_api_kind: str, lifetime_scope_submitted: Dict[str, Any] = None
+    ):
+        """
+        :param lifetime_scope_submitted: Lifetime collection scope the (async) report was submitted with
+        """
         if job_scope.report_type not in ReportType.ALL_METRICS:
             raise ValueError(
                 f"Report type {job_scope.report_type} specified is not one of supported values: "
@@ -113,6 +170,44 @@ class JobScopeParsed:
                 f"Report type {job_scope.report_type} does not have a mapped Platform-side breakdown value."
             )
 
+        # Lifetime numbers change only for entities that delivered since last collection.
+        # See oozer.metrics.recent_delivery
+        is_delivery_aware = (
+            jobs_config.LIFETIME_DELIVERY_AWARE_ENABLED
+            and is_per_parent_report
+            and report_entity_api_kind == ReportEntityApiKind.Ad
+            and job_scope.report_type == ReportType.lifetime
+            and job_scope.report_variant in DELIVERY_AWARE_LEVELS
+        )
+        self.lifetime_scope = LifetimeCollectionScope(
+            job_scope.ad_account_id,
+            job_scope.report_variant,
+            enabled=is_delivery_aware,
+            submitted=lifetime_scope_submitted,
+        )
+        if self.lifetime_scope.entity_ids:
+            self.report_params.update(
+                filtering=[
+                    {
+                        'field': f'{ENUM_LEVEL_MAP[job_scope.report_variant]}.id',
+                        'operator': 'IN',
+                        'value': sorted(self.lifetime_scope.entity_ids),
+                    }
+                ]
+            )
+
+        # which entities do deliver, we learn from day report at Ad level
+        self.delivery_observer = RecentDeliveryObserver(
+            job_scope.ad_account_id,
+            enabled=(
+                jobs_config.LIFETIME_DELIVERY_AWARE_ENABLED
+                and is_per_parent_report
+                and report_entity_api_kind == ReportEntityApiKind.Ad
+                and job_scope.report_type == ReportType.day
+                and job_scope.report_variant == Entity.Ad
+            ),
+        )
+
         # Indicates that datum returned in a per-parent report is by itself
         # naturally mapped to some single normative job ,
         # meaning each element can be stored separately
@@ -171,28 +266,18 @@ class JobScopeParsed:
         # and (temporarily) get away from "normative" and single-datum writes
         # There are two ways we can get closer to bundled writes:
         #  - spool entire report in memory and flush out at the end, when we know we can tolerate that
-        #  - spool large chunks of report in memory and flush them periodically if we fear large sizes in report.
+        #  - spool large chunks of report to disk and flush them periodically if we fear large sizes in report.
+        #    (Row sizes differ by orders of magnitude between report types, so chunks are cut by bytes)
         if is_whole_report_bundle_write:
             self.datum_handler = batch_store.MemorySpoolStore(job_scope)
         else:
-            self.datum_handler = batch_store.ChunkDumpStore(job_scope, chunk_size=200)
+            self.datum_handler = batch_store.SpoolingChunkStore(job_scope)
 
         with PlatformApiContext(job_scope.token) as fb_ctx:
             self.report_root_fb_entity = fb_ctx.to_fb_model(entity_id, entity_type)
 
-        # here we configure code that will augment each datum with  record ID
-        vendor_data_extractor = report_type_vendor_data_extractor_map[job_scope.report_type]
-        if job_scope.report_type == ReportType.day_hour:
-            # hour report type's ID extractor function needs extra leading arg - timezone
-            vendor_data_extractor = functools.partial(vendor_data_extractor, job_scope.ad_account_timezone_name)
-
-        aux_data = {
-            'ad_account_id': job_scope.ad_account_id,
-            'entity_type': entity_type_reporting,
-            'report_type': job_scope.report_type,
-        }
-
-        self.augment_with_vendor_data = lambda data: add_vendor_data(data, **vendor_data_extractor(data, **aux_data))
+        # here we configure code that will augment each datum with record ID and remapped actions
+        self.process_row = InsightsRowProcessor(job_scope, entity_type_reporting, Insights._ACTIONS_FIELDS_TO_TRANSFORM)
 
 
 class Insights:
@@ -252,8 +337,48 @@ class Insights:
 
         return report_tracker.iter_report_data()
 
+    @staticmethod
+    def iter_ads_insights_sync(fb_entity: Any, report_params: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+        """
+        Reads the report inline, skipping report run creation and polling
+
+        Meant for small reports. When FB refuses to answer inline because there is too much data,
+        falls back to async report.
+
+        :param fb_entity: The ads api facebook entity instance
+        :param report_params: FB API report params
+        """
+        try:
+            # Cursor reads first page right away. Too large reports fail right here, before any data is out.
+            if facebook_config.RAW_PAGING_ENABLED and supports_raw_paging(fb_entity.get_insights):
+                return RawCursor(fb_entity.get_insights(params=report_params, pending=True))
+            cursor = fb_entity.get_insights(params=report_params)
+        except FacebookRequestError as ex:
+            _, failure_bucket = FacebookApiErrorInspector(ex).get_status_and_bucket()
+            if failure_bucket != FailureBucket.TooLarge:
+                raise
+            Measure.increment(f'{__name__}.sync_fallback_to_async')(1)
+            return Insights.iter_ads_insights(fb_entity, report_params)
+
+        return (ads_insights_object.export_all_data() for ads_insights_object in cursor)
+
+    @staticmethod
+    def prefers_sync(job_scope: JobScope) -> bool:
+        """
+        Whether the report for the job is expected to be small enough to be read inline
+        """
+        if not facebook_config.INSIGHTS_SYNC_ENABLED:
+            return False
+        expected_size = estimate_report_size(job_scope)
+        is_sync = expected_size is not None and expected_size <= facebook_config.INSIGHTS_SYNC_MAX_ROWS
+        Measure.increment(
+            f'{__name__}.report_mode',
+            tags={'report_type': job_scope.report_type, 'mode': 'sync' if is_sync else 'async'},
+        )(1)
+        return is_sync
+
     @classmethod
-    def iter_collect_insights(cls, job_scope: JobScope, _):
+    def iter_collect_insights(cls, job_scope: JobScope, _, prefer_sync: bool = None):
         """
         Central, *GENERIC* implementation of insights fetcher task
 
@@ -265,28 +390,105 @@ class Insights:
 
         :param job_scope: The JobScope as we get it from the task itself
         :param _: A job context we use for entity checksums
+        :param prefer_sync: Read the report inline. Decided per job, when not given.
         """
         if not job_scope.tokens:
             raise ValueError(f"Job {job_scope.job_id} cannot proceed. No platform tokens provided.")
 
+        if prefer_sync is None:
+            prefer_sync = cls.prefers_sync(job_scope)
+
+        scope_parsed = JobScopeParsed(job_scope, ReportEntityApiKind.Ad)
+        if scope_parsed.lifetime_scope.is_empty:
+            # nothing delivered, so lifetime numbers are as last collected
+            data_iter = iter(())
+        elif prefer_sync:
+            data_iter = cls.iter_ads_insights_sync(scope_parsed.report_root_fb_entity, scope_parsed.report_params)
+        else:
+            data_iter = cls.iter_ads_insights(scope_parsed.report_root_fb_entity, scope_parsed.report_params)
+
+        yield from cls._iter_store_insights(job_scope, scope_parsed, data_iter)
+
+    @classmethod
+    def start_ads_insights(cls, job_scope: JobScope) -> Optional[str]:
+        """
+        Submits async insights report for the job without waiting for it to complete
+
+        Used with central report run polling. See oozer.metrics.report_run_poller
+
+        :return: Report run ID, or None when there is nothing to report on
+        """
+        if not job_scope.tokens:
+            raise ValueError(f"Job {job_scope.job_id} cannot proceed. No platform tokens provided.")
+
+        scope_parsed = JobScopeParsed(job_scope, ReportEntityApiKind.Ad)
+        if scope_parsed.lifetime_scope.is_empty:
+            return None
+        if scope_parsed.lifetime_scope.enabled:
+            # report is downloaded (and lifetime collection recorded) with the scope it is submitted with
+            job_scope.lifetime_collection_scope = scope_parsed.lifetime_scope.to_dict()
+        report_status_obj: AdReportRun = scope_parsed.report_root_fb_entity.get_insights(
+            params=scope_parsed.report_params, is_async=True
+        )
+        PlatformTokenManager.from_job_scope(job_scope).report_usage(job_scope.token)
+        return report_status_obj[AdReportRun.Field.id]
+
+    @classmethod
+    def iter_download_insights(cls, report_run_id: str, job_scope: JobScope):
+        """
+        Reads and stores data of already completed async insights report
+
+        Second half of iter_collect_insights, for report runs submitted by start_ads_insights
+
+        :param report_run_id: ID of the report run the poller found complete
+        :param job_scope: The JobScope report run was submitted for
+        """
+        if not job_scope.tokens:
+            raise ValueError(f"Job {job_scope.job_id} cannot proceed. No platform tokens provided.")
+
+        scope_parsed = JobScopeParsed(
+            job_scope, ReportEntityApiKind.Ad, lifetime_scope_submitted=job_scope.lifetime_collection_scope
+        )
+        with PlatformApiContext(job_scope.token) as fb_ctx:
+            report_tracker = FacebookAsyncReportStatus(AdReportRun(report_run_id, api=fb_ctx.api))
+            # Poller saw it complete, but we need the status on our copy of the object too.
+            report_tracker.refresh()
+            data_iter = report_tracker.iter_report_data()
+
+            yield from cls._iter_store_insights(job_scope, scope_parsed, data_iter)
+
+    @staticmethod
+    def _iter_store_insights(job_scope: JobScope, scope_parsed: JobScopeParsed, data_iter):
         token = job_scope.token
         # We don't use it for getting a token. Something else that calls us does.
         # However, we use it to report usages of the token we got.
         token_manager = PlatformTokenManager.from_job_scope(job_scope)
 
-        scope_parsed = JobScopeParsed(job_scope, ReportEntityApiKind.Ad)
-        data_iter = cls.iter_ads_insights(scope_parsed.report_root_fb_entity, scope_parsed.report_params)
+        # Finality of days is tracked for per-AdAccount reports only. See oozer.common.day_finality
+        content_hashes = None
+        if (
+            jobs_config.DAY_REPORT_FINALITY_ENABLED
+            and job_scope.report_type in ReportType.ALL_DAY_BREAKDOWNS
+            and not job_scope.entity_id
+        ):
+            content_hashes = DayContentHashes(
+                date_range(
+                    datetime.strptime(scope_parsed.report_params['time_range']['since'], '%Y-%m-%d').date(),
+                    datetime.strptime(scope_parsed.report_params['time_range']['until'], '%Y-%m-%d').date(),
+                )
+            )
 
-        with scope_parsed.datum_handler as store:
+        # lifetime collection is recorded only after the store is done and all data is uploaded
+        with scope_parsed.lifetime_scope, scope_parsed.delivery_observer, scope_parsed.datum_handler as store:
             for cnt, datum in enumerate(data_iter):
                 # this computes values for and adds _oprm data object
-                # to each datum that passes through us.
-                scope_parsed.augment_with_vendor_data(datum)
-                datum_with_transformed_fields = FieldTransformation.transform(
-                    datum, Insights._ACTIONS_FIELDS_TO_TRANSFORM
-                )
+                # (and __transformed actions) to each datum that passes through us.
+                datum_with_transformed_fields = scope_parsed.process_row(datum)
 
                 store(datum_with_transformed_fields)
+                scope_parsed.delivery_observer.observe(datum_with_transformed_fields)
+                if content_hashes is not None:
+                    content_hashes.add(datum_with_transformed_fields)
                 yield datum_with_transformed_fields
 
                 if cnt % 1000 == 0:
@@ -296,3 +498,6 @@ class Insights:
                     token_manager.report_usage(token, 40)
 
         token_manager.report_usage(token)
+
+        if content_hashes is not None:
+            job_scope.content_hashes = content_hashes.hexdigests()
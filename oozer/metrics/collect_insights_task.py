@@ -3,13 +3,15 @@ import logging
 from common.celeryapp import get_celery_app
 from common.measurement import Measure
 from common.tokens import PlatformTokenManager
+from config import facebook as facebook_config
 from oozer.common.helpers import extract_tags_for_celery_fb_task
 from oozer.common.job_context import JobContext
 from oozer.common.job_scope import JobScope
 from oozer.common.sweep_running_flag import sweep_running
-from oozer.common.errors import CollectionError
+from oozer.common.errors import CollectionError, TaskHandedOff
 from oozer.reporting import reported_task
 from oozer.metrics.collect_insights import Insights
+from oozer.metrics import report_run_poller
 
 logger = logging.getLogger(__name__)
 app = get_celery_app()
@@ -30,7 +32,46 @@ def collect_insights_task(job_scope: JobScope, job_context: JobContext):
         if good_token is not None:
             job_scope.tokens = [good_token]
 
-    data_iter = Insights.iter_collect_insights(job_scope, job_context)
+    # small reports are read inline, which beats any polling
+    prefer_sync = Insights.prefers_sync(job_scope)
+
+    if facebook_config.INSIGHTS_CENTRAL_POLLING_ENABLED and not prefer_sync:
+        report_run_id = Insights.start_ads_insights(job_scope)
+        # no report run means nothing to report on, which is quicker done right here
+        if report_run_id is not None:
+            report_run_poller.register_report_run(report_run_id, job_scope, job_context)
+            logger.info(f'{job_scope} handed report run {report_run_id} to the poller')
+            raise TaskHandedOff(job_scope)
+
+    data_iter = Insights.iter_collect_insights(job_scope, job_context, prefer_sync=prefer_sync)
+
+    cnt = 0
+    try:
+        for cnt, datum in enumerate(data_iter):
+            if cnt % 100 == 0:
+                logger.info(f'{job_scope} processed {cnt} data points so far')
+    except Exception as e:
+        raise CollectionError(e, cnt)
+
+    logger.info(f'{job_scope} complete a total of {cnt} data points')
+    return cnt
+
+
+@app.task
+@Measure.timer(__name__, function_name_as_metric=True, extract_tags_from_arguments=extract_tags_for_celery_fb_task)
+@Measure.counter(
+    __name__, function_name_as_metric=True, count_once=True, extract_tags_from_arguments=extract_tags_for_celery_fb_task
+)
+@reported_task
+def download_insights_task(job_scope: JobScope, job_context: JobContext, report_run_id: str):
+    """
+    Second half of collect_insights_task, for report runs the poller found complete
+
+    Not guarded by sweep_running, as the report was requested (and paid for) during the sweep.
+    """
+    logger.info(f'{job_scope} downloading report run {report_run_id}')
+
+    data_iter = Insights.iter_download_insights(report_run_id, job_scope)
 
     cnt = 0
     try:
@@ -1,11 +1,13 @@
-from typing import Dict, Any, Generator, Union
+from typing import Dict, Any, Generator, List, Tuple, Union
 
 from facebook_business.adobjects.insightsresult import InsightsResult
 
 from common.enums.entity import Entity
 from common.id_tools import NAMESPACE_RAW
+from common.measurement import Measure
 from common.page_tokens import PageTokenManager
 from common.tokens import PlatformTokenManager
+from config import facebook as facebook_config
 from oozer.common.cold_storage import batch_store
 from oozer.common.enum import (
     ReportEntityApiKind,
@@ -25,6 +27,9 @@ from oozer.metrics.vendor_data_extractor import (
     ORGANIC_DATA_ENTITY_ID_MAP,
 )
 
+# edges multi-object insights are read from, per kind of entities in the batch
+_BATCH_INSIGHTS_EDGES = {ReportEntityApiKind.Post: 'insights', ReportEntityApiKind.Video: 'video_insights'}
+
 
 class InsightsOrganic:
     @staticmethod
@@ -64,6 +69,57 @@ class InsightsOrganic:
         for datum in report_status_obj:
             yield datum.export_all_data()
 
+    @staticmethod
+    def iter_batch_insights(
+        api: Any, entity_ids: List[str], report_entity_kind: str
+    ) -> Generator[Tuple[str, List[Dict[str, Any]]], None, None]:
+        """
+        Read insights of multiple page posts or videos in one request (multiple ID read, ids=...)
+
+        Yields insights of each of the entities, in order of entity IDs. Entities FB did not return get no insights.
+        """
+        params = {
+            'ids': ','.join(entity_ids),
+            'metric': ','.join(ORGANIC_DATA_FIELDS_MAP[report_entity_kind]),
+            'fields': ','.join(INSIGHTS_REPORT_FIELDS),
+        }
+        if report_entity_kind == ReportEntityApiKind.Post:
+            params['period'] = 'lifetime'
+
+        response = api.call(
+            'GET', (_BATCH_INSIGHTS_EDGES[report_entity_kind],), params=params, url_override=facebook_config.GRAPH_URL
+        ).json()
+        for entity_id in entity_ids:
+            yield entity_id, response.get(entity_id, {}).get('data', [])
+
+    @classmethod
+    def iter_collect_batch_insights(cls, job_scope: JobScope) -> Generator[Dict[str, Any], None, None]:
+        """
+        Collects lifetime insights of page posts or videos batched into one job (see sweep_builder.persister)
+
+        Insights of each of the entities are stored as if collected by their own jobs.
+        """
+        token = job_scope.token
+        token_manager = PlatformTokenManager.from_job_scope(job_scope)
+        report_entity_kind = InsightsOrganic._detect_report_api_kind(job_scope)
+        if report_entity_kind not in _BATCH_INSIGHTS_EDGES:
+            raise ValueError(f'Unsupported report entity kind "{report_entity_kind}" to collect batch insights')
+
+        if report_entity_kind == ReportEntityApiKind.Post:
+            token = PageTokenManager.from_job_scope(job_scope).get_best_token(job_scope.ad_account_id)
+
+        with PlatformApiContext(token) as fb_ctx:
+            entity_insights = list(cls.iter_batch_insights(fb_ctx.api, job_scope.entity_ids, report_entity_kind))
+
+        for entity_id, data in entity_insights:
+            entity_job_scope = JobScope(job_scope.to_dict(), entity_id=entity_id, entity_ids=None)
+            yield from cls._iter_collect_organic_insights(iter(data), entity_job_scope)
+
+        Measure.histogram(f'{__name__}.batch_size', tags={'entity_type': job_scope.entity_type})(
+            len(job_scope.entity_ids)
+        )
+        token_manager.report_usage(job_scope.token)
+
     @classmethod
     def iter_collect_insights(cls, job_scope: JobScope):
         """
@@ -80,6 +136,10 @@ class InsightsOrganic:
         if not job_scope.tokens:
             raise ValueError(f"Job {job_scope.job_id} cannot proceed. No platform tokens provided.")
 
+        if job_scope.entity_ids:
+            yield from cls.iter_collect_batch_insights(job_scope)
+            return
+
         token = job_scope.token
         token_manager = PlatformTokenManager.from_job_scope(job_scope)
         report_entity_kind = InsightsOrganic._detect_report_api_kind(job_scope)
@@ -0,0 +1,178 @@
+"""
+Delivery-aware collection of per-AdAccount lifetime insights.
+
+Lifetime report of an AdAccount at Campaign, AdSet or Ad level covers every entity
+ever created in it, but lifetime numbers change only for entities that delivered
+since the report was last collected. Entities seen in recent day-level insights
+are tracked in RecentDelivery, and between full collections lifetime report is asked
+only for these (see LifetimeCollectionScope). Lifetime records of other entities
+stay as last collected.
+"""
+import time
+
+from datetime import timedelta
+from typing import Any, Dict, Iterable, Optional, Set
+
+from common.connect.redis import get_redis
+from common.enums.entity import Entity
+from common.measurement import Measure
+from common.tztools import now
+from config import jobs as jobs_config
+from oozer.metrics.vendor_data_extractor import _entity_type_id_field_map
+
+DELIVERY_AWARE_LEVELS = (Entity.Campaign, Entity.AdSet, Entity.Ad)
+
+
+class RecentDelivery:
+    """
+    Entities of one level in an AdAccount seen delivering in day-level insights, with time they were last seen
+    """
+
+    def __init__(self, ad_account_id: str, entity_type: str):
+        self.key = f'{ad_account_id}:{entity_type}:{self.__class__.__name__}'
+
+    def add(self, entity_ids: Iterable[str]):
+        seen_at = time.time()
+        scores_and_entity_ids = []
+        for entity_id in entity_ids:
+            scores_and_entity_ids += [seen_at, entity_id]
+        if not scores_and_entity_ids:
+            return
+
+        pipeline = get_redis().pipeline(transaction=False)
+        pipeline.zadd(self.key, *scores_and_entity_ids)
+        pipeline.expire(self.key, jobs_config.LIFETIME_DELIVERY_TTL)
+        pipeline.execute()
+
+    def get_since(self, seen_since: float) -> Set[str]:
+        return {entity_id.decode('utf-8') for entity_id in get_redis().zrangebyscore(self.key, seen_since, '+inf')}
+
+
+class RecentDeliveryObserver:
+    """
+    Picks up delivering entities of all levels from rows of per-AdAccount day insights report at Ad level
+
+    Only rows for last LIFETIME_DELIVERY_RECENT_DAYS days count. Re-collection of older days
+    does not mean anything changed for lifetime numbers.
+    """
+
+    def __init__(self, ad_account_id: str, enabled: bool = True):
+        """
+        :param enabled: When not, observer does nothing
+        """
+        self.enabled = enabled
+        self.ad_account_id = ad_account_id
+        self.recent_date_start = (now().date() - timedelta(days=jobs_config.LIFETIME_DELIVERY_RECENT_DAYS)).strftime(
+            '%Y-%m-%d'
+        )
+        self.entity_ids: Dict[str, Set[str]] = {entity_type: set() for entity_type in DELIVERY_AWARE_LEVELS}
+
+    def observe(self, row: Dict[str, Any]):
+        if not self.enabled or row.get('date_start', '') < self.recent_date_start:
+            return
+        for entity_type, entity_ids in self.entity_ids.items():
+            entity_id = row.get(_entity_type_id_field_map[entity_type])
+            if entity_id:
+                entity_ids.add(entity_id)
+
+    def __enter__(self) -> 'RecentDeliveryObserver':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self.enabled:
+            return
+        # whatever was seen delivering did deliver, even if the report broke later on
+        for entity_type, entity_ids in self.entity_ids.items():
+            RecentDelivery(self.ad_account_id, entity_type).add(entity_ids)
+
+
+class LifetimeCollectionScope:
+    """
+    Entities of one level in an AdAccount lifetime insights are to be collected for
+
+    Example::
+
+        scope = LifetimeCollectionScope(ad_account_id, entity_type)
+        if scope.entity_ids is not None:
+            report_params['filtering'] = ...
+        with scope:
+            collect(report_params)
+
+    entity_ids is None (all entities are to be collected) when there was no lifetime collection yet,
+    last full collection is older than LIFETIME_FULL_COLLECTION_INTERVAL, or more than
+    LIFETIME_DELIVERY_AWARE_MAX_ENTITIES entities delivered since last collection.
+    Otherwise, it's IDs of entities seen delivering since last collection (can be none at all).
+    Time of collection is written only when the block exits without error.
+
+    Report collected later than it was submitted (central polling) is to be stored with
+    the scope it was submitted with (see to_dict), not one decided anew at download time.
+    """
+
+    def __init__(
+        self, ad_account_id: str, entity_type: str, enabled: bool = True, submitted: Optional[Dict[str, Any]] = None
+    ):
+        """
+        :param enabled: When not, scope does nothing and all entities are to be collected every time
+        :param submitted: Scope (as of to_dict) the report was submitted with
+        """
+        self.enabled = enabled
+        self.ad_account_id = ad_account_id
+        self.entity_type = entity_type
+        self.key = f'{ad_account_id}:{entity_type}:{self.__class__.__name__}'
+
+        self.started_at = int(time.time())
+        self.entity_ids: Optional[Set[str]] = None
+
+        if not enabled:
+            return
+
+        self.redis = get_redis()
+        if submitted is not None:
+            self.started_at = submitted['started_at']
+            if submitted['entity_ids'] is not None:
+                self.entity_ids = set(submitted['entity_ids'])
+            return
+
+        stored = self.redis.hgetall(self.key)
+        collected_at = stored.get(b'collected_at')
+        full_collected_at = stored.get(b'full_collected_at')
+        if collected_at is not None and full_collected_at is not None:
+            if self.started_at - int(full_collected_at) < jobs_config.LIFETIME_FULL_COLLECTION_INTERVAL:
+                entity_ids = RecentDelivery(ad_account_id, entity_type).get_since(
+                    int(collected_at) - jobs_config.LIFETIME_DELIVERY_OVERLAP
+                )
+                if len(entity_ids) <= jobs_config.LIFETIME_DELIVERY_AWARE_MAX_ENTITIES:
+                    self.entity_ids = entity_ids
+
+        Measure.increment(
+            f'{__name__}.collection_mode',
+            tags={'entity_type': entity_type, 'mode': 'full' if self.is_full else 'delivery_aware'},
+        )(1)
+
+    @property
+    def is_full(self) -> bool:
+        return self.entity_ids is None
+
+    @property
+    def is_empty(self) -> bool:
+        """Nothing delivered since last collection. No need to ask FB at all."""
+        return self.entity_ids is not None and not self.entity_ids
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'started_at': self.started_at, 'entity_ids': None if self.is_full else sorted(self.entity_ids)}
+
+    def __enter__(self) -> 'LifetimeCollectionScope':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self.enabled or exc_type is not None:
+            return
+
+        mapping = {'collected_at': self.started_at}
+        if self.is_full:
+            mapping['full_collected_at'] = self.started_at
+
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.hmset(self.key, mapping)
+        pipeline.expire(self.key, jobs_config.LIFETIME_DELIVERY_TTL)
+        pipeline.execute()
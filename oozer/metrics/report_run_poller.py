@@ -0,0 +1,212 @@
+"""
+Central poller of async insights report runs.
+
+Baking of an async insights report (AdReportRun) takes anywhere from seconds
+to many minutes. Waiting for it inside of the Celery task that submitted it
+holds a worker slot for that whole time, with each waiting task making its own
+status requests.
+
+Instead, when central polling is enabled, the collection task submits the report,
+registers the report run here and lets go of the worker slot.
+One poller process (see `run_poller_forever`) tracks all outstanding report runs in Redis,
+asks FB for statuses of many of them in one request (per token, through `?ids=`)
+and, once a report run is complete (either way), hands it over to the download task.
+"""
+import logging
+import pickle
+import time
+
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import gevent
+
+from facebook_business.exceptions import FacebookError
+
+from common.connect.redis import get_redis
+from common.measurement import Measure
+from config import facebook as facebook_config
+from oozer.common.facebook_api import PlatformApiContext
+from oozer.common.facebook_async_report import FacebookAsyncReportStatus
+from oozer.common.job_context import JobContext
+from oozer.common.job_scope import JobScope
+
+logger = logging.getLogger(__name__)
+
+# report run ID > pickled ReportRunRecord
+_report_runs_key = 'insights-report-runs'
+# report run ID > time (epoch seconds) of next status check
+_report_runs_due_key = 'insights-report-runs-due'
+
+# Status we report for runs that took longer than INSIGHTS_REPORT_RUN_MAX_AGE to complete
+STATUS_EXPIRED = 'Poller Expired'
+
+# (token, list of report run IDs) > {report run ID: async_status}
+StatusFetcher = Callable[[str, List[str]], Dict[str, str]]
+# (report run ID, async_status, job scope, job context) > None
+CompletionHandler = Callable[[str, str, JobScope, JobContext], None]
+
+
+class ReportRunRecord:
+    def __init__(self, job_scope: JobScope, job_context: JobContext, registered_at: float, poll_count: int = 0):
+        self.job_scope = job_scope
+        self.job_context = job_context
+        self.registered_at = registered_at
+        self.poll_count = poll_count
+
+    @property
+    def backoff_interval(self) -> float:
+        # same backoff curve a per-task poller uses
+        refresh_count = min(self.poll_count, FacebookAsyncReportStatus.BACKOFF_MAX_REFRESH_COUNT)
+        return min(
+            facebook_config.INSIGHTS_MAX_POLLING_INTERVAL,
+            facebook_config.INSIGHTS_MIN_POLLING_INTERVAL * (2 ** refresh_count),
+        )
+
+
+def register_report_run(report_run_id: str, job_scope: JobScope, job_context: JobContext):
+    """
+    Hands over waiting for the report run to complete to the poller
+    """
+    now = time.time()
+    record = ReportRunRecord(job_scope, job_context, now)
+
+    redis = get_redis()
+    redis.hset(_report_runs_key, report_run_id, pickle.dumps(record))
+    # FB needs a little time to bake report status record. Asking right away gives bogus statuses.
+    redis.zadd(_report_runs_due_key, report_run_id, now + record.backoff_interval)
+    Measure.increment(f'{__name__}.registered', tags={'report_type': job_scope.report_type})(1)
+
+
+def get_outstanding_count() -> int:
+    return get_redis().hlen(_report_runs_key)
+
+
+def fetch_statuses(token: str, report_run_ids: List[str]) -> Dict[str, str]:
+    """
+    Reads statuses of multiple report runs in one Graph API request
+
+    :return: Map of report run ID to its async_status. Runs FB did not return are not included.
+    """
+    with PlatformApiContext(token) as fb_ctx:
+        response = fb_ctx.api.call(
+            'GET',
+            ('',),
+            params={'ids': ','.join(report_run_ids), 'fields': 'async_status,async_percent_completion'},
+            url_override=facebook_config.GRAPH_URL,
+        ).json()
+    return {report_run_id: data.get('async_status') for report_run_id, data in response.items()}
+
+
+def dispatch_download(report_run_id: str, status: str, job_scope: JobScope, job_context: JobContext):
+    from oozer.metrics.collect_insights_task import download_insights_task
+
+    download_insights_task.delay(job_scope, job_context, report_run_id)
+
+
+class ReportRunPoller:
+    """
+    Checks on all outstanding report runs that are due for a status check
+    """
+
+    def __init__(
+        self,
+        fetch_statuses: StatusFetcher = fetch_statuses,
+        on_complete: CompletionHandler = dispatch_download,
+        batch_size: int = None,
+    ):
+        self.fetch_statuses = fetch_statuses
+        self.on_complete = on_complete
+        self.batch_size = batch_size or facebook_config.INSIGHTS_POLLER_BATCH_SIZE
+        self.redis = get_redis()
+
+    def _load_due(self, now: float) -> Dict[str, ReportRunRecord]:
+        report_run_ids = [
+            report_run_id.decode('utf8') for report_run_id in self.redis.zrangebyscore(_report_runs_due_key, 0, now)
+        ]
+        if not report_run_ids:
+            return {}
+
+        records = {}
+        for report_run_id, pickled in zip(report_run_ids, self.redis.hmget(_report_runs_key, report_run_ids)):
+            if pickled is None:
+                # completed and removed by another poller in the meantime
+                self.redis.zrem(_report_runs_due_key, report_run_id)
+            else:
+                records[report_run_id] = pickle.loads(pickled)
+        return records
+
+    def _complete(self, report_run_id: str, status: str, record: ReportRunRecord):
+        # Removal from the hash is the "lock". Only the one who removed it proceeds.
+        if not self.redis.hdel(_report_runs_key, report_run_id):
+            return
+        self.redis.zrem(_report_runs_due_key, report_run_id)
+        Measure.timing(f'{__name__}.bake_time', tags={'report_type': record.job_scope.report_type, 'status': status})(
+            (time.time() - record.registered_at) * 1000
+        )
+        self.on_complete(report_run_id, status, record.job_scope, record.job_context)
+
+    def _reschedule(self, report_run_id: str, record: ReportRunRecord, now: float):
+        record.poll_count += 1
+        self.redis.hset(_report_runs_key, report_run_id, pickle.dumps(record))
+        self.redis.zadd(_report_runs_due_key, report_run_id, now + record.backoff_interval)
+
+    def poll_once(self, now: float = None) -> Tuple[int, int]:
+        """
+        Checks statuses of report runs due for a check
+
+        :return: Number of report runs checked, number of those that completed
+        """
+        now = now or time.time()
+        records = self._load_due(now)
+
+        per_token: Dict[str, List[str]] = defaultdict(list)
+        for report_run_id, record in records.items():
+            if now - record.registered_at > facebook_config.INSIGHTS_REPORT_RUN_MAX_AGE:
+                logger.warning(f'Report run {report_run_id} for {record.job_scope} did not complete in time')
+                self._complete(report_run_id, STATUS_EXPIRED, record)
+            else:
+                per_token[record.job_scope.token].append(report_run_id)
+
+        checked_count = completed_count = 0
+        for token, report_run_ids in per_token.items():
+            for start in range(0, len(report_run_ids), self.batch_size):
+                batch_ids = report_run_ids[start : start + self.batch_size]
+                try:
+                    statuses = self.fetch_statuses(token, batch_ids)
+                except FacebookError as ex:
+                    # throttling, bad token etc. Affects the whole batch. Try again later.
+                    logger.warning(f'Failed to check statuses of {len(batch_ids)} report runs: {ex}')
+                    statuses = {}
+
+                checked_count += len(batch_ids)
+                for report_run_id in batch_ids:
+                    status = statuses.get(report_run_id)
+                    if status in FacebookAsyncReportStatus.COMPLETED_STATE:
+                        self._complete(report_run_id, status, records[report_run_id])
+                        completed_count += 1
+                    else:
+                        self._reschedule(report_run_id, records[report_run_id], now)
+
+        if checked_count:
+            Measure.increment(f'{__name__}.checked')(checked_count)
+            Measure.increment(f'{__name__}.completed')(completed_count)
+        return checked_count, completed_count
+
+    def run(self, stop_time: Optional[float] = None):
+        """
+        Polls on a shared schedule until stop_time (forever, when not set)
+        """
+        while stop_time is None or time.time() < stop_time:
+            try:
+                self.poll_once()
+                Measure.gauge(f'{__name__}.outstanding')(get_outstanding_count())
+            except Exception as ex:
+                # the poller must outlive hiccups of Redis and FB
+                logger.exception(f'Report run polling failed: {ex}')
+            gevent.sleep(facebook_config.INSIGHTS_POLLER_INTERVAL)
+
+
+def run_poller_forever():
+    logger.info('Starting insights report run poller')
+    ReportRunPoller().run()
@@ -1,3 +1,3 @@
 # flake8: noqa: F401
 
-from oozer.metrics.collect_insights_task import collect_insights_task
+from oozer.metrics.collect_insights_task import collect_insights_task, download_insights_task
@@ -1,18 +1,82 @@
 import logging
-from typing import Generator, Tuple
+import time
+
+from typing import Dict, Generator, Optional, Set, Tuple
+
+import gevent
 
 from common.celeryapp import CeleryTask
+from common.enums.reporttype import ReportType
 from common.error_inspector import ErrorInspector
-from common.id_tools import parse_id
+from common.id_tools import parse_id, JobIdParts
+from common.measurement import Measure
+from config import looper as looper_config
 from oozer.common.errors import InvalidJobScopeException
 from oozer.common.job_context import JobContext
 from oozer.common.job_scope import JobScope
-from oozer.common.sorted_jobs_queue import SortedJobsQueue
+from oozer.common.sorted_jobs_queue import SortedJobsQueue, get_parent_job_id
+from oozer.common.throttled_retries import ThrottledRetries
 from oozer.inventory import resolve_job_scope_to_celery_task
 
 logger = logging.getLogger(__name__)
 
 
+class _WholesaleDedup:
+    """
+    "Dire singles until wholesale" (see docs/job-queuing.md)
+
+    Per-entity insights jobs with high scores are let out first. Once per-AdAccount ("wholesale") job
+    they are part of is let out, further per-entity jobs under it are skipped, as it collects their data too.
+
+    With speculative tail on, per-AdAccount job is skipped instead when just a handful of its per-entity
+    jobs are left to be let out (counting those queued by Sweep Builder), and these keep being let out.
+    """
+
+    def __init__(self, sweep_id: str, remaining_child_job_counts: Dict[str, int]):
+        self.sweep_id = sweep_id
+        self.oozed_parent_job_ids: Set[str] = set()
+        self.remaining_child_job_counts = remaining_child_job_counts
+
+    def should_skip(self, job_id: str, job_id_parts: JobIdParts) -> bool:
+        """Decide if job is not to be let out. Job not skipped is taken to be let out."""
+        skip_reason = self._get_skip_reason(job_id, job_id_parts)
+        if skip_reason is None:
+            return False
+
+        logger.info(f"#{self.sweep_id}: Skipping job_id {job_id} ({skip_reason}).")
+        # each skipped job is (at least) one FB report we do not ask for
+        Measure.counter(
+            f'{__name__}.fb_calls_saved',
+            tags={
+                'sweep_id': self.sweep_id,
+                'ad_account_id': job_id_parts.ad_account_id,
+                'report_type': job_id_parts.report_type,
+                'reason': skip_reason,
+            },
+        ).increment()
+        return True
+
+    def _get_skip_reason(self, job_id: str, job_id_parts: JobIdParts) -> Optional[str]:
+        parent_job_id = get_parent_job_id(job_id_parts)
+        if parent_job_id:
+            if parent_job_id in self.oozed_parent_job_ids:
+                return 'parent_oozed'
+            if parent_job_id in self.remaining_child_job_counts:
+                self.remaining_child_job_counts[parent_job_id] -= 1
+            return None
+
+        if job_id_parts.entity_type or job_id_parts.report_type not in ReportType.ALL_METRICS:
+            return None
+
+        remaining_child_job_count = self.remaining_child_job_counts.get(job_id)
+        speculative_tail = looper_config.WHOLESALE_DEDUP_SPECULATIVE_TAIL
+        if speculative_tail and remaining_child_job_count is not None and remaining_child_job_count <= speculative_tail:
+            return 'speculative_tail'
+
+        self.oozed_parent_job_ids.add(job_id)
+        return None
+
+
 class TaskProducer:
     def __init__(self, sweep_id: str):
         self.sweep_id = sweep_id
@@ -26,23 +90,101 @@ class TaskProducer:
         """Number of tasks we scheduled."""
         return self.queue.get_queue_length()
 
-    def iter_tasks(self) -> Generator[Tuple[CeleryTask, JobScope, JobContext, int], None, None]:
-        """Read persisted jobs and pass-through context objects for inspection"""
-        with self.queue.JobsReader() as jobs_iter:
-            for job_id, job_scope_additional_data, score in jobs_iter:
+    def iter_tasks(
+        self, stop_oozing_time: float = None
+    ) -> Generator[Tuple[CeleryTask, JobScope, JobContext, int], None, None]:
+        """
+        Read persisted jobs and pass-through context objects for inspection
+
+        :param stop_oozing_time: Time to stop waiting for throttled jobs to be ready to be retried at
+        """
+        wholesale_dedup = None
+        if looper_config.WHOLESALE_DEDUP_ENABLED:
+            wholesale_dedup = _WholesaleDedup(self.sweep_id, self.queue.get_child_job_counts())
+
+        throttled_retries = ThrottledRetries(self.sweep_id) if looper_config.THROTTLED_RETRY_ENABLED else None
+        next_retries_check = time.time() + looper_config.THROTTLED_RETRY_CHECK_INTERVAL
+
+        try:
+            with self.queue.JobsReader() as jobs_iter:
+                for job_id, job_scope_additional_data, score in jobs_iter:
+
+                    # due retries of throttled jobs go ahead of new jobs
+                    if throttled_retries and time.time() >= next_retries_check:
+                        yield from self._iter_retry_tasks(throttled_retries)
+                        next_retries_check = time.time() + looper_config.THROTTLED_RETRY_CHECK_INTERVAL
+
+                    job_id_parts = parse_id(job_id)
+                    if wholesale_dedup and wholesale_dedup.should_skip(job_id, JobIdParts(**job_id_parts)):
+                        continue
+                    job_scope = JobScope(job_scope_additional_data, job_id_parts, sweep_id=self.sweep_id, score=score)
+
+                    try:
+                        celery_task = resolve_job_scope_to_celery_task(job_scope)
+                        # TODO: Decide what to do with this.
+                        # Was designed for massive hash collection and such,
+                        # but cannot have too much data in there because we pickle it and put in on Redis
+                        job_context = JobContext()
+                        yield celery_task, job_scope, job_context, score
+                        logger.info(f"#{self.sweep_id}: Scheduling job_id {job_id} with score {score}.")
+                    except InvalidJobScopeException as e:
+                        ErrorInspector.inspect(
+                            e, job_scope.ad_account_id, {'sweep_id': job_scope.sweep_id, 'job_id': job_scope.job_id}
+                        )
 
-                job_id_parts = parse_id(job_id)
-                job_scope = JobScope(job_scope_additional_data, job_id_parts, sweep_id=self.sweep_id, score=score)
+            if throttled_retries:
+                yield from self._iter_remaining_retry_tasks(throttled_retries, stop_oozing_time)
+        finally:
+            # jobs failing from now on would wait in the lane for nobody
+            if throttled_retries:
+                throttled_retries.close()
 
+    def _iter_remaining_retry_tasks(
+        self, throttled_retries: ThrottledRetries, stop_oozing_time: Optional[float]
+    ) -> Generator[Tuple[CeleryTask, JobScope, JobContext, int], None, None]:
+        """
+        Throttled jobs left to be retried once there are no new jobs, each as it is due
+
+        Once the lane is empty, it is closed, so that jobs failing afterwards are left to next sweep.
+        """
+        is_closed = False
+        while True:
+            yield from self._iter_retry_tasks(throttled_retries)
+
+            ready_at = throttled_retries.get_next_ready_time()
+            if ready_at is None:
+                if is_closed:
+                    return
+                # one more look, for jobs pushed before the lane got closed
+                throttled_retries.close()
+                is_closed = True
+                continue
+
+            if stop_oozing_time is not None and ready_at >= stop_oozing_time:
+                return
+            gevent.sleep(max(ready_at - time.time(), 0))
+
+    def _iter_retry_tasks(
+        self, throttled_retries: ThrottledRetries
+    ) -> Generator[Tuple[CeleryTask, JobScope, JobContext, int], None, None]:
+        """Throttled jobs due to be retried"""
+        while True:
+            job_scopes = throttled_retries.pop_due()
+            if not job_scopes:
+                return
+
+            for job_scope in job_scopes:
                 try:
                     celery_task = resolve_job_scope_to_celery_task(job_scope)
-                    # TODO: Decide what to do with this.
-                    # Was designed for massive hash collection and such,
-                    # but cannot have too much data in there because we pickle it and put in on Redis
-                    job_context = JobContext()
-                    yield celery_task, job_scope, job_context, score
-                    logger.info(f"#{self.sweep_id}: Scheduling job_id {job_id} with score {score}.")
                 except InvalidJobScopeException as e:
                     ErrorInspector.inspect(
                         e, job_scope.ad_account_id, {'sweep_id': job_scope.sweep_id, 'job_id': job_scope.job_id}
                     )
+                    continue
+
+                yield celery_task, job_scope, JobContext(), job_scope.score
+                logger.info(f"#{self.sweep_id}: Retrying throttled job_id {job_scope.job_id}.")
+                Measure.increment(
+                    f'{__name__}.throttled_retries',
+                    tags={'sweep_id': self.sweep_id, 'ad_account_id': job_scope.ad_account_id},
+                )(1)
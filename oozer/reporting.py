@@ -11,14 +11,16 @@ from common.enums.failure_bucket import FailureBucket
 from common.error_inspector import ErrorInspector, ErrorTypesReport
 from common.measurement import Measure
 from common.tokens import PlatformTokenManager
+from config import looper as looper_config
 from oozer.set_inaccessible_entity_task import set_inaccessible_entity_task
 from oozer.common.job_scope import JobScope
 from oozer.common.report_job_status_task import report_job_status_task
 from oozer.common.enum import ExternalPlatformJobStatus
 from oozer.common.facebook_api import FacebookApiErrorInspector
-from oozer.common.errors import CollectionError, TaskOutsideSweepException
+from oozer.common.errors import CollectionError, TaskHandedOff, TaskOutsideSweepException
 from oozer.common.sweep_status_tracker import SweepStatusTracker
 from oozer.common.task_progress_reporter import TaskProgressReporter
+from oozer.common.throttled_retries import THROTTLING_BACKOFF, ThrottledRetries
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +44,14 @@ def _report_failure(job_scope: JobScope, start_time: float, exc: Exception, **kw
 
     report_job_status_task.delay(failure_status, job_scope)
     PlatformTokenManager.from_job_scope(job_scope).report_usage_per_failure_bucket(job_scope.token, failure_bucket)
+
+    if (
+        looper_config.THROTTLED_RETRY_ENABLED
+        and failure_bucket in THROTTLING_BACKOFF
+        and not job_scope.is_derivative
+        and job_scope.sweep_id
+    ):
+        ThrottledRetries(job_scope.sweep_id).push(job_scope, failure_bucket, exc)
     SweepStatusTracker(job_scope.sweep_id).report_status(failure_bucket)
     _send_measurement_task_runtime(job_scope, failure_bucket)
 
@@ -102,6 +112,10 @@ def reported_task(func: Callable) -> Callable:
         except TaskOutsideSweepException as e:
             logger.info(f'{e.job_scope} skipped because sweep {e.job_scope.sweep_id} is done')
             ErrorInspector.send_measurement_error(ErrorTypesReport.SWEEP_ALREADY_ENDED, job_scope.ad_account_id)
+        except TaskHandedOff as e:
+            # whoever takes over reports the outcome. Until then the job is not in progress here.
+            logger.info(f'{e.job_scope} handed off')
+            SweepStatusTracker(job_scope.sweep_id).report_handed_off()
         except CollectionError as e:
             _report_failure(job_scope, start_time, e.inner, partial_datapoint_count=e.partial_datapoint_count)
         except Exception as e:
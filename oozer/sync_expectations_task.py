@@ -30,7 +30,13 @@ def sync_expectations(job_scope: JobScope):
     else:
         ad_account_ids_iter = expecations_store.iter_expectations_ad_accounts(sweep_id=job_scope.sweep_id)
 
-    for ad_account_id in ad_account_ids_iter:
+    # Reading job IDs of one AdAccount is many round trips to Redis.
+    # We read several AdAccounts concurrently, while writing out the ones already read.
+    job_ids_per_ad_account_iter = expecations_store.iter_expectations_per_ad_accounts(
+        ad_account_ids_iter, job_scope.sweep_id
+    )
+
+    for ad_account_id, job_ids_iter in job_ids_per_ad_account_iter:
 
         ad_account_scoped_job_scope = JobScope(
             job_scope.to_dict(), ad_account_id=ad_account_id, entity_type=Entity.AdAccount, entity_id=ad_account_id
@@ -38,10 +44,6 @@ def sync_expectations(job_scope: JobScope):
 
         with ChunkDumpStore(ad_account_scoped_job_scope, chunk_size=200) as store:
 
-            job_ids_iter = expecations_store.iter_expectations_per_ad_account(
-                ad_account_id, ad_account_scoped_job_scope.sweep_id
-            )
-
             for job_id in job_ids_iter:
                 job_id_parts = parse_id_parts(job_id)
 
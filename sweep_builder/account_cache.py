@@ -1,13 +1,15 @@
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, Optional, Set
 
 from common.store.entities import AdAccountEntity
+from oozer.entities.inline_comments import PagePostsPendingComments
 
 
 class AccountCache:
 
     scope = 'Console'
     _cache: Dict[str, AdAccountEntity] = {}
+    _page_posts_pending_comments: Dict[str, Set[str]] = {}
 
     @classmethod
     def get_model(cls, account_id):
@@ -29,6 +31,14 @@ class AccountCache:
         m = cls.get_model(account_id)
         return m.refresh_if_older_than if m else None
 
+    @classmethod
+    def get_page_posts_pending_comments(cls, page_id) -> Set[str]:
+        """PagePosts of a Page whose Comments are to be collected by per-PagePost job, read once per Page"""
+        if page_id not in cls._page_posts_pending_comments:
+            cls._page_posts_pending_comments[page_id] = PagePostsPendingComments(page_id).get_all()
+        return cls._page_posts_pending_comments[page_id]
+
     @classmethod
     def reset(cls):
         cls._cache.clear()
+        cls._page_posts_pending_comments.clear()
@@ -19,7 +19,13 @@ class EntityNode:
     @property
     def children(self) -> Iterable['EntityNode']:
         """Child nodes of current node."""
-        return self._children.values()
+        return (self._children or {}).values()
+
+    def count_leaves(self) -> int:
+        """Number of nodes at the bottom of the hierarchy under (or of) current node."""
+        if not self._children:
+            return 1
+        return sum(child.count_leaves() for child in self._children.values())
 
     def has_child(self, entity_id: str) -> bool:
         """Is entity_id of one of the children."""
@@ -72,7 +72,7 @@ class ExpectationClaim:
     @property
     def is_divisible(self) -> bool:
         """Can this task be divided into subtasks."""
-        return bool(self.entity_hierarchy)
+        return bool(self.entity_hierarchy and self.entity_hierarchy.children)
 
     @property
     def job_id(self) -> Optional[str]:
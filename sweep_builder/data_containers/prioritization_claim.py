@@ -1,7 +1,8 @@
 from datetime import date
-from typing import Optional
+from typing import List, Optional
 
 from common.job_signature import JobSignature
+from common.store.jobreport import JobReport
 from common.tztools import now
 
 
@@ -25,6 +26,9 @@ class PrioritizationClaim:
     ad_account_id: Optional[str]
     timezone: Optional[str]
     range_start: Optional[date]
+    range_end: Optional[date]
+    last_report: Optional[JobReport]
+    entity_ids: Optional[List[str]]
 
     def __init__(
         self,
@@ -37,6 +41,9 @@ class PrioritizationClaim:
         ad_account_id: str = None,
         timezone: str = None,
         range_start: date = None,
+        range_end: date = None,
+        last_report: JobReport = None,
+        entity_ids: List[str] = None,
     ):
         self.entity_id = entity_id
         self.entity_type = entity_type
@@ -46,6 +53,9 @@ class PrioritizationClaim:
         self.ad_account_id = ad_account_id
         self.timezone = timezone
         self.range_start = range_start
+        self.range_end = range_end
+        self.last_report = last_report
+        self.entity_ids = entity_ids
 
     @property
     def job_id(self) -> str:
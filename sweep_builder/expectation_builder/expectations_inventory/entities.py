@@ -8,6 +8,8 @@ from common.id_tools import generate_id
 from common.job_signature import JobSignature
 from common.enums.reporttype import ReportType
 from common.enums.entity import Entity
+from config import jobs as jobs_config
+from sweep_builder.account_cache import AccountCache
 from sweep_builder.types import ExpectationGeneratorType
 
 
@@ -75,6 +77,14 @@ def entities_per_page_post(entity_type: str, reality_claim: RealityClaim) -> Gen
         """
     assert entity_type in Entity.NON_AA_SCOPED
 
+    if (
+        entity_type == Entity.Comment
+        and jobs_config.PAGE_POST_INLINE_COMMENTS_ENABLED
+        and reality_claim.entity_id not in AccountCache.get_page_posts_pending_comments(reality_claim.ad_account_id)
+    ):
+        # Comments of the PagePost were collected inline with it (see oozer.entities.inline_comments)
+        return
+
     yield ExpectationClaim(
         reality_claim.entity_id,
         reality_claim.entity_type,
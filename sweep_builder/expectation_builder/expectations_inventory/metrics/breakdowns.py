@@ -6,7 +6,11 @@ from typing import Generator, List, Tuple, Dict, Set
 from common.enums.entity import Entity
 from common.id_tools import generate_id
 from common.job_signature import JobSignature
+from common.measurement import Measure
 from common.tztools import now_in_tz, date_range
+from config import jobs as jobs_config
+from oozer.common.day_finality import FinalDays
+from sweep_builder.account_cache import AccountCache
 from sweep_builder.data_containers.entity_node import EntityNode
 from sweep_builder.data_containers.expectation_claim import ExpectationClaim
 from sweep_builder.data_containers.reality_claim import RealityClaim
@@ -41,6 +45,18 @@ def _determine_active_date_range_for_claim(reality_claim: RealityClaim) -> Tuple
     return range_start, range_end
 
 
+def _get_final_days(reality_claim: RealityClaim, report_type: str) -> Set[date]:
+    """
+    Days final for the report type (see oozer.common.day_finality), unless AdAccount is to be refreshed
+    """
+    if not jobs_config.DAY_REPORT_FINALITY_ENABLED:
+        return set()
+
+    # days marked final before AdAccount was asked to be refreshed are not final any more
+    refresh_if_older_than = AccountCache.get_refresh_if_older_than(reality_claim.ad_account_id)
+    return FinalDays(reality_claim.ad_account_id, report_type, Entity.Ad).get(final_since=refresh_if_older_than)
+
+
 def day_metrics_per_ads_under_ad_account(
     report_types: List[str], reality_claim: RealityClaim
 ) -> Generator[ExpectationClaim, None, None]:
@@ -75,14 +91,29 @@ def day_metrics_per_ads_under_ad_account(
     # Thus, we yield claims that are effectively combination of
     # existence day, report type (indicating what kind of record migght exist)
     # Obviously this approach works only for metrics report types that have day-based dimension.
+    final_days_per_report_type = {
+        report_type: _get_final_days(reality_claim, report_type) for report_type in report_types
+    }
+    for report_type, final_days in final_days_per_report_type.items():
+        if final_days:
+            Measure.counter(
+                f'{__name__}.final_days_skipped',
+                tags={'ad_account_id': reality_claim.ad_account_id, 'report_type': report_type},
+            ).increment(len(final_days & active_adset_ids_by_day.keys()))
+
     for (day, active_adset_ids) in active_adset_ids_by_day.items():
+        day_report_types = [
+            report_type for report_type in report_types if day not in final_days_per_report_type[report_type]
+        ]
+        if not day_report_types:
+            continue
 
         ad_account_node = EntityNode(reality_claim.entity_id, reality_claim.entity_type)
         for adset_id in active_adset_ids:
             campaign_id = adset_campaigns[adset_id]
             ad_account_node.add_node(EntityNode(adset_id, Entity.AdSet), path=(campaign_id,))
 
-        for report_type in report_types:
+        for report_type in day_report_types:
             yield ExpectationClaim(
                 reality_claim.entity_id,
                 reality_claim.entity_type,
@@ -1,11 +1,17 @@
 import logging
 import time
 from collections import defaultdict
+from datetime import timedelta
 
-from typing import Generator, Iterable
+from typing import Callable, Dict, Generator, Iterable, List
 
+from common.enums.entity import Entity
 from common.enums.jobtype import detect_job_type
+from common.enums.reporttype import ReportType
+from common.id_tools import generate_id, parse_id
+from common.job_signature import JobSignature
 from common.measurement import Measure
+from config import jobs as jobs_config
 from oozer.common.sorted_jobs_queue import SortedJobsQueue
 from sweep_builder.data_containers.prioritization_claim import PrioritizationClaim
 from sweep_builder.account_cache import AccountCache
@@ -20,6 +26,197 @@ def should_persist(job_score: int) -> bool:
     return job_score > JOB_NOT_PASSED_SCORE
 
 
+def is_coalescable(claim: PrioritizationClaim) -> bool:
+    """
+    Per-AdAccount single day day-breakdown jobs, small and successful last time around, can be coalesced
+    """
+    last_report = claim.last_report
+    return (
+        claim.report_type in ReportType.ALL_DAY_BREAKDOWNS
+        and claim.entity_type == Entity.AdAccount
+        and claim.range_start is not None
+        and claim.range_end is None
+        and should_persist(claim.score)
+        and last_report is not None
+        and not last_report.fails_in_row
+        and last_report.last_total_datapoint_count is not None
+        and last_report.last_total_datapoint_count <= jobs_config.DAY_RANGE_COALESCING_MAX_DATAPOINTS
+    )
+
+
+def _merge_claims(
+    claims: List[PrioritizationClaim],
+    job_signature: JobSignature,
+    measurement_name: str,
+    measurement_tags: Dict[str, str],
+    **claim_kwargs,
+) -> PrioritizationClaim:
+    """Claim for one job doing the work of all of claims, as important as the most important of them."""
+    first = claims[0]
+    Measure.histogram(
+        f'{__name__}.{measurement_name}', tags={'ad_account_id': first.ad_account_id, **measurement_tags}
+    )(len(claims))
+
+    return PrioritizationClaim(
+        first.entity_id,
+        first.entity_type,
+        first.report_type,
+        job_signature,
+        max(claim.score for claim in claims),
+        ad_account_id=first.ad_account_id,
+        timezone=first.timezone,
+        **claim_kwargs,
+    )
+
+
+def _iter_held_back_per_ad_account(
+    prioritized_iter: Iterable[PrioritizationClaim],
+    is_held_back: Callable[[PrioritizationClaim], bool],
+    iter_merged: Callable[[List[PrioritizationClaim]], Iterable[PrioritizationClaim]],
+) -> Generator[PrioritizationClaim, None, None]:
+    """
+    Pass claims through, except for those is_held_back picks, which are held back
+    until claims for another AdAccount come through, and replaced by what iter_merged makes of them.
+
+    Claims for the same AdAccount are expected to come in one stretch (as expectations
+    are generated per AdAccount).
+    """
+    ad_account_id = None
+    held_back_claims: List[PrioritizationClaim] = []
+
+    for claim in prioritized_iter:
+        if claim.ad_account_id != ad_account_id:
+            yield from iter_merged(held_back_claims)
+            ad_account_id = claim.ad_account_id
+            held_back_claims = []
+
+        if is_held_back(claim):
+            held_back_claims.append(claim)
+        else:
+            yield claim
+
+    yield from iter_merged(held_back_claims)
+
+
+def _coalesce_run(run: List[PrioritizationClaim]) -> PrioritizationClaim:
+    if len(run) == 1:
+        return run[0]
+
+    first, last = run[0], run[-1]
+    job_id_parts = parse_id(first.job_id)
+    job_id_parts.update(range_start=first.range_start, range_end=last.range_start)
+
+    return _merge_claims(
+        run,
+        JobSignature(generate_id(**job_id_parts)),
+        'coalesced_days',
+        {'report_type': first.report_type},
+        range_start=first.range_start,
+        range_end=last.range_start,
+    )
+
+
+def _iter_coalesced_per_ad_account(claims: List[PrioritizationClaim]) -> Generator[PrioritizationClaim, None, None]:
+    claims_per_job_kind = defaultdict(list)
+    for claim in claims:
+        # all parts of job ID but the day
+        job_kind = tuple(sorted({**parse_id(claim.job_id), 'range_start': None}.items()))
+        claims_per_job_kind[job_kind].append(claim)
+
+    for job_kind_claims in claims_per_job_kind.values():
+        job_kind_claims.sort(key=lambda claim: claim.range_start)
+
+        run: List[PrioritizationClaim] = []
+        run_datapoint_count = 0
+        for claim in job_kind_claims:
+            datapoint_count = claim.last_report.last_total_datapoint_count
+            is_adjacent = run and claim.range_start == run[-1].range_start + timedelta(days=1)
+            fits = (
+                len(run) < jobs_config.DAY_RANGE_COALESCING_MAX_DAYS
+                and run_datapoint_count + datapoint_count <= jobs_config.DAY_RANGE_COALESCING_MAX_DATAPOINTS
+            )
+            if not (is_adjacent and fits):
+                if run:
+                    yield _coalesce_run(run)
+                run = []
+                run_datapoint_count = 0
+            run.append(claim)
+            run_datapoint_count += datapoint_count
+
+        if run:
+            yield _coalesce_run(run)
+
+
+def iter_coalesced(prioritized_iter: Iterable[PrioritizationClaim]) -> Generator[PrioritizationClaim, None, None]:
+    """
+    Coalesce adjacent days' small day-breakdown jobs into multi-day jobs.
+
+    One FB report covering a week or a month of a small AdAccount costs about as much
+    as a report on a single day of it. Adjacent days of same report type, small enough
+    when last collected (see is_coalescable), are bundled into multi-day jobs, sized
+    by datapoint counts of last collection (see DAY_RANGE_COALESCING_* config).
+
+    Coalescable claims are held back until claims for another AdAccount come through.
+    All other claims are passed through as they are.
+    """
+    return _iter_held_back_per_ad_account(prioritized_iter, is_coalescable, _iter_coalesced_per_ad_account)
+
+
+# organic lifetime insights of these can be read for many of them at once
+BATCHABLE_ENTITY_TYPES = {Entity.PagePost, Entity.PageVideo}
+
+
+def is_batchable(claim: PrioritizationClaim) -> bool:
+    """
+    Per-entity lifetime insights jobs of page posts and videos, not failing last time around, can be batched
+
+    One entity failing (deleted, no longer accessible) fails the read of the whole batch.
+    """
+    last_report = claim.last_report
+    return (
+        claim.report_type == ReportType.lifetime
+        and claim.entity_type in BATCHABLE_ENTITY_TYPES
+        and should_persist(claim.score)
+        and not (last_report and last_report.fails_in_row)
+    )
+
+
+def _batch(batch: List[PrioritizationClaim]) -> PrioritizationClaim:
+    if len(batch) == 1:
+        return batch[0]
+
+    first = batch[0]
+    return _merge_claims(
+        batch,
+        first.job_signature,
+        'batched_entities',
+        {'entity_type': first.entity_type},
+        entity_ids=[claim.entity_id for claim in batch],
+    )
+
+
+def _iter_batched_per_page(claims: List[PrioritizationClaim]) -> Generator[PrioritizationClaim, None, None]:
+    claims_per_entity_type = defaultdict(list)
+    for claim in claims:
+        claims_per_entity_type[claim.entity_type].append(claim)
+
+    batch_size = jobs_config.ORGANIC_INSIGHTS_BATCH_SIZE
+    for entity_type_claims in claims_per_entity_type.values():
+        for i in range(0, len(entity_type_claims), batch_size):
+            yield _batch(entity_type_claims[i : i + batch_size])
+
+
+def iter_batched(prioritized_iter: Iterable[PrioritizationClaim]) -> Generator[PrioritizationClaim, None, None]:
+    """
+    Batch per-entity lifetime insights jobs of page posts and videos of a Page into multi-entity jobs.
+
+    Insights of up to ORGANIC_INSIGHTS_BATCH_SIZE page posts (or videos) are read in one request,
+    so one job for them does the work of that many. Batchable claims (see is_batchable) are held back
+    until claims for another Page come through. All other claims are passed through as they are.
+    """
+    return _iter_held_back_per_ad_account(prioritized_iter, is_batchable, _iter_batched_per_page)
+
+
 def iter_persist_prioritized(
     sweep_id: str, prioritized_iter: Iterable[PrioritizationClaim]
 ) -> Generator[PrioritizationClaim, None, None]:
@@ -27,6 +224,12 @@ def iter_persist_prioritized(
 
     AccountCache.reset()
 
+    if jobs_config.DAY_RANGE_COALESCING_ENABLED:
+        prioritized_iter = iter_coalesced(prioritized_iter)
+
+    if jobs_config.ORGANIC_INSIGHTS_BATCHING_ENABLED:
+        prioritized_iter = iter_batched(prioritized_iter)
+
     with SortedJobsQueue(sweep_id).JobsWriter() as add_to_queue:
 
         _measurement_name_base = f'{__name__}.{iter_persist_prioritized.__name__}'
@@ -70,6 +273,8 @@ def iter_persist_prioritized(
             extra_data = {}
             if prioritization_claim.timezone:
                 extra_data['ad_account_timezone_name'] = prioritization_claim.timezone
+            if prioritization_claim.entity_ids:
+                extra_data['entity_ids'] = prioritization_claim.entity_ids
 
             with Measure.timer(f'{_measurement_name_base}.add_to_queue', tags=_measurement_tags):
                 if prioritization_claim.report_age_in_days is not None:
@@ -2,6 +2,7 @@ import logging
 
 from typing import Generator, Iterable
 
+from config import profiling as profiling_config
 from sweep_builder.data_containers.reality_claim import RealityClaim
 from sweep_builder.scorable import iter_scorable
 from sweep_builder.data_containers.prioritization_claim import PrioritizationClaim
@@ -9,6 +10,14 @@ from sweep_builder.data_containers.prioritization_claim import PrioritizationCla
 from sweep_builder.persister import iter_persist_prioritized
 from sweep_builder.prioritizer.prioritized import iter_prioritized
 from sweep_builder.expectation_builder.expectations import iter_expectations
+from sweep_builder.profiler import (
+    PipelineProfiler,
+    STAGE_REALITY,
+    STAGE_EXPECTATIONS,
+    STAGE_SCORABLE,
+    STAGE_PRIORITIZED,
+    STAGE_PERSISTED,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +30,24 @@ def iter_pipeline(
     of code that unpack RealityClaim into expectations,
     prioritization claims and associated processing steps.
     """
+    if profiling_config.PIPELINE_ENABLED:
+        yield from iter_pipeline_profiled(sweep_id, reality_claims_iter)
+        return
+
     yield from iter_persist_prioritized(
         sweep_id, iter_prioritized(iter_scorable(iter_expectations(reality_claims_iter)))
     )
+
+
+def iter_pipeline_profiled(
+    sweep_id: str, reality_claims_iter: Iterable[RealityClaim]
+) -> Generator[PrioritizationClaim, None, None]:
+    """
+    Same as iter_pipeline, but with each stage wrapped in PipelineProfiler
+    """
+    with PipelineProfiler(sweep_id) as profiler:
+        reality_claims_iter = profiler.wrap(STAGE_REALITY, reality_claims_iter)
+        expectation_claims_iter = profiler.wrap(STAGE_EXPECTATIONS, iter_expectations(reality_claims_iter))
+        scorable_claims_iter = profiler.wrap(STAGE_SCORABLE, iter_scorable(expectation_claims_iter))
+        prioritization_claims_iter = profiler.wrap(STAGE_PRIORITIZED, iter_prioritized(scorable_claims_iter))
+        yield from profiler.wrap(STAGE_PERSISTED, iter_persist_prioritized(sweep_id, prioritization_claims_iter))
@@ -0,0 +1,350 @@
+"""
+Opt-in profiling of Sweep Builder pipeline stages.
+
+iter_pipeline stacks several generators on top of each other. Timing the outer loop
+tells us how long the whole thing took, but not which stage is to blame,
+as each stage's `next()` includes time spent in all upstream stages.
+
+PipelineProfiler wraps each stage, measures wall time, CPU time and storage IO
+(see common.io_stats) spent in each `next()` call (inclusive of upstream stages)
+and derives exclusive per-stage numbers by subtracting the upstream stage's inclusive
+numbers. Numbers are attributed to the AdAccount of the claim a stage yielded.
+
+Per-slice numbers are accumulated in Redis per sweep, because slices of the sweep
+are built by different workers. Once the sweep is built, `write_sweep_summary`
+collects them into one JSON file and (optionally) a folded-stacks flamegraph file
+that can be fed to flamegraph.pl or speedscope.
+
+Numbers are read off process-wide clocks, and slices are built concurrently by gevent workers.
+Hence only one slice per process is profiled at a time (others are built unprofiled), storage IO is
+counted only when done by the profiled slice, and stack samples are taken by one process-level sampler.
+Wall and CPU time of other slices running while the profiled one waits still counts towards it,
+so for exact per-stage numbers run Sweep Builder workers with concurrency of 1.
+"""
+import logging
+import os
+import signal
+import threading
+import time
+import ujson as json
+
+from collections import defaultdict
+from typing import Iterable, Generator, Dict, List, Optional, Any
+
+from common.connect.redis import get_redis
+from common.io_stats import IOStats, BACKEND_DYNAMODB, BACKEND_REDIS
+from common.measurement import Measure
+from config import profiling as profiling_config
+
+logger = logging.getLogger(__name__)
+
+STAGE_REALITY = 'reality'
+STAGE_EXPECTATIONS = 'expectations'
+STAGE_SCORABLE = 'scorable'
+STAGE_PRIORITIZED = 'prioritized'
+STAGE_PERSISTED = 'persisted'
+
+# in order of data flow. Each stage consumes output of prior stage.
+STAGES = [STAGE_REALITY, STAGE_EXPECTATIONS, STAGE_SCORABLE, STAGE_PRIORITIZED, STAGE_PERSISTED]
+
+METRIC_ITEMS = 'items'
+METRIC_WALL = 'wall_seconds'
+METRIC_CPU = 'cpu_seconds'
+METRIC_DYNAMODB_SECONDS = 'dynamodb_seconds'
+METRIC_REDIS_SECONDS = 'redis_seconds'
+METRIC_DYNAMODB_CALLS = 'dynamodb_calls'
+METRIC_REDIS_CALLS = 'redis_calls'
+
+# order of values in the snapshot / stats lists
+METRICS = [
+    METRIC_ITEMS,
+    METRIC_WALL,
+    METRIC_CPU,
+    METRIC_DYNAMODB_SECONDS,
+    METRIC_REDIS_SECONDS,
+    METRIC_DYNAMODB_CALLS,
+    METRIC_REDIS_CALLS,
+]
+
+UNKNOWN_AD_ACCOUNT = 'unknown'
+
+# Separates parts of hash keys. Stage and metric names never contain it
+# and neither do AdAccount IDs.
+_KEY_SEPARATOR = '|'
+
+
+def _gen_key(sweep_id: str, marker: str) -> str:
+    return f'{sweep_id}:{marker}:PipelineProfiler'
+
+
+# the one PipelineProfiler of the process currently collecting numbers
+_active_profiler: Optional['PipelineProfiler'] = None
+
+
+class StackSampler:
+    """
+    Poor man's sampling profiler.
+
+    Every `interval` seconds of process CPU time, records the stack
+    of whatever Python code is running at the time in "folded" format
+    ("module:function;module:function" -> number of samples).
+
+    Relies on SIGPROF, so works only when started from the main thread.
+    Otherwise quietly does nothing. There is one per process (see get_sampler),
+    as there is one SIGPROF handler per process.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Dict[str, int] = defaultdict(int)
+        self._previous_handler = None
+        self._active = False
+
+    def _handle_signal(self, signum, frame):
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f'{frame.f_globals.get("__name__", "?")}:{code.co_name}')
+            frame = frame.f_back
+        self.stacks[';'.join(reversed(parts))] += 1
+
+    def __enter__(self) -> 'StackSampler':
+        if threading.current_thread() is threading.main_thread():
+            self._previous_handler = signal.signal(signal.SIGPROF, self._handle_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+            self._active = True
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._active:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+            self._active = False
+
+    def take_stacks(self) -> Dict[str, int]:
+        """Stacks sampled so far. Sampling starts from scratch after that."""
+        stacks, self.stacks = self.stacks, defaultdict(int)
+        return stacks
+
+
+_sampler: Optional[StackSampler] = None
+
+
+def get_sampler() -> StackSampler:
+    global _sampler
+    if _sampler is None:
+        _sampler = StackSampler(profiling_config.FLAMEGRAPH_SAMPLE_INTERVAL)
+    return _sampler
+
+
+class PipelineProfiler:
+    """
+    Wraps stages of the pipeline and tallies effort spent in each, per AdAccount.
+
+    When another slice is being profiled in the process already, stages are passed through as they are.
+
+    Example::
+
+        with PipelineProfiler(sweep_id) as profiler:
+            claims = profiler.wrap(STAGE_EXPECTATIONS, iter_expectations(reality_claims))
+            for claim in profiler.wrap(STAGE_SCORABLE, iter_scorable(claims)):
+                ...
+    """
+
+    def __init__(self, sweep_id: str, flamegraph: bool = None):
+        self.sweep_id = sweep_id
+        self.io_stats = IOStats(current_greenlet_only=True)
+        # stage > ad_account_id > list of values in METRICS order. Inclusive of upstream stages.
+        self.inclusive: Dict[str, Dict[str, List[float]]] = {stage: {} for stage in STAGES}
+        if flamegraph is None:
+            flamegraph = profiling_config.FLAMEGRAPH_ENABLED
+        self.sampler: Optional[StackSampler] = get_sampler() if flamegraph else None
+        self.active = False
+
+    def _snapshot(self) -> List[float]:
+        seconds = self.io_stats.seconds
+        calls = self.io_stats.calls
+        return [
+            0,
+            time.time(),
+            time.process_time(),
+            seconds[BACKEND_DYNAMODB],
+            seconds[BACKEND_REDIS],
+            calls[BACKEND_DYNAMODB],
+            calls[BACKEND_REDIS],
+        ]
+
+    def _add(self, stage: str, ad_account_id: str, before: List[float], items: int):
+        after = self._snapshot()
+        after[0] = items
+        stats = self.inclusive[stage].get(ad_account_id)
+        if stats is None:
+            stats = self.inclusive[stage][ad_account_id] = [0] * len(METRICS)
+        for i in range(len(METRICS)):
+            stats[i] += after[i] - before[i]
+
+    def wrap(self, stage: str, iterable: Iterable) -> Iterable:
+        """
+        Passes through all items of iterable, timing every pull of the next item.
+
+        The time downstream code spends working on yielded item is not counted here.
+        """
+        if not self.active:
+            return iterable
+        return self._iter_timed(stage, iterable)
+
+    def _iter_timed(self, stage: str, iterable: Iterable) -> Generator[Any, None, None]:
+        iterator = iter(iterable)
+        ad_account_id = UNKNOWN_AD_ACCOUNT
+        while True:
+            before = self._snapshot()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                # time spent discovering there is nothing left
+                # goes to whichever AdAccount we saw last
+                self._add(stage, ad_account_id, before, 0)
+                return
+            ad_account_id = getattr(item, 'ad_account_id', None) or UNKNOWN_AD_ACCOUNT
+            self._add(stage, ad_account_id, before, 1)
+            yield item
+
+    def exclusive(self) -> Dict[str, Dict[str, List[float]]]:
+        """
+        Per stage, per AdAccount effort, less the effort spent in upstream stage.
+
+        Item counts are not subtracted - these are counts of items the stage yielded.
+        """
+        result = {}
+        upstream = {}
+        for stage in STAGES:
+            inclusive = self.inclusive[stage]
+            result[stage] = {}
+            for ad_account_id, stats in inclusive.items():
+                upstream_stats = upstream.get(ad_account_id)
+                if upstream_stats is None:
+                    result[stage][ad_account_id] = list(stats)
+                else:
+                    result[stage][ad_account_id] = [stats[0]] + [
+                        # boundaries between AdAccounts make subtraction per AdAccount
+                        # slightly imprecise. Never go negative because of that.
+                        max(0, value - upstream_value)
+                        for value, upstream_value in zip(stats[1:], upstream_stats[1:])
+                    ]
+            # stages that were not wrapped don't reset the chain of subtraction
+            if inclusive:
+                upstream = inclusive
+        return result
+
+    def flush(self):
+        """
+        Reports collected numbers as metrics and adds them to per-sweep totals in Redis
+        """
+        exclusive = self.exclusive()
+
+        redis = get_redis()
+        pipeline = redis.pipeline(transaction=False)
+        totals_key = _gen_key(self.sweep_id, 'totals')
+        for stage, per_account in exclusive.items():
+            for ad_account_id, stats in per_account.items():
+                tags = {'sweep_id': self.sweep_id, 'stage': stage, 'ad_account_id': ad_account_id}
+                Measure.increment(f'{__name__}.items', tags=tags)(stats[0])
+                Measure.timing(f'{__name__}.wall', tags=tags)(stats[1] * 1000)
+                Measure.timing(f'{__name__}.cpu', tags=tags)(stats[2] * 1000)
+                Measure.timing(f'{__name__}.io_wait', tags={'backend': BACKEND_DYNAMODB, **tags})(stats[3] * 1000)
+                Measure.timing(f'{__name__}.io_wait', tags={'backend': BACKEND_REDIS, **tags})(stats[4] * 1000)
+                for metric, value in zip(METRICS, stats):
+                    if value:
+                        pipeline.hincrbyfloat(totals_key, _KEY_SEPARATOR.join([stage, ad_account_id, metric]), value)
+
+        stacks = self.sampler.take_stacks() if self.sampler else None
+        if stacks:
+            stacks_key = _gen_key(self.sweep_id, 'stacks')
+            for stack, count in stacks.items():
+                pipeline.hincrby(stacks_key, stack, count)
+
+        pipeline.execute()
+
+    def __enter__(self) -> 'PipelineProfiler':
+        global _active_profiler
+        if _active_profiler is not None:
+            Measure.increment(f'{__name__}.slices_not_profiled', tags={'sweep_id': self.sweep_id})(1)
+            return self
+
+        _active_profiler = self
+        self.active = True
+        self.io_stats.__enter__()
+        if self.sampler:
+            self.sampler.take_stacks()
+            self.sampler.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        global _active_profiler
+        if not self.active:
+            return
+
+        if self.sampler:
+            self.sampler.__exit__(exc_type, exc_val, exc_tb)
+        self.io_stats.__exit__(exc_type, exc_val, exc_tb)
+        self.active = False
+        _active_profiler = None
+        try:
+            self.flush()
+        except Exception:
+            # profiling must never be the reason sweep building fails
+            logger.exception(f'#{self.sweep_id}: Failed to flush pipeline profile')
+
+
+def _decode(value) -> str:
+    return value.decode('utf8') if isinstance(value, bytes) else value
+
+
+def read_sweep_summary(sweep_id: str) -> Dict[str, Any]:
+    """
+    Collects per-slice profiles reported by all workers for given sweep
+
+    :return: Summary with per stage totals and per stage per AdAccount numbers
+    """
+    redis = get_redis()
+    stages = {stage: dict.fromkeys(METRICS, 0) for stage in STAGES}
+    ad_accounts: Dict[str, Dict[str, Dict[str, float]]] = defaultdict(dict)
+
+    for key, value in redis.hgetall(_gen_key(sweep_id, 'totals')).items():
+        stage, ad_account_id, metric = _decode(key).split(_KEY_SEPARATOR)
+        value = float(value)
+        stages[stage][metric] += value
+        ad_accounts[ad_account_id].setdefault(stage, dict.fromkeys(METRICS, 0))[metric] += value
+
+    return {'sweep_id': sweep_id, 'stages': stages, 'ad_accounts': dict(ad_accounts)}
+
+
+def write_sweep_summary(sweep_id: str, output_dir: str = None) -> str:
+    """
+    Writes sweep summary JSON (and flamegraph folded stacks, if any were sampled)
+    to output dir.
+
+    :return: Path to summary file
+    """
+    output_dir = output_dir or profiling_config.OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+
+    summary = read_sweep_summary(sweep_id)
+    for stage, stats in summary['stages'].items():
+        logger.info(
+            f'#{sweep_id} [profile][{stage}] {int(stats[METRIC_ITEMS])} items, '
+            f'{stats[METRIC_WALL]:.2f}s wall, {stats[METRIC_CPU]:.2f}s CPU, '
+            f'{stats[METRIC_DYNAMODB_SECONDS]:.2f}s DynamoDB, {stats[METRIC_REDIS_SECONDS]:.2f}s Redis'
+        )
+
+    summary_path = os.path.join(output_dir, f'{sweep_id}.json')
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    stacks = get_redis().hgetall(_gen_key(sweep_id, 'stacks'))
+    if stacks:
+        with open(os.path.join(output_dir, f'{sweep_id}.folded'), 'w') as f:
+            for stack, count in stacks.items():
+                f.write(f'{_decode(stack)} {int(count)}\n')
+
+    return summary_path
@@ -1,14 +1,25 @@
 import logging
 
 from collections import defaultdict
+from datetime import datetime
 from typing import Iterable, Generator, Optional
 
 from pynamodb.exceptions import DoesNotExist
 
 from common.enums.entity import Entity
 from common.enums.jobtype import detect_job_type
+from common.enums.reporttype import ReportType
 from config.application import PERMANENTLY_FAILING_JOB_THRESHOLD
-from config.jobs import FAILS_IN_ROW_BREAKDOWN_LIMIT, TASK_BREAKDOWN_ENABLED
+from config.jobs import (
+    DAY_REPORT_FINALITY_ENABLED,
+    FAILS_IN_ROW_BREAKDOWN_LIMIT,
+    TASK_BREAKDOWN_ENABLED,
+    TASK_BREAKDOWN_MAX_DATAPOINTS,
+    TASK_BREAKDOWN_MAX_RUNNING_TIME,
+    TASK_BREAKDOWN_MERGE_LOAD,
+    TASK_BREAKDOWN_PREDICTIVE_ENABLED,
+)
+from config.looper import WHOLESALE_DEDUP_ENABLED
 from common.enums.failure_bucket import FailureBucket
 from common.measurement import Measure
 from common.store.jobreport import JobReport
@@ -77,8 +88,78 @@ def prefer_job_breakdown(report: JobReport) -> bool:
     return False
 
 
-def generate_scorable(claim: ExpectationClaim) -> Generator[ScorableClaim, None, None]:
-    """Select job signature for single expectation claim."""
+def get_report_load(report: Optional[JobReport]) -> Optional[float]:
+    """
+    How large the job is, going by its last run, relative to largest job we are comfortable running.
+
+    Load over 1 means the job is too large. Failing job is at least as large as its last attempt got.
+    """
+    if report is None:
+        return None
+
+    datapoint_count = report.last_total_datapoint_count
+    running_time = report.last_total_running_time
+    if report.fails_in_row:
+        if report.last_partial_datapoint_count is not None:
+            datapoint_count = max(datapoint_count or 0, report.last_partial_datapoint_count)
+        if report.last_partial_running_time is not None:
+            running_time = max(running_time or 0, report.last_partial_running_time)
+
+    if datapoint_count is None and running_time is None:
+        return None
+
+    return max(
+        (datapoint_count or 0) / TASK_BREAKDOWN_MAX_DATAPOINTS,
+        (running_time or 0) / TASK_BREAKDOWN_MAX_RUNNING_TIME,
+    )
+
+
+def _get_last_run_dt(report: Optional[JobReport]) -> Optional[datetime]:
+    if report is None:
+        return None
+    return max(filter(None, [report.last_success_dt, report.last_failure_dt]), default=None)
+
+
+def predict_job_breakdown(claim: ExpectationClaim, last_report: Optional[JobReport], load: float) -> bool:
+    """
+    Decide if job too large last time it ran is to be broken down, based on its child jobs.
+
+    Child jobs that ran since the job itself did tell how large their part of the job is now.
+    Other child jobs get share of the job's load by number of entities at the bottom of the hierarchy under them.
+    Job that is broken down already is merged back only once its child jobs together come well under the limit,
+    so that it does not flip between the two on every sweep.
+    """
+    last_run_dt = _get_last_run_dt(last_report)
+    leaf_count = claim.entity_hierarchy.count_leaves()
+
+    is_broken_down = False
+    predicted_load = 0
+    for child_claim in generate_child_claims(claim):
+        child_report = _fetch_job_report(child_claim.job_id)
+        child_last_run_dt = _get_last_run_dt(child_report)
+        child_load = None
+        if child_last_run_dt and (last_run_dt is None or child_last_run_dt > last_run_dt):
+            is_broken_down = True
+            child_load = get_report_load(child_report)
+        if child_load is None:
+            child_load = load * child_claim.entity_hierarchy.count_leaves() / leaf_count
+        predicted_load += child_load
+
+    if is_broken_down and predicted_load <= TASK_BREAKDOWN_MERGE_LOAD:
+        Measure.increment(
+            f'{__name__}.{predict_job_breakdown.__name__}.task_merged_back',
+            tags={'ad_account_id': claim.ad_account_id, 'entity_type': claim.entity_type},
+        )(1)
+
+    return predicted_load > (TASK_BREAKDOWN_MERGE_LOAD if is_broken_down else 1)
+
+
+def generate_scorable(claim: ExpectationClaim, estimated_load: float = None) -> Generator[ScorableClaim, None, None]:
+    """
+    Select job signature for single expectation claim.
+
+    :param estimated_load: Load of the job to go by when it did not run yet (see get_report_load)
+    """
 
     last_report = _fetch_job_report(claim.job_id)
 
@@ -93,36 +174,74 @@ def generate_scorable(claim: ExpectationClaim) -> Generator[ScorableClaim, None,
         if _reset:
             last_report = None
 
+    # Final days are normally not expected at all. This catches ones FinalDays forgot about.
+    _is_final = (
+        DAY_REPORT_FINALITY_ENABLED and
+        claim.report_type in ReportType.ALL_DAY_BREAKDOWNS and
+        last_report and
+        last_report.final_dt
+    )
+    if _is_final:
+        return
+
     _prefer_breakdown = (
         TASK_BREAKDOWN_ENABLED and
         claim.is_divisible and
         last_report and
         prefer_job_breakdown(last_report)
     )
+    breakdown_reason = 'failures'
+
+    load = None
+    if TASK_BREAKDOWN_PREDICTIVE_ENABLED and claim.is_divisible:
+        load = get_report_load(last_report)
+        if load is None:
+            load = estimated_load
+        if not _prefer_breakdown and load is not None and load > 1:
+            _prefer_breakdown = predict_job_breakdown(claim, last_report, load)
+            breakdown_reason = 'predicted'
+
+    scorable_claim = ScorableClaim(
+        claim.entity_id,
+        claim.entity_type,
+        claim.report_type,
+        claim.report_variant,
+        claim.job_signature,
+        last_report,
+        ad_account_id=claim.ad_account_id,
+        timezone=claim.timezone,
+        range_start=claim.range_start,
+    )
 
     if not _prefer_breakdown:
-        yield ScorableClaim(
-            claim.entity_id,
-            claim.entity_type,
-            claim.report_type,
-            claim.report_variant,
-            claim.job_signature,
-            last_report,
-            ad_account_id=claim.ad_account_id,
-            timezone=claim.timezone,
-            range_start=claim.range_start,
-        )
+        yield scorable_claim
         return
 
     logger.warning(f'Performing task breakdown for job_id: {claim.job_id}')
     Measure.increment(
         f'{__name__}.{generate_scorable.__name__}.task_broken_down',
-        tags={'ad_account_id': claim.ad_account_id, 'entity_type': claim.entity_type},
+        tags={'ad_account_id': claim.ad_account_id, 'entity_type': claim.entity_type, 'reason': breakdown_reason},
     )(1)
 
+    # Per-AdAccount ("wholesale") job broken down for failing is queued alongside jobs it is broken down into,
+    # with its own score. Looper lets out whichever comes first and skips what it makes redundant
+    # (see oozer.producer). Job predicted to be too large is not to be let out at all.
+    _queue_wholesale = (
+        WHOLESALE_DEDUP_ENABLED and
+        breakdown_reason == 'failures' and
+        claim.entity_type == Entity.AdAccount and
+        claim.report_type in ReportType.ALL_METRICS
+    )
+    if _queue_wholesale:
+        yield scorable_claim
+
     # break down into smaller jobs recursively
+    leaf_count = claim.entity_hierarchy.count_leaves() if load is not None else None
     for child_claim in generate_child_claims(claim):
-        yield from generate_scorable(child_claim)
+        child_estimated_load = None
+        if load is not None:
+            child_estimated_load = load * child_claim.entity_hierarchy.count_leaves() / leaf_count
+        yield from generate_scorable(child_claim, child_estimated_load)
 
 
 def iter_scorable(claims: Iterable[ExpectationClaim]) -> Generator[ScorableClaim, None, None]:
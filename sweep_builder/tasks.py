@@ -9,6 +9,7 @@ from common.celeryapp import get_celery_app, RoutingKey
 from common.enums.entity import Entity
 from common.error_inspector import ErrorInspector
 from common.measurement import Measure
+from config import profiling as profiling_config
 from oozer.common.task_group import TaskGroup
 from sweep_builder.data_containers.reality_claim import RealityClaim
 
@@ -247,5 +248,10 @@ def build_sweep(sweep_id: str):
         # # our manual task tracking code + join()
         # task_group.join()
         logger.info("Join complete, sweep build ended")
+
+        if profiling_config.PIPELINE_ENABLED:
+            from sweep_builder.profiler import write_sweep_summary
+
+            logger.info(f"#{sweep_id} Pipeline profile written to {write_sweep_summary(sweep_id)}")
     except Exception as ex:
         ErrorInspector.inspect(ex, None, {'sweep_id': sweep_id})
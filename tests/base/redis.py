@@ -0,0 +1,59 @@
+from typing import Any, Dict, List, Tuple
+
+import rediscluster
+
+from redis.exceptions import ResponseError
+from rediscluster.connection import ClusterConnectionPool
+
+
+class RecordingRedis(rediscluster.RedisCluster):
+    """
+    The very client class get_redis() returns, recording commands instead of sending them to Redis
+
+    Unlike a Mock, it goes through client's own argument handling (pipeline() options,
+    order of ZADD arguments of the client vs its pipeline etc.), so commands end up
+    in `commands` just as Redis would have received them (and in `pipelines`, per pipeline execution,
+    for the ones sent through a pipeline). Replies to commands are looked up
+    by command name in `replies` (None by default).
+
+    Example::
+
+        redis = RecordingRedis(replies={'HGET': b'1'})
+        with mock.patch.object(module_under_test, 'get_redis', return_value=redis):
+            ...
+        assert ('ZADD', 'key', 1000, 'member') in redis.commands
+    """
+
+    def __init__(self, replies: Dict[str, Any] = None):
+        connection_pool = ClusterConnectionPool(
+            startup_nodes=[{'host': '127.0.0.1', 'port': 7000}], init_slot_cache=False, skip_full_coverage_check=True
+        )
+        super().__init__(connection_pool=connection_pool, skip_full_coverage_check=True)
+        self.replies = replies or {}
+        self.commands: List[Tuple] = []
+        self.pipelines: List[List[Tuple]] = []
+
+    def execute_command(self, *args, **kwargs):
+        command = args[0].upper()
+        if command == 'ZADD':
+            for score in args[2::2]:
+                try:
+                    float(score)
+                except ValueError:
+                    raise ResponseError('value is not a valid float')
+
+        self.commands.append(args)
+        reply = self.replies.get(command)
+        return reply(*args) if callable(reply) else reply
+
+    def pipeline(self, *args, **kwargs):
+        pipeline = super().pipeline(*args, **kwargs)
+        pipeline.send_cluster_commands = self._send_pipeline_commands
+        return pipeline
+
+    def _send_pipeline_commands(self, stack, raise_on_error=True, allow_redirections=True):
+        self.pipelines.append([command.args for command in stack])
+        return [self.execute_command(*command.args) for command in stack]
+
+    def get_commands(self, command: str) -> List[Tuple]:
+        return [args for args in self.commands if args[0].upper() == command]
@@ -1,8 +1,10 @@
 # must be first, as it does event loop patching and other "first" things
-from tests.base.testcase import TestCase
+from tests.base.testcase import TestCase, mock
 
 from tests.base import random
+from tests.base.redis import RecordingRedis
 
+from oozer.common import expecations_store
 from oozer.common.expecations_store import JobExpectationsWriter, iter_expectations
 
 
@@ -33,3 +35,31 @@ class JobExpectationsStoreTests(TestCase):
 
         # now let's test for equality
         assert set(all_job_ids_actual) == all_job_ids_should_be
+
+    def test_writer_dedupes_and_batches_writes(self):
+        sweep_id = random.gen_string_id()
+        redis = RecordingRedis()
+
+        with mock.patch.object(expecations_store, 'get_redis', return_value=redis):
+            writer = JobExpectationsWriter(sweep_id=sweep_id, batch_size=3)
+            with writer as add_expectation:
+                for _ in range(3):
+                    add_expectation('fb|1|a', '1', None)
+                    add_expectation('fb|1|b', '1', None)
+                add_expectation('fb|2|a', '2', None)
+
+        # 3 new members trigger first flush, remaining 2 go out on exit
+        assert len(redis.pipelines) == 2
+        assert sum(len(commands) for commands in redis.pipelines) == len(
+            redis.commands
+        ), 'Must write through pipeline only'
+
+        added = {}
+        for _, key, *members in redis.get_commands('SADD'):
+            added.setdefault(key, []).extend(members)
+
+        assert added == {
+            f'{sweep_id}-sweep-aa-index-set': ['1', '2'],
+            f'{sweep_id}-1-expectation-aa-index-set': ['fb|1|a', 'fb|1|b'],
+            f'{sweep_id}-2-expectation-aa-index-set': ['fb|2|a'],
+        }
@@ -0,0 +1,39 @@
+from unittest.mock import patch
+
+import gevent
+
+from pynamodb.connection.base import Connection
+from rediscluster.client import StrictRedisCluster
+
+from common.io_stats import IOStats, BACKEND_DYNAMODB, BACKEND_REDIS
+
+
+def test_io_stats_counts_calls_and_restores_hooks():
+    original_dispatch = Connection.dispatch
+    original_execute_command = StrictRedisCluster.execute_command
+
+    with patch.object(Connection, '_make_api_call', return_value={}):
+        with IOStats() as outer:
+            Connection.dispatch(Connection(), 'Query', {})
+            with IOStats() as inner:
+                Connection.dispatch(Connection(), 'GetItem', {})
+
+    assert Connection.dispatch is original_dispatch
+    assert StrictRedisCluster.execute_command is original_execute_command
+
+    assert outer.calls[BACKEND_DYNAMODB] == 2
+    assert outer.calls[BACKEND_REDIS] == 0
+    assert inner.calls[BACKEND_DYNAMODB] == 1
+    assert outer.to_dict()['operations'] == {'dynamodb.Query': 1, 'dynamodb.GetItem': 1}
+
+
+def test_io_stats_counts_calls_of_current_greenlet_only():
+    def query():
+        Connection.dispatch(Connection(), 'Query', {})
+
+    with patch.object(Connection, '_make_api_call', return_value={}):
+        with IOStats(current_greenlet_only=True) as io_stats:
+            query()
+            gevent.spawn(query).join()
+
+    assert io_stats.calls[BACKEND_DYNAMODB] == 1
@@ -116,6 +116,7 @@ class TestUploadToS3(TestCase):
             'ad_account_id': ctx.ad_account_id,
             'report_type': ReportType.entity,
             'platform_api_version': 'v6.0',
+            'payload_format': 'json',
         }
 
 
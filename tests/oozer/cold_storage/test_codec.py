@@ -0,0 +1,83 @@
+# must be first, as it does event loop patching and other "first" things
+from tests.base.testcase import TestCase, mock
+
+import io
+
+import config.aws
+from oozer.common.cold_storage import codec, base_store
+from oozer.common.job_scope import JobScope
+
+
+class TestCodec(TestCase):
+    data = [{'id': '1', 'spend': '12.34', 'actions': [{'action_type': 'link_click', '1d_click': '3'}]}, {'id': '2'}]
+
+    def test_all_formats_and_compressions_decode_transparently(self):
+        for payload_format in [codec.FORMAT_JSON, codec.FORMAT_NDJSON]:
+            for compression in [codec.COMPRESSION_NONE, codec.COMPRESSION_GZIP, codec.COMPRESSION_ZSTD]:
+                body, metadata, content_encoding = codec.encode(self.data, payload_format, compression)
+
+                assert codec.decode(body) == self.data
+                assert metadata['payload_format'] == payload_format
+                assert content_encoding == (compression or None)
+
+    def test_stream_encoder_matches_encode(self):
+        for payload_format in [codec.FORMAT_JSON, codec.FORMAT_NDJSON]:
+            for data in [self.data, []]:
+                fileobj = io.BytesIO()
+                encoder = codec.StreamEncoder(fileobj, payload_format, codec.COMPRESSION_NONE)
+                for datum in data:
+                    encoder.write(datum)
+                metadata, content_encoding = encoder.close()
+
+                body, metadata_should_be, _ = codec.encode(data, payload_format, codec.COMPRESSION_NONE)
+                assert fileobj.getvalue() == body
+                assert metadata == metadata_should_be
+                assert content_encoding is None
+
+        fileobj = io.BytesIO()
+        encoder = codec.StreamEncoder(fileobj, codec.FORMAT_NDJSON, codec.COMPRESSION_GZIP)
+        for datum in self.data:
+            encoder.write(datum)
+        assert encoder.close()[1] == codec.COMPRESSION_GZIP
+        assert codec.decode(fileobj.getvalue()) == self.data
+
+    def test_explicit_compression_level_zero(self):
+        raw, _, _ = codec.encode(self.data, codec.FORMAT_JSON, codec.COMPRESSION_NONE)
+
+        with mock.patch.object(config.aws, 'S3_PAYLOAD_COMPRESSION_LEVEL', 9):
+            body, _, _ = codec.encode(self.data, codec.FORMAT_JSON, codec.COMPRESSION_GZIP, level=0)
+            fileobj = io.BytesIO()
+            encoder = codec.StreamEncoder(fileobj, codec.FORMAT_JSON, codec.COMPRESSION_GZIP, level=0)
+            for datum in self.data:
+                encoder.write(datum)
+            encoder.close()
+
+        # level 0 only wraps data in gzip, uncompressed
+        assert raw in body
+        assert raw in fileobj.getvalue()
+        assert codec.decode(body) == self.data
+
+    def test_ndjson_is_datum_per_line(self):
+        body, _, _ = codec.encode(self.data, codec.FORMAT_NDJSON, codec.COMPRESSION_NONE)
+
+        assert body.count(b'\n') == 2
+        assert body.startswith(b'{')
+
+    def test_empty_payload(self):
+        for payload_format in [codec.FORMAT_JSON, codec.FORMAT_NDJSON]:
+            body, _, _ = codec.encode([], payload_format, codec.COMPRESSION_GZIP)
+            assert codec.decode(body) == []
+
+    def test_store_sets_content_encoding_per_config(self):
+        job_scope = JobScope(ad_account_id='1', report_type='entity')
+        bucket = mock.Mock()
+
+        with mock.patch.object(config.aws, 'S3_PAYLOAD_COMPRESSION', codec.COMPRESSION_GZIP), mock.patch.object(
+            base_store, 'get_bucket_by_type', return_value=bucket
+        ):
+            base_store.store(self.data, job_scope)
+
+        _, kwargs = bucket.put_object.call_args
+        assert kwargs['ContentEncoding'] == 'gzip'
+        assert kwargs['Metadata']['payload_compression'] == 'gzip'
+        assert codec.decode(kwargs['Body']) == self.data
@@ -0,0 +1,110 @@
+# must be first, as it does event loop patching and other "first" things
+from tests.base.testcase import TestCase, mock
+
+import gevent
+
+from oozer.common.cold_storage.uploader import UploadPool, UploadBatch
+
+
+class FakeBucket:
+    def __init__(self, fail_keys=()):
+        self.fail_keys = set(fail_keys)
+        self.uploaded = []
+        self.bodies = {}
+        self.max_seen_in_flight = 0
+        self.in_flight = 0
+
+    def put_object(self, Key, Body, **kwargs):
+        self.in_flight += 1
+        self.max_seen_in_flight = max(self.max_seen_in_flight, self.in_flight)
+        gevent.sleep(0.01)
+        self.in_flight -= 1
+        if Key in self.fail_keys:
+            raise IOError(f'Failed to upload {Key}')
+        self.uploaded.append(Key)
+        self.bodies[Key] = Body if isinstance(Body, bytes) else Body.read()
+
+
+class TestUploadPool(TestCase):
+    def test_uploads_concurrently_and_waits(self):
+        pool = UploadPool(concurrency=3, max_bytes_in_flight=1000)
+        bucket = FakeBucket()
+        batch = UploadBatch()
+
+        for i in range(9):
+            pool.submit(bucket, {'Key': f'key-{i}', 'Body': b'x' * 10}, batch)
+
+        batch.wait(timeout=5)
+
+        assert sorted(bucket.uploaded) == sorted(f'key-{i}' for i in range(9))
+        assert bucket.max_seen_in_flight == 3
+        assert pool.bytes_in_flight == 0
+
+    def test_backpressure_by_bytes(self):
+        pool = UploadPool(concurrency=5, max_bytes_in_flight=25)
+        bucket = FakeBucket()
+        batch = UploadBatch()
+
+        for i in range(6):
+            pool.submit(bucket, {'Key': f'key-{i}', 'Body': b'x' * 10}, batch)
+            assert pool.bytes_in_flight <= 25
+
+        batch.wait(timeout=5)
+        # only 2 chunks of 10 bytes fit under 25 byte cap
+        assert bucket.max_seen_in_flight == 2
+
+    def test_failure_is_raised_to_waiting_batch_only(self):
+        pool = UploadPool(concurrency=2, max_bytes_in_flight=1000)
+        bucket = FakeBucket(fail_keys=['bad'])
+        good_batch = UploadBatch()
+        bad_batch = UploadBatch()
+
+        pool.submit(bucket, {'Key': 'good', 'Body': b'x'}, good_batch)
+        pool.submit(bucket, {'Key': 'bad', 'Body': b'x'}, bad_batch)
+
+        good_batch.wait(timeout=5)
+        with self.assertRaises(IOError):
+            bad_batch.wait(timeout=5)
+
+    def test_chunk_dump_store_fails_on_upload_failure(self):
+        from oozer.common.cold_storage import base_store
+        from oozer.common.cold_storage.batch_store import ChunkDumpStore
+        from oozer.common.job_scope import JobScope
+
+        bucket = FakeBucket(fail_keys=['bad'])
+        pool = UploadPool(concurrency=2, max_bytes_in_flight=1000)
+        job_scope = JobScope(sweep_id='1', ad_account_id='2', report_type='entity')
+
+        with mock.patch.object(base_store, 'get_upload_pool', return_value=pool), mock.patch.object(
+            base_store, 'get_bucket_by_type', return_value=bucket
+        ), mock.patch.object(base_store, '_job_scope_to_storage_key', side_effect=['good', 'bad']):
+            with self.assertRaises(IOError):
+                with ChunkDumpStore(job_scope, chunk_size=1) as store:
+                    store({'id': 1})
+                    store({'id': 2})
+
+        assert bucket.uploaded == ['good']
+
+    def test_spooling_chunk_store_cuts_chunks_by_bytes(self):
+        from oozer.common.cold_storage import base_store, codec
+        from oozer.common.cold_storage.batch_store import SpoolingChunkStore
+        from oozer.common.job_scope import JobScope
+
+        bucket = FakeBucket()
+        pool = UploadPool(concurrency=2, max_bytes_in_flight=1000)
+        job_scope = JobScope(sweep_id='1', ad_account_id='2', report_type='entity')
+        data = [{'id': str(i), 'payload': 'x' * (100 if i % 2 else 10)} for i in range(10)]
+
+        with mock.patch.object(base_store, 'get_upload_pool', return_value=pool), mock.patch.object(
+            base_store, 'get_bucket_by_type', return_value=bucket
+        ), mock.patch.object(base_store, '_job_scope_to_storage_key', side_effect=lambda _, marker, __: str(marker)):
+            with SpoolingChunkStore(job_scope, chunk_bytes=200) as store:
+                for datum in data:
+                    store(datum)
+
+        assert pool.bytes_in_flight == 0
+        chunks = [codec.decode(bucket.bodies[key]) for key in sorted(bucket.bodies, key=int)]
+        assert [datum for chunk in chunks for datum in chunk] == data
+        # each chunk is cut as soon as it crosses 200 bytes, so no more than one ~100 byte datum over
+        assert len(chunks) == 3
+        assert all(len(codec._serialize(chunk, codec.FORMAT_JSON)) < 320 for chunk in chunks)
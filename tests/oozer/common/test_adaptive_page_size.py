@@ -0,0 +1,105 @@
+from tests.base.testcase import TestCase, mock
+
+import ujson as json
+
+from facebook_business.api import Cursor
+from facebook_business.exceptions import FacebookRequestError
+
+from config import facebook as facebook_config
+from oozer.common import adaptive_page_size
+from oozer.common.adaptive_page_size import AdaptivePageSize, iter_adaptively
+
+
+def _too_much_data_error():
+    body = json.dumps({'error': {'code': 100, 'error_subcode': 1487534, 'message': 'too much'}})
+    return FacebookRequestError('too much', {}, 400, [], body)
+
+
+class FakeCursor(Cursor):
+    """
+    Serves items in pages of whatever size is asked, failing when asked for more than max_page_size
+    """
+
+    def __init__(self, items, params, max_page_size):
+        self.params = dict(params)
+        self._path = ('act_1', 'campaigns')
+        self._queue = []
+        self.items = list(items)
+        self.max_page_size = max_page_size
+        self.requested_page_sizes = []
+        # SDK reads first page right away
+        self.load_next_page()
+
+    def load_next_page(self):
+        limit = self.params['limit']
+        self.requested_page_sizes.append(limit)
+        if limit > self.max_page_size:
+            raise _too_much_data_error()
+        self._queue, self.items = self.items[:limit], self.items[limit:]
+        return len(self._queue) > 0
+
+
+class AdaptivePageSizeTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = mock.Mock()
+        self.redis.get.return_value = None
+        patcher = mock.patch.object(adaptive_page_size, 'get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_starts_from_stored_page_size(self):
+        self.redis.get.return_value = b'123'
+        assert AdaptivePageSize('act_1', 'C', 400).page_size == 123
+        self.redis.get.assert_called_once_with('act_1:C:AdaptivePageSize')
+
+    def test_shrinks_and_retries_on_too_much_data(self):
+        cursors = []
+
+        def getter(fields, params):
+            cursor = FakeCursor(range(250), params, max_page_size=100)
+            cursors.append(cursor)
+            return cursor
+
+        page_sizer = AdaptivePageSize('act_1', 'C', 400)
+        with mock.patch.object(facebook_config, 'ADAPTIVE_PAGE_SIZE_FAST_SECONDS', 0):
+            assert list(iter_adaptively(getter, ['id'], {}, page_sizer)) == list(range(250))
+
+        # first page failed twice. Rest went on with the smaller size.
+        assert len(cursors) == 1
+        assert page_sizer.page_size == 100
+        self.redis.set.assert_called_once_with(
+            'act_1:C:AdaptivePageSize', 100, ex=facebook_config.ADAPTIVE_PAGE_SIZE_TTL
+        )
+
+    def test_grows_on_fast_full_pages(self):
+        cursors = []
+
+        def getter(fields, params):
+            cursor = FakeCursor(range(500), params, max_page_size=1000)
+            cursors.append(cursor)
+            return cursor
+
+        page_sizer = AdaptivePageSize('act_1', 'C', 100)
+        assert list(iter_adaptively(getter, ['id'], {}, page_sizer)) == list(range(500))
+
+        assert cursors[0].requested_page_sizes[:3] == [100, 125, 156]
+        assert page_sizer.page_size > 100
+
+    def test_shrinks_on_slow_pages(self):
+        page_sizer = AdaptivePageSize('act_1', 'C', 100)
+        with mock.patch.object(facebook_config, 'ADAPTIVE_PAGE_SIZE_SLOW_SECONDS', 1):
+            page_sizer.record_page(2, 100)
+        assert page_sizer.page_size == 75
+
+    def test_gives_up_at_min_page_size(self):
+        def getter(fields, params):
+            return FakeCursor(range(10), params, max_page_size=0)
+
+        page_sizer = AdaptivePageSize('act_1', 'C', facebook_config.ADAPTIVE_PAGE_SIZE_MIN)
+        with self.assertRaises(FacebookRequestError):
+            list(iter_adaptively(getter, ['id'], {}, page_sizer))
+
+    def test_custom_getters_are_iterated_as_is(self):
+        page_sizer = AdaptivePageSize('act_1', 'C', 100)
+        assert list(iter_adaptively(lambda fields, params: iter([1, 2]), ['id'], {}, page_sizer)) == [1, 2]
@@ -0,0 +1,117 @@
+from tests.base.testcase import TestCase, mock
+
+from datetime import date, datetime, timedelta, timezone
+
+from common.enums.entity import Entity
+from common.enums.reporttype import ReportType
+from common.store.jobreport import JobReport
+from oozer.common import day_finality
+from oozer.common import report_job_status
+from oozer.common.day_finality import DayContentHashes, FinalDays
+from oozer.common.enum import ExternalPlatformJobStatus
+from oozer.common.job_scope import JobScope
+from tests.base.redis import RecordingRedis
+
+
+class DayContentHashesTests(TestCase):
+    def test_hash_does_not_depend_on_rows_order(self):
+        rows = [{'date_start': '2020-01-01', 'ad_id': str(ad_id), 'clicks': ad_id} for ad_id in range(5)]
+
+        hashes = DayContentHashes([date(2020, 1, 1), date(2020, 1, 2)])
+        for row in rows:
+            hashes.add(row)
+        reversed_hashes = DayContentHashes([date(2020, 1, 1), date(2020, 1, 2)])
+        for row in reversed(rows):
+            reversed_hashes.add(row)
+
+        assert hashes.hexdigests() == reversed_hashes.hexdigests()
+        assert hashes.hexdigests()['2020-01-02'] == '0:0000000000000000'
+
+    def test_hash_changes_with_content(self):
+        hashes = DayContentHashes([date(2020, 1, 1)])
+        hashes.add({'date_start': '2020-01-01', 'ad_id': '1', 'clicks': 1})
+        changed_hashes = DayContentHashes([date(2020, 1, 1)])
+        changed_hashes.add({'date_start': '2020-01-01', 'ad_id': '1', 'clicks': 2})
+
+        assert hashes.hexdigests() != changed_hashes.hexdigests()
+
+
+class FinalDaysTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = RecordingRedis()
+        patcher = mock.patch.object(day_finality, 'get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_add(self):
+        marked_at = datetime(2020, 3, 1, tzinfo=timezone.utc)
+
+        with mock.patch.object(day_finality, 'now', return_value=marked_at):
+            FinalDays('AA', ReportType.day, Entity.Ad).add(date(2020, 1, 1))
+
+        assert self.redis.pipelines == [
+            [
+                ('ZADD', 'AA:day:A:FinalDays', marked_at.timestamp(), '2020-01-01'),
+                ('EXPIRE', 'AA:day:A:FinalDays', day_finality.jobs_config.DAY_REPORT_FINALITY_TTL),
+            ]
+        ]
+
+    def test_get(self):
+        self.redis.replies['ZRANGEBYSCORE'] = [b'2020-01-01', b'2020-01-03']
+        final_since = datetime(2020, 3, 1, tzinfo=timezone.utc)
+
+        final_days = FinalDays('AA', ReportType.day, Entity.Ad).get(final_since=final_since)
+
+        assert final_days == {date(2020, 1, 1), date(2020, 1, 3)}
+        assert self.redis.commands == [('ZRANGEBYSCORE', 'AA:day:A:FinalDays', final_since.timestamp(), '+inf')]
+
+
+class FinalityReportingTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.day = date.today() - timedelta(days=40)
+        self.job_scope = JobScope(
+            sweep_id='1',
+            ad_account_id='AA',
+            report_type=ReportType.day,
+            report_variant=Entity.Ad,
+            range_start=self.day,
+            content_hashes={self.day.strftime('%Y-%m-%d'): '3:abc'},
+        )
+        patcher = mock.patch.object(report_job_status, 'FinalDays')
+        self.final_days = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(report_job_status, '_report_job_done_to_cold_store')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _report_done(self, last_content_hash):
+        with mock.patch.object(JobReport, 'get', return_value=JobReport(last_content_hash=last_content_hash)):
+            with mock.patch.object(JobReport, 'update') as update:
+                report_job_status.report_job_status(ExternalPlatformJobStatus.Done, self.job_scope)
+        return [str(action) for action in update.call_args[1]['actions']]
+
+    def test_day_final_on_same_content_past_attribution_window(self):
+        actions = self._report_done('3:abc')
+
+        assert str(JobReport.last_content_hash.set('3:abc')) in actions
+        assert any('fndt' in action for action in actions)
+        self.final_days.assert_called_once_with('AA', ReportType.day, Entity.Ad)
+        self.final_days.return_value.add.assert_called_once_with(self.day)
+
+    def test_day_not_final_on_changed_content(self):
+        actions = self._report_done('2:abb')
+
+        assert str(JobReport.last_content_hash.set('3:abc')) in actions
+        assert not any('fndt' in action for action in actions)
+        assert not self.final_days.called
+
+    def test_day_not_final_within_attribution_window(self):
+        self.day = self.job_scope.range_start = date.today() - timedelta(days=3)
+        self.job_scope.content_hashes = {self.day.strftime('%Y-%m-%d'): '3:abc'}
+
+        actions = self._report_done('3:abc')
+
+        assert not any('ch' in action or 'fndt' in action for action in actions)
+        assert not self.final_days.called
@@ -0,0 +1,60 @@
+from tests.base.testcase import TestCase, mock
+
+import gevent.pywsgi
+
+from oozer.common import facebook_session_pool
+from oozer.common.facebook_session_pool import SessionPool
+
+
+def _graph_api(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'application/json')])
+    return [b'{"id": "1"}']
+
+
+class SessionPoolTests(TestCase):
+    def test_reuses_api_per_token(self):
+        pool = SessionPool(max_size=10, idle_timeout=60, connections_per_host=10)
+
+        api = pool.get_api('token-a')
+        assert pool.get_api('token-a') is api
+        assert pool.get_api('token-b') is not api
+        assert len(pool) == 2
+
+    def test_evicts_least_recently_used_over_max_size(self):
+        pool = SessionPool(max_size=2, idle_timeout=60, connections_per_host=10)
+
+        api_a = pool.get_api('token-a')
+        pool.get_api('token-b')
+        pool.get_api('token-a')
+        pool.get_api('token-c')
+
+        assert len(pool) == 2
+        assert pool.get_api('token-a') is api_a
+        assert set(pool._apis) == {'token-a', 'token-c'}
+
+    def test_evicts_idle(self):
+        pool = SessionPool(max_size=10, idle_timeout=60, connections_per_host=10)
+
+        with mock.patch.object(facebook_session_pool.time, 'time', return_value=1000.0):
+            pool.get_api('token-a')
+        with mock.patch.object(facebook_session_pool.time, 'time', return_value=1030.0):
+            pool.get_api('token-b')
+
+        pool.evict_idle(now=1070.0)
+        assert set(pool._apis) == {'token-b'}
+
+    def test_connections_are_kept_alive_across_uses(self):
+        server = gevent.pywsgi.WSGIServer(('127.0.0.1', 0), _graph_api, log=None)
+        server.start()
+        try:
+            url = f'http://127.0.0.1:{server.server_port}'
+            pool = SessionPool(max_size=10, idle_timeout=60, connections_per_host=10)
+
+            for _ in range(3):
+                pool.get_api('token-a').call('GET', ('1',), url_override=url)
+
+            requests_count, connections_count = pool._apis['token-a'].connection_stats()
+            assert requests_count == 3
+            assert connections_count == 1
+        finally:
+            server.stop()
@@ -0,0 +1,102 @@
+from tests.base.testcase import TestCase, mock
+
+import functools
+
+import ujson as json
+
+from urllib.parse import parse_qs, urlsplit
+
+from facebook_business.adobjects.adaccount import AdAccount
+from facebook_business.adobjects.adreportrun import AdReportRun
+from facebook_business.adobjects.campaign import Campaign
+from facebook_business.api import FacebookResponse
+
+from config import facebook as facebook_config
+from oozer.common import adaptive_page_size
+from oozer.common.adaptive_page_size import AdaptivePageSize, iter_adaptively
+from oozer.common.facebook_async_report import FacebookAsyncReportStatus
+from oozer.common.raw_paging import RawCursor, raw_getter, supports_raw_paging
+
+NEXT_URL = 'https://graph.facebook.com/v6.0/act_1/campaigns?limit=2&after='
+
+
+class FakeApi:
+    """
+    Serves pages of campaigns, chained by paging.next
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def call(self, method, path, params=None, **kwargs):
+        self.calls.append((method, path, dict(params or {})))
+        index = int(parse_qs(urlsplit(path).query)['after'][0]) if isinstance(path, str) else 0
+        body = {'data': self.pages[index], 'paging': {}}
+        if index < len(self.pages) - 1:
+            body['paging']['next'] = f'{NEXT_URL}{index + 1}'
+        return FacebookResponse(body=json.dumps(body), http_status=200, headers={})
+
+
+PAGES = [
+    [{'id': 'C1', 'name': 'one', 'adlabels': [{'id': 'L1'}]}, {'id': 'C2', 'name': 'two'}],
+    [{'id': 'C3', 'name': 'three', 'promoted_object': {'page_id': 'P1'}}],
+]
+
+
+class RawPagingTests(TestCase):
+    def test_yields_what_sdk_cursor_exports(self):
+        api = FakeApi(PAGES)
+        ad_account = AdAccount('act_1', api=api)
+
+        sdk_rows = [campaign.export_all_data() for campaign in ad_account.get_campaigns(fields=['id', 'name'])]
+        raw_rows = list(RawCursor(ad_account.get_campaigns(fields=['id', 'name'], pending=True)))
+
+        assert raw_rows == sdk_rows
+        assert [row['id'] for row in raw_rows] == ['C1', 'C2', 'C3']
+        assert all(type(row) is dict for row in raw_rows)
+
+    def test_reads_first_page_right_away_and_follows_next(self):
+        api = FakeApi(PAGES)
+        cursor = raw_getter(AdAccount('act_1', api=api).get_campaigns)(fields=['id'], params={'limit': 2})
+
+        assert len(cursor) == 2
+        assert api.calls == [('GET', ('act_1', 'campaigns'), {'fields': 'id', 'limit': 2})]
+
+        list(cursor)
+        assert api.calls[1][1] == f'{NEXT_URL}1'
+        assert len(api.calls) == 2
+
+    def test_supports_raw_paging(self):
+        ad_account = AdAccount('act_1', api=FakeApi(PAGES))
+
+        assert supports_raw_paging(ad_account.get_campaigns)
+        assert not supports_raw_paging(lambda fields, params: iter([]))
+        assert not supports_raw_paging(functools.partial(lambda page, fields, params, pending=False: [], ad_account))
+        with mock.patch.object(AdAccount, 'get_campaigns', return_value=[Campaign('C1')]):
+            assert not supports_raw_paging(ad_account.get_campaigns)
+
+    def test_page_size_adapts_across_pages(self):
+        api = FakeApi(PAGES)
+        getter = raw_getter(AdAccount('act_1', api=api).get_campaigns)
+        with mock.patch.object(adaptive_page_size, 'get_redis') as get_redis:
+            get_redis.return_value.get.return_value = None
+            page_sizer = AdaptivePageSize('act_1', 'C', 40)
+            # as if first page was slow
+            with mock.patch.object(page_sizer, 'record_page', side_effect=lambda *_: page_sizer.shrink_on_error()):
+                rows = list(iter_adaptively(getter, ['id'], {}, page_sizer))
+
+        assert [row['id'] for row in rows] == ['C1', 'C2', 'C3']
+        assert api.calls[0][2]['limit'] == 40
+        assert parse_qs(urlsplit(api.calls[1][1]).query)['limit'] == ['20']
+
+    @mock.patch.object(facebook_config, 'RAW_PAGING_ENABLED', True)
+    def test_report_data_is_read_raw(self):
+        api = FakeApi(PAGES)
+        report_run = AdReportRun('R1', api=api)
+        report_run[AdReportRun.Field.async_status] = 'Job Completed'
+
+        rows = list(FacebookAsyncReportStatus(report_run).iter_report_data())
+
+        assert [row['id'] for row in rows] == ['C1', 'C2', 'C3']
+        assert api.calls[0][1] == ('R1', 'insights')
@@ -0,0 +1,115 @@
+# must be first, as it does event loop patching and other "first" things
+from tests.base.testcase import TestCase, mock
+
+import pickle
+
+import ujson as json
+
+from facebook_business.exceptions import FacebookRequestError
+
+from common.enums.failure_bucket import FailureBucket
+from common.enums.reporttype import ReportType
+from config import looper as looper_config
+from oozer.common import throttled_retries
+from oozer.common.job_scope import JobScope
+from oozer.common.throttled_retries import ThrottledRetries, get_estimated_time_to_regain_access
+from tests.base.redis import RecordingRedis
+
+
+def _throttling_error(estimated_minutes):
+    usage = {'AA': [{'type': 'ads_insights', 'estimated_time_to_regain_access': estimated_minutes}]}
+    body = json.dumps({'error': {'code': 80000, 'message': 'throttled'}})
+    return FacebookRequestError('throttled', {}, 400, {'X-Business-Use-Case-Usage': json.dumps(usage)}, body)
+
+
+class ThrottledRetriesTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = RecordingRedis()
+        patcher = mock.patch.object(throttled_retries, 'get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.job_scope = JobScope(
+            sweep_id='sweep',
+            ad_account_id='AA',
+            report_type=ReportType.day_platform,
+            report_variant='A',
+            score=10,
+            running_time=30,
+            datapoint_count=5,
+        )
+
+    def _pushed_delay(self):
+        *_, (_, key, ready_at, job_id) = self.redis.get_commands('ZADD')
+        assert key == 'sweep-throttled-retries'
+        assert job_id == self.job_scope.job_id
+        return ready_at
+
+    def test_estimated_time_to_regain_access(self):
+        assert get_estimated_time_to_regain_access(_throttling_error(3)) == 180
+        assert get_estimated_time_to_regain_access(ValueError()) is None
+
+    @mock.patch.object(throttled_retries.time, 'time', return_value=1000)
+    def test_push_backs_off_per_failure_bucket_and_attempt(self, _):
+        assert ThrottledRetries('sweep').push(self.job_scope, FailureBucket.AdAccountThrottling)
+        assert self._pushed_delay() == 1000 + 120
+
+        self.redis.replies['HGET'] = b'1'
+        assert ThrottledRetries('sweep').push(self.job_scope, FailureBucket.AdAccountThrottling)
+        assert self._pushed_delay() == 1000 + 240
+
+        *_, (_, _, _, job_scope_data) = (
+            command for command in self.redis.get_commands('HSET') if command[1] == 'sweep-throttled-retries-job-scopes'
+        )
+        retry_job_scope = pickle.loads(job_scope_data)
+        assert retry_job_scope.job_id == self.job_scope.job_id
+        assert retry_job_scope.score == 10
+        assert retry_job_scope.running_time is None
+        assert retry_job_scope.datapoint_count is None
+
+    def test_push_gives_up_on_exhausted_budget(self):
+        self.redis.replies['HGET'] = b'2'
+
+        assert not ThrottledRetries('sweep').push(self.job_scope, FailureBucket.Throttling)
+        assert not self.redis.pipelines
+
+    @mock.patch.object(throttled_retries.time, 'time', return_value=1000)
+    def test_push_waits_for_access_to_be_regained(self, _):
+        assert ThrottledRetries('sweep').push(self.job_scope, FailureBucket.Throttling, _throttling_error(3))
+        assert self._pushed_delay() == 1000 + 180
+
+        self.redis.pipelines.clear()
+        assert not ThrottledRetries('sweep').push(self.job_scope, FailureBucket.Throttling, _throttling_error(10))
+        assert not self.redis.pipelines
+
+    def test_pop_due_takes_jobs_out_once(self):
+        zrem_replies = iter([1, 0])
+        self.redis.replies.update(
+            {
+                'ZRANGEBYSCORE': [b'J1', b'J2'],
+                'ZREM': lambda *_: next(zrem_replies),
+                'HGET': pickle.dumps(self.job_scope),
+            }
+        )
+
+        assert [job_scope.job_id for job_scope in ThrottledRetries('sweep').pop_due()] == [self.job_scope.job_id]
+        assert self.redis.get_commands('HGET') == [('HGET', 'sweep-throttled-retries-job-scopes', b'J1')]
+
+    def test_push_refused_once_closed(self):
+        ThrottledRetries('sweep').close()
+        assert self.redis.get_commands('SET') == [
+            ('SET', 'sweep-throttled-retries-closed', 1, 'EX', looper_config.RUN_SWEEP_TIMEOUT)
+        ]
+
+        self.redis.replies['EXISTS'] = True
+        assert not ThrottledRetries('sweep').push(self.job_scope, FailureBucket.Throttling)
+        assert not self.redis.pipelines
+
+    def test_next_ready_time(self):
+        self.redis.replies['ZRANGE'] = []
+        assert ThrottledRetries('sweep').get_next_ready_time() is None
+
+        self.redis.replies['ZRANGE'] = [(b'J1', 1060.0)]
+        assert ThrottledRetries('sweep').get_next_ready_time() == 1060.0
+        assert self.redis.get_commands('ZRANGE')[-1][:4] == ('ZRANGE', 'sweep-throttled-retries', 0, 0)
@@ -5,8 +5,9 @@ from tests.base.testcase import TestCase, mock
 from common.enums.entity import Entity
 from common.enums.reporttype import ReportType
 from common.id_tools import generate_universal_id
-from oozer.common.cold_storage.batch_store import ChunkDumpStore
+from oozer.common.cold_storage.batch_store import SpoolingChunkStore
 from oozer.common.job_scope import JobScope
+from oozer.entities import collect_entities_iterators, entity_hash, feedback_entity_task
 from oozer.common.enum import (
     FB_AD_VIDEO_MODEL,
     FB_AD_CREATIVE_MODEL,
@@ -83,7 +84,7 @@ class TestCollectEntitiesPerAdAccount(TestCase):
 
             entities_data = [fb_data]
             with mock.patch.object(FB_ADACCOUNT_MODEL, get_method_name, return_value=entities_data), mock.patch.object(
-                ChunkDumpStore, 'store'
+                SpoolingChunkStore, 'store'
             ) as store:
 
                 list(iter_collect_entities_per_adaccount(job_scope))
@@ -103,3 +104,61 @@ class TestCollectEntitiesPerAdAccount(TestCase):
             assert data_actual[vendor_data_key] == {
                 'id': universal_id_should_be
             }, 'Vendor data is set with the right universal id'
+
+    def test_unchanged_entities_are_not_stored(self):
+        job_scope = JobScope(
+            sweep_id=self.sweep_id,
+            ad_account_id=self.ad_account_id,
+            report_type=ReportType.entity,
+            report_variant=Entity.Campaign,
+            tokens=['blah'],
+        )
+        entities_data = [FB_CAMPAIGN_MODEL(fbid='C1'), FB_CAMPAIGN_MODEL(fbid='C2')]
+
+        with mock.patch.object(FB_ADACCOUNT_MODEL, 'get_campaigns', return_value=entities_data), mock.patch.object(
+            SpoolingChunkStore, 'store'
+        ) as store, mock.patch.object(
+            feedback_entity_task.feedback_entities_task, 'delay'
+        ) as feedback, mock.patch.object(
+            collect_entities_iterators, 'PlatformTokenManager'
+        ), mock.patch.object(
+            collect_entities_iterators.jobs_config, 'ENTITY_CHANGE_DETECTION_ENABLED', True
+        ), mock.patch.object(
+            entity_hash, 'get_redis'
+        ), mock.patch.object(
+            collect_entities_iterators.EntityHashStore, 'is_changed', side_effect=[False, True]
+        ):
+            assert len(list(iter_collect_entities_per_adaccount(job_scope))) == 2
+
+        assert [call[0][0]['id'] for call in store.call_args_list] == ['C2']
+        assert [[entity['id'] for entity in call[0][0]] for call in feedback.call_args_list] == [['C2']]
+
+    def test_incremental_collection_asks_for_updated_entities_only(self):
+        job_scope = JobScope(
+            sweep_id=self.sweep_id,
+            ad_account_id=self.ad_account_id,
+            report_type=ReportType.entity,
+            report_variant=Entity.Campaign,
+            tokens=['blah'],
+        )
+
+        with mock.patch.object(
+            FB_ADACCOUNT_MODEL, 'get_campaigns', return_value=[]
+        ) as get_campaigns, mock.patch.object(SpoolingChunkStore, 'store'), mock.patch.object(
+            collect_entities_iterators, 'PlatformTokenManager'
+        ), mock.patch.object(
+            collect_entities_iterators.jobs_config, 'ENTITY_INCREMENTAL_COLLECTION_ENABLED', True
+        ), mock.patch.object(
+            collect_entities_iterators, 'EntityWatermark'
+        ) as watermark_class, mock.patch.object(
+            collect_entities_iterators, 'EntityHashStore'
+        ) as entity_hash_store_class:
+            watermark = watermark_class.return_value
+            watermark.is_incremental = True
+            watermark.updated_since = 1000
+            list(iter_collect_entities_per_adaccount(job_scope))
+
+        assert get_campaigns.call_args[1]['params']['filtering'] == [
+            {'field': 'updated_time', 'operator': 'GREATER_THAN', 'value': 1000}
+        ]
+        assert entity_hash_store_class.call_args[1]['prune_unseen'] is False
@@ -0,0 +1,120 @@
+# must be first, as it does event loop patching and other "first" things
+from tests.base.testcase import TestCase, mock
+
+import ujson as json
+
+from facebook_business.exceptions import FacebookRequestError
+
+from common.enums.entity import Entity
+from common.enums.reporttype import ReportType
+from oozer.common.cold_storage.batch_store import SpoolingChunkStore
+from oozer.common.enum import FB_ADACCOUNT_MODEL
+from oozer.common.job_scope import JobScope
+from oozer.entities import collect_entities_iterators, entity_hash, entity_hierarchy, feedback_entity_task
+from oozer.entities.collect_entities_iterators import (
+    iter_collect_entities_per_adaccount,
+    iter_native_entity_hierarchy_per_adaccount,
+)
+from oozer.entities.entity_hierarchy import get_nested_fields, iter_nested_entity_hierarchy
+
+
+def _too_much_data_error():
+    body = json.dumps({'error': {'code': 100, 'error_subcode': 1487534, 'message': 'too much'}})
+    return FacebookRequestError('too much', {}, 400, [], body)
+
+
+class TestNestedEntityHierarchy(TestCase):
+    def test_nested_fields(self):
+        fields = get_nested_fields()
+
+        assert 'id' in fields
+        nested = fields[-1]
+        assert nested.startswith('adsets.limit(25){')
+        assert 'ads.limit(50){' in nested
+        assert nested.endswith('}}')
+
+    def test_entities_flattened_with_nested_edges_paged(self):
+        campaigns = [
+            {
+                'id': 'C1',
+                'adsets': {
+                    'data': [{'id': 'AS1', 'ads': {'data': [{'id': 'A1'}, {'id': 'A2'}]}}],
+                    'paging': {'next': 'https://graph.facebook.com/C1/adsets?after=x'},
+                },
+            },
+            {'id': 'C2'},
+        ]
+        next_adsets = [{'id': 'AS2', 'ads': {'data': [{'id': 'A3'}]}}]
+        ad_account = FB_ADACCOUNT_MODEL('act_1')
+
+        with mock.patch.object(entity_hierarchy, 'RawCursor', return_value=campaigns) as raw_cursor, mock.patch.object(
+            FB_ADACCOUNT_MODEL, 'get_campaigns'
+        ), mock.patch.object(FB_ADACCOUNT_MODEL, 'get_api_assured'):
+            raw_cursor.from_next_url.return_value = next_adsets
+
+            entities = list(iter_nested_entity_hierarchy(ad_account))
+
+        assert entities == [
+            (Entity.Campaign, {'id': 'C1'}),
+            (Entity.AdSet, {'id': 'AS1'}),
+            (Entity.Ad, {'id': 'A1'}),
+            (Entity.Ad, {'id': 'A2'}),
+            (Entity.AdSet, {'id': 'AS2'}),
+            (Entity.Ad, {'id': 'A3'}),
+            (Entity.Campaign, {'id': 'C2'}),
+        ]
+        assert raw_cursor.from_next_url.call_args[0][1] == 'https://graph.facebook.com/C1/adsets?after=x'
+
+    def test_falls_back_to_per_edge_paging_on_too_much_data(self):
+        def iter_nested(_):
+            yield Entity.Campaign, {'id': 'C1'}
+            raise _too_much_data_error()
+
+        def iter_per_edge(_, entity_type):
+            return [{'id': f'{entity_type}1'}, {'id': f'{entity_type}2'}]
+
+        with mock.patch.object(
+            collect_entities_iterators, 'iter_nested_entity_hierarchy', new=iter_nested
+        ), mock.patch.object(collect_entities_iterators, 'iter_native_entities_per_adaccount', new=iter_per_edge):
+            entities = list(iter_native_entity_hierarchy_per_adaccount(FB_ADACCOUNT_MODEL('act_1')))
+
+        assert [entity_data['id'] for _, entity_data in entities] == ['C1', 'C2', 'AS1', 'AS2', 'A1', 'A2']
+
+
+class TestCollectEntityHierarchy(TestCase):
+    def test_entities_stored_and_fed_back_per_entity_type(self):
+        job_scope = JobScope(
+            sweep_id='sweep',
+            ad_account_id='AA',
+            report_type=ReportType.entity,
+            report_variant=Entity.Campaign,
+            tokens=['blah'],
+        )
+        hierarchy = [(Entity.Campaign, {'id': 'C1'}), (Entity.AdSet, {'id': 'AS1'}), (Entity.Ad, {'id': 'A1'})]
+
+        with mock.patch.object(
+            collect_entities_iterators, 'iter_native_entity_hierarchy_per_adaccount', return_value=hierarchy
+        ), mock.patch.object(SpoolingChunkStore, 'store', autospec=True) as store, mock.patch.object(
+            feedback_entity_task.feedback_entities_task, 'delay'
+        ) as feedback, mock.patch.object(
+            collect_entities_iterators, 'PlatformTokenManager'
+        ), mock.patch.object(
+            collect_entities_iterators.jobs_config, 'ENTITY_HIERARCHICAL_COLLECTION_ENABLED', True
+        ), mock.patch.object(
+            entity_hash, 'get_redis'
+        ):
+            assert len(list(iter_collect_entities_per_adaccount(job_scope))) == 3
+
+        stored = {
+            call[0][0].job_scope.job_id: (call[0][1]['id'], call[0][1]['__oprm']['id']) for call in store.call_args_list
+        }
+        assert stored == {
+            'fb|AA|||entity|C': ('C1', 'oprm|m|fb|AA|C|C1|entity'),
+            'fb|AA|||entity|AS': ('AS1', 'oprm|m|fb|AA|AS|AS1|entity'),
+            'fb|AA|||entity|A': ('A1', 'oprm|m|fb|AA|A|A1|entity'),
+        }
+        assert sorted((call[0][1], [entity['id'] for entity in call[0][0]]) for call in feedback.call_args_list) == [
+            (Entity.Ad, ['A1']),
+            (Entity.AdSet, ['AS1']),
+            (Entity.Campaign, ['C1']),
+        ]
@@ -0,0 +1,78 @@
+from tests.base.testcase import TestCase, mock
+
+from common.enums.entity import Entity
+from config import jobs as jobs_config
+from oozer.entities import entity_watermark
+from oozer.entities.entity_watermark import EntityWatermark
+from tests.base.redis import RecordingRedis
+
+
+class EntityWatermarkTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = RecordingRedis(replies={'HGETALL': {}})
+        patcher = mock.patch.object(entity_watermark, 'get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        time_patcher = mock.patch.object(entity_watermark.time, 'time', return_value=1000000.0)
+        time_patcher.start()
+        self.addCleanup(time_patcher.stop)
+
+    def _saved_mapping(self):
+        if not self.redis.pipelines:
+            return None
+        [[(_, key, *mapping), expire]] = self.redis.pipelines
+        assert key == 'AA:C:EntityWatermark'
+        assert expire == ('EXPIRE', key, jobs_config.ENTITY_WATERMARK_TTL)
+        return dict(zip(mapping[::2], mapping[1::2]))
+
+    def test_first_collection_is_full(self):
+        with EntityWatermark('AA', Entity.Campaign) as watermark:
+            assert watermark.updated_since is None
+            watermark.observe({'updated_time': '1970-01-12T14:00:00+0000'})
+            watermark.observe({'updated_time': '1970-01-12T12:00:00+0000'})
+
+        assert self._saved_mapping() == {'updated_time': 1000800, 'full_collected_at': 1000000}
+
+    def test_collects_incrementally_after_full_collection(self):
+        self.redis.replies['HGETALL'] = {b'updated_time': b'990000', b'full_collected_at': b'999000'}
+
+        with EntityWatermark('AA', Entity.Campaign) as watermark:
+            assert watermark.updated_since == 990000 - jobs_config.ENTITY_INCREMENTAL_OVERLAP
+            watermark.observe({'updated_time': '1970-01-12T14:00:00+0000'})
+
+        # last full collection time is kept
+        assert self._saved_mapping() == {'updated_time': 1000800}
+
+    def test_incremental_collection_without_updates_writes_nothing(self):
+        self.redis.replies['HGETALL'] = {b'updated_time': b'990000', b'full_collected_at': b'999000'}
+
+        with EntityWatermark('AA', Entity.Campaign):
+            pass
+
+        assert self._saved_mapping() is None
+
+    def test_collects_all_once_full_collection_is_due(self):
+        full_collected_at = 1000000 - jobs_config.ENTITY_FULL_COLLECTION_INTERVAL
+        self.redis.replies['HGETALL'] = {b'updated_time': b'990000', b'full_collected_at': str(full_collected_at)}
+
+        with EntityWatermark('AA', Entity.Campaign) as watermark:
+            assert watermark.updated_since is None
+
+        assert self._saved_mapping() == {'updated_time': 990000, 'full_collected_at': 1000000}
+
+    def test_not_saved_on_error(self):
+        with self.assertRaises(ValueError):
+            with EntityWatermark('AA', Entity.Campaign) as watermark:
+                watermark.observe({'updated_time': '1970-01-12T14:00:00+0000'})
+                raise ValueError()
+
+        assert self._saved_mapping() is None
+
+    def test_disabled(self):
+        with EntityWatermark('AA', Entity.Campaign, enabled=False) as watermark:
+            watermark.observe({'updated_time': '1970-01-12T14:00:00+0000'})
+            assert watermark.updated_since is None
+
+        assert not self.redis.commands
+        assert self._saved_mapping() is None
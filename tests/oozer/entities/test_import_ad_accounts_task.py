@@ -3,14 +3,18 @@ from common.bugsnag import SEVERITY_ERROR
 from common.error_inspector import ErrorTypesReport
 from tests.base.testcase import TestCase, mock
 
+from facebook_business.exceptions import FacebookRequestError
+
 from common.enums.entity import Entity
 from common.enums.reporttype import ReportType
 from common.tokens import PlatformTokenManager
 from common.store.entities import AdAccountEntity, PageEntity
+from config import jobs as jobs_config
 from oozer.common.console_api import ConsoleApi
 from oozer.common.job_scope import JobScope
 from oozer.common.enum import JobStatus
 from oozer.common.report_job_status_task import report_job_status_task
+from oozer.entities import import_scope_entities_task
 from oozer.entities.import_scope_entities_task import (
     import_ad_accounts_task,
     _get_entities_to_import,
@@ -169,6 +173,58 @@ class TestAdAccountImportTask(TestCase):
         assert args1 == active_page_upsert_args
         assert args2 == inactive_account_upsert_args
 
+    def test_aa_import_concurrently(self):
+        accounts = [dict(ad_account_id='1', active=True), dict(ad_account_id='2', active=True)]
+        job_scope = JobScope(
+            sweep_id=self.sweep_id,
+            entity_type=Entity.Scope,
+            entity_id=self.scope_id,
+            report_type=ReportType.import_accounts,
+            report_variant=Entity.AdAccount,
+            tokens=['token'],
+        )
+        api = mock.Mock()
+        api.call.return_value.json.return_value = {'act_1': {'id': 'act_1'}}
+
+        with mock.patch.object(ConsoleApi, 'get_accounts', return_value=accounts), mock.patch.object(
+            AdAccountEntity, 'upsert'
+        ) as aa_upsert, mock.patch.object(
+            import_scope_entities_task, 'PlatformTokenManager'
+        ) as PlatformTokenManager, mock.patch.object(
+            import_scope_entities_task, 'PageTokenManager'
+        ), mock.patch.object(
+            import_scope_entities_task, 'PlatformApiContext'
+        ) as PlatformApiContext, mock.patch.object(
+            jobs_config, 'CONSOLE_IMPORT_CONCURRENCY_ENABLED', True
+        ):
+            PlatformTokenManager.return_value.get_best_token.return_value = 'token'
+            PlatformApiContext.return_value.__enter__.return_value.api = api
+            assert import_scope_entities_task._import_entities_from_console(Entity.AdAccount, job_scope) == 2
+
+        assert api.call.call_args[1]['params'] == {'ids': 'act_1,act_2', 'fields': 'id'}
+        assert aa_upsert.call_args_list == [
+            mock.call(self.scope_id, '1', is_active=True, updated_by_sweep_id=self.sweep_id, is_accessible=True),
+            mock.call(self.scope_id, '2', is_active=True, updated_by_sweep_id=self.sweep_id, is_accessible=False),
+        ]
+
+    def test_access_tested_one_by_one_when_batch_fails(self):
+        api = mock.Mock()
+        api.call.side_effect = FacebookRequestError('no access', {}, 400, [], '{}')
+
+        with mock.patch.object(
+            import_scope_entities_task, 'PlatformApiContext'
+        ) as PlatformApiContext, mock.patch.object(
+            import_scope_entities_task,
+            '_have_entity_access',
+            side_effect=[True, FacebookRequestError('no access', {}, 400, [], '{}')],
+        ):
+            PlatformApiContext.return_value.__enter__.return_value.api = api
+            accessible_entity_ids = import_scope_entities_task._get_accessible_entity_ids(
+                Entity.AdAccount, ['1', '2'], 'token'
+            )
+
+        assert accessible_entity_ids == {'1'}
+
     def test__get_entities_to_import(self):
         accounts = [
             self._ad_acc('1', True),
@@ -0,0 +1,103 @@
+# must be first, as it does event loop patching and other "first" things
+from tests.base.testcase import TestCase, mock
+
+from common.enums.entity import Entity
+from common.enums.reporttype import ReportType
+from config import jobs as jobs_config
+from oozer.common.cold_storage.batch_store import ChunkDumpStore
+from oozer.common.enum import FB_PAGE_MODEL
+from oozer.common.job_scope import JobScope
+from oozer.entities import collect_entities_iterators, feedback_entity_task, inline_comments
+from oozer.entities.collect_entities_iterators import iter_collect_entities_per_page
+from oozer.entities.inline_comments import PagePostCommentCounts, get_inline_comments_field, pop_inline_comments
+from tests.base.redis import RecordingRedis
+
+
+class InlineCommentsTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = RecordingRedis(replies={'HGETALL': {b'PP1': b'30', b'PP2': b'40'}})
+        patcher = mock.patch.object(inline_comments, 'get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _pending_page_post_ids(self):
+        return {
+            page_post_id
+            for _, key, *page_post_ids in self.redis.get_commands('SADD')
+            if key == 'P:PagePostsPendingComments'
+            for page_post_id in page_post_ids
+        }
+
+
+class PagePostCommentCountsTests(InlineCommentsTestCase):
+    def test_inline_comments_field(self):
+        field = get_inline_comments_field()
+
+        assert field.startswith('comments.limit(25).summary(true).filter(stream){')
+        assert 'message' in field
+
+    def test_pop_inline_comments(self):
+        page_post_data = {'id': 'PP1', 'comments': {'data': [{'id': 'CM1'}], 'summary': {'total_count': 1}}}
+
+        assert pop_inline_comments(page_post_data) == ([{'id': 'CM1'}], 1)
+        assert page_post_data == {'id': 'PP1'}
+        assert pop_inline_comments({'id': 'PP2'}) == ([], 0)
+
+    def test_pending_only_when_not_all_inline_and_count_changed(self):
+        with PagePostCommentCounts('P') as comment_counts:
+            comment_counts.observe('PP1', 25, 30)  # more than inline, same as before
+            comment_counts.observe('PP2', 25, 45)  # more than inline, changed
+            comment_counts.observe('PP3', 25, 26)  # more than inline, not seen before
+            comment_counts.observe('PP4', 3, 3)  # all inline
+            comment_counts.observe('PP5', 0, None)  # no summary
+
+        assert self._pending_page_post_ids() == {'PP2', 'PP3', 'PP5'}
+        [(_, key, *counts)] = self.redis.get_commands('HMSET')
+        assert key == 'P:PagePostCommentCounts'
+        assert dict(zip(counts[::2], counts[1::2])) == {'PP1': 30, 'PP2': 45, 'PP3': 26, 'PP4': 3}
+
+
+class CollectInlineCommentsTests(InlineCommentsTestCase):
+    def test_comments_stored_with_page_posts(self):
+        job_scope = JobScope(
+            sweep_id='sweep',
+            ad_account_id='P',
+            report_type=ReportType.entity,
+            report_variant=Entity.PagePost,
+            tokens=['blah'],
+        )
+        page_posts = [
+            {
+                'id': 'PP1',
+                'comments': {
+                    'data': [{'id': 'CM1'}, {'id': 'CM2'}],
+                    'summary': {'total_count': 30},
+                    'paging': {'next': 'https://graph.facebook.com/PP1/comments?after=x'},
+                },
+            },
+            {'id': 'PP3'},
+        ]
+
+        with mock.patch.object(FB_PAGE_MODEL, 'get_posts', return_value=page_posts) as get_posts, mock.patch.object(
+            ChunkDumpStore, 'store', autospec=True
+        ) as store, mock.patch.object(collect_entities_iterators, 'PlatformTokenManager'), mock.patch.object(
+            feedback_entity_task.feedback_entities_task, 'delay'
+        ), mock.patch.object(
+            jobs_config, 'PAGE_POST_INLINE_COMMENTS_ENABLED', True
+        ):
+            assert [page_post['id'] for page_post in iter_collect_entities_per_page(job_scope)] == ['PP1', 'PP3']
+
+        assert get_inline_comments_field() in get_posts.call_args[1]['fields']
+        stored_comments = [
+            (datum['id'], datum['page_post_id'], datum['__oprm']['id'])
+            for chunk_store, datum in (call[0] for call in store.call_args_list)
+            if chunk_store.job_scope.report_variant == Entity.Comment
+        ]
+        assert stored_comments == [
+            ('CM1', 'PP1', 'oprm|m|fb|P|CM|CM1|entity'),
+            ('CM2', 'PP1', 'oprm|m|fb|P|CM|CM2|entity'),
+        ]
+        assert all('comments' not in datum for _, datum in (call[0] for call in store.call_args_list))
+        # PP1 was seen with 30 comments last time already
+        assert self._pending_page_post_ids() == set()
@@ -1,7 +1,9 @@
-from tests.base.testcase import TestCase
+from tests.base.testcase import TestCase, mock
 from datetime import datetime
 
 from common.enums.entity import Entity
+from common.enums.reporttype import ReportType
+from oozer.common.cold_storage import batch_store
 from oozer.common.enum import ReportEntityApiKind
 from oozer.common.job_scope import JobScope
 from oozer.metrics import collect_organic_insights
@@ -55,3 +57,44 @@ class VendorOrganicDataInjectionTests(TestCase):
                 else:
                     result = collect_organic_insights.InsightsOrganic._detect_report_api_kind(job_scope)
                     assert result != ''
+
+    def test_batch_insights_stored_per_entity(self):
+        job_scope = JobScope(
+            sweep_id=self.sweep_id,
+            ad_account_id=self.ad_account_id,
+            entity_type=Entity.PageVideo,
+            entity_id='PV1',
+            entity_ids=['PV1', 'PV2', 'PV3'],
+            report_type=ReportType.lifetime,
+            report_variant=Entity.PageVideo,
+            tokens=['blah'],
+        )
+        response = {
+            'PV1': {'data': [{'name': 'total_video_views', 'values': [{'value': 5}]}]},
+            'PV2': {'data': [{'name': 'total_video_views', 'values': [{'value': 7}]}]},
+        }
+        api = mock.Mock()
+        api.call.return_value.json.return_value = response
+
+        with mock.patch.object(collect_organic_insights, 'PlatformApiContext') as PlatformApiContext, mock.patch.object(
+            collect_organic_insights, 'PlatformTokenManager'
+        ), mock.patch.object(batch_store.NormalStore, 'store', autospec=True) as store:
+            PlatformApiContext.return_value.__enter__.return_value.api = api
+            data = list(collect_organic_insights.InsightsOrganic.iter_collect_insights(job_scope))
+
+        assert [(datum['page_video_id'], datum['total_video_views']) for datum in data] == [('PV1', 5), ('PV2', 7)]
+        method, path = api.call.call_args[0]
+        assert (method, path) == ('GET', ('video_insights',))
+        assert api.call.call_args[1]['params']['ids'] == 'PV1,PV2,PV3'
+        # raw records for all, even ones with no insights
+        raw_records = [datum for normal_store, datum in (aa for aa, _ in store.call_args_list) if 'payload' in datum]
+        assert [(datum['page_video_id'], len(datum['payload'])) for datum in raw_records] == [
+            ('PV1', 1),
+            ('PV2', 1),
+            ('PV3', 0),
+        ]
+        assert {normal_store.job_scope.entity_id for normal_store, _ in (aa for aa, _ in store.call_args_list)} == {
+            'PV1',
+            'PV2',
+            'PV3',
+        }
@@ -0,0 +1,115 @@
+from tests.base.testcase import TestCase
+
+import copy
+import functools
+
+import ujson as json
+
+from common.enums.entity import Entity
+from common.enums.reporttype import ReportType
+from oozer.common.job_scope import JobScope
+from oozer.common.vendor_data import add_vendor_data
+from oozer.metrics.collect_insights import Insights
+from oozer.metrics.field_transformation import FieldTransformation
+from oozer.metrics.row_processor import InsightsRowProcessor
+from oozer.metrics.vendor_data_extractor import report_type_vendor_data_extractor_map
+
+TIMEZONE = 'America/Los_Angeles'
+
+
+def _row(**extra):
+    row = {
+        'account_id': '123',
+        'campaign_id': 'C1',
+        'adset_id': 'AS1',
+        'ad_id': 'A1',
+        'date_start': '2019-07-01',
+        'date_stop': '2019-07-01',
+        'spend': '1.23',
+        'impressions': '100',
+        'actions': [
+            {'action_type': 'link_click', 'value': '3', '1d_click': '2', '28d_click': '3'},
+            {'action_type': 'offsite_conversion.fb_pixel_view_content', 'value': '1', '1d_view': '1'},
+        ],
+        'unique_actions': [{'action_type': 'link_click', 'value': '2'}],
+        # breakdown values, with characters universal ID needs to quote
+        'age': '18-24',
+        'gender': 'female',
+        'dma': 'Macon, GA/Warner Robins',
+        'region': 'Île-de-France',
+        'country': 'FR',
+        'publisher_platform': 'facebook',
+        'platform_position': 'feed|right',
+        'hourly_stats_aggregated_by_advertiser_time_zone': '17:00:00 - 17:59:59',
+    }
+    row.update(extra)
+    return row
+
+
+def _golden(row, job_scope, entity_type):
+    """
+    How rows were processed before InsightsRowProcessor
+    """
+    vendor_data_extractor = report_type_vendor_data_extractor_map[job_scope.report_type]
+    if job_scope.report_type == ReportType.day_hour:
+        vendor_data_extractor = functools.partial(vendor_data_extractor, job_scope.ad_account_timezone_name)
+    aux_data = {
+        'ad_account_id': job_scope.ad_account_id,
+        'entity_type': entity_type,
+        'report_type': job_scope.report_type,
+    }
+    add_vendor_data(row, **vendor_data_extractor(row, **aux_data))
+    return FieldTransformation.transform(row, Insights._ACTIONS_FIELDS_TO_TRANSFORM)
+
+
+class InsightsRowProcessorTests(TestCase):
+    def _assert_parity(self, report_type, entity_type, row):
+        job_scope = JobScope(
+            ad_account_id='123', report_type=report_type, report_variant=entity_type, ad_account_timezone_name=TIMEZONE,
+        )
+        expected = _golden(copy.deepcopy(row), job_scope, entity_type)
+        actual = InsightsRowProcessor(job_scope, entity_type, Insights._ACTIONS_FIELDS_TO_TRANSFORM)(copy.deepcopy(row))
+
+        assert actual == expected
+        assert list(actual) == list(expected)
+        assert list(actual['__oprm']) == list(expected['__oprm'])
+        assert json.dumps(actual, sort_keys=True) == json.dumps(expected, sort_keys=True)
+
+    def test_parity_with_extractors_and_field_transformation(self):
+        for report_type in report_type_vendor_data_extractor_map:
+            for entity_type in [Entity.Campaign, Entity.AdSet, Entity.Ad]:
+                with self.subTest(report_type=report_type, entity_type=entity_type):
+                    self._assert_parity(report_type, entity_type, _row())
+
+    def test_parity_for_edge_cases(self):
+        rows = [
+            # no actions at all
+            {k: v for k, v in _row().items() if k not in ('actions', 'unique_actions')},
+            # empty breakdown values are dropped from end of the ID
+            _row(platform_position='', publisher_platform=''),
+            # vendor data there already
+            _row(__oprm={'something': 'else'}),
+            # hour crossing into next day in UTC
+            _row(hourly_stats_aggregated_by_advertiser_time_zone='23:00:00 - 23:59:59'),
+        ]
+        for index, row in enumerate(rows):
+            for report_type in [ReportType.day_platform, ReportType.day_hour, ReportType.lifetime]:
+                with self.subTest(row=index, report_type=report_type):
+                    self._assert_parity(report_type, Entity.Ad, row)
+
+    def test_processes_in_place(self):
+        job_scope = JobScope(ad_account_id='123', report_type=ReportType.day, report_variant=Entity.Ad)
+        row = _row()
+        assert InsightsRowProcessor(job_scope, Entity.Ad, ['actions'])(row) is row
+        assert row['__transformed'] == {
+            'actions': {
+                'link_click': {'value': '3', '1d_click': '2', '28d_click': '3'},
+                'offsite_conversion.fb_pixel_view_content': {'value': '1', '1d_view': '1'},
+            }
+        }
+
+    def test_parity_for_page_level_lifetime(self):
+        job_scope = JobScope(ad_account_id='123', report_type=ReportType.lifetime, report_variant=Entity.Page)
+        row = {'id': 'P1'}
+        expected = _golden(copy.deepcopy(row), job_scope, Entity.Page)
+        assert InsightsRowProcessor(job_scope, Entity.Page, Insights._ACTIONS_FIELDS_TO_TRANSFORM)(row) == expected
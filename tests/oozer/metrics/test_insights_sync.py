@@ -0,0 +1,88 @@
+from tests.base.testcase import TestCase, mock
+
+import ujson as json
+
+from facebook_business.exceptions import FacebookRequestError
+from pynamodb.exceptions import DoesNotExist
+
+from common.enums.entity import Entity
+from common.enums.reporttype import ReportType
+from config import facebook as facebook_config
+from oozer.metrics import collect_insights
+from oozer.metrics.collect_insights import Insights, estimate_report_size
+from oozer.common.job_scope import JobScope
+
+
+def _fb_error(code, subcode, message='error'):
+    body = json.dumps({'error': {'code': code, 'error_subcode': subcode, 'message': message}})
+    return FacebookRequestError(message, {}, 400, [], body)
+
+
+class EstimateReportSizeTests(TestCase):
+    def _job_scope(self, **kwargs):
+        return JobScope(
+            dict(sweep_id='sweep', ad_account_id='AA', report_type=ReportType.day_age_gender, tokens=['blah']), **kwargs
+        )
+
+    def test_last_size_wins(self):
+        job_scope = self._job_scope(entity_id='A1', entity_type=Entity.Ad, range_start='2020-01-01')
+        last_report = mock.Mock(last_total_datapoint_count=1234)
+        with mock.patch.object(collect_insights.JobReport, 'get', return_value=last_report):
+            assert estimate_report_size(job_scope) == 1234
+
+    def test_guess_for_single_entity_per_day_in_range(self):
+        job_scope = self._job_scope(
+            entity_id='A1', entity_type=Entity.Ad, range_start='2020-01-01', range_end='2020-01-03'
+        )
+        with mock.patch.object(collect_insights.JobReport, 'get', side_effect=DoesNotExist):
+            assert estimate_report_size(job_scope) == 21 * 3
+
+    def test_no_guess_for_per_parent_or_geo_reports(self):
+        per_parent = self._job_scope(report_variant=Entity.Ad, range_start='2020-01-01')
+        geo = self._job_scope(
+            entity_id='A1', entity_type=Entity.Ad, range_start='2020-01-01', report_type=ReportType.day_dma
+        )
+        with mock.patch.object(collect_insights.JobReport, 'get', side_effect=DoesNotExist):
+            assert estimate_report_size(per_parent) is None
+            assert estimate_report_size(geo) is None
+
+    def test_prefers_sync_only_when_enabled_and_small(self):
+        job_scope = self._job_scope(entity_id='A1', entity_type=Entity.Ad, range_start='2020-01-01')
+        with mock.patch.object(collect_insights, 'estimate_report_size', return_value=10):
+            with mock.patch.object(facebook_config, 'INSIGHTS_SYNC_ENABLED', False):
+                assert not Insights.prefers_sync(job_scope)
+            with mock.patch.object(facebook_config, 'INSIGHTS_SYNC_ENABLED', True):
+                assert Insights.prefers_sync(job_scope)
+                with mock.patch.object(facebook_config, 'INSIGHTS_SYNC_MAX_ROWS', 5):
+                    assert not Insights.prefers_sync(job_scope)
+
+
+class SyncInsightsTests(TestCase):
+    def test_reads_inline(self):
+        fb_entity = mock.Mock()
+        fb_entity.get_insights.return_value = [mock.Mock(export_all_data=lambda: {'ad_id': '1'})]
+
+        with mock.patch.object(Insights, 'iter_ads_insights') as iter_async:
+            assert list(Insights.iter_ads_insights_sync(fb_entity, {'level': 'ad'})) == [{'ad_id': '1'}]
+
+        fb_entity.get_insights.assert_called_once_with(params={'level': 'ad'})
+        assert not iter_async.called
+
+    def test_falls_back_to_async_when_too_large(self):
+        fb_entity = mock.Mock()
+        fb_entity.get_insights.side_effect = _fb_error(100, 1487534)
+
+        with mock.patch.object(Insights, 'iter_ads_insights', return_value=iter([{'ad_id': '1'}])) as iter_async:
+            assert list(Insights.iter_ads_insights_sync(fb_entity, {'level': 'ad'})) == [{'ad_id': '1'}]
+
+        iter_async.assert_called_once_with(fb_entity, {'level': 'ad'})
+
+    def test_other_errors_are_raised(self):
+        fb_entity = mock.Mock()
+        fb_entity.get_insights.side_effect = _fb_error(17, None)
+
+        with mock.patch.object(Insights, 'iter_ads_insights') as iter_async:
+            with self.assertRaises(FacebookRequestError):
+                Insights.iter_ads_insights_sync(fb_entity, {'level': 'ad'})
+
+        assert not iter_async.called
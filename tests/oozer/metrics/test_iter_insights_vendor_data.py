@@ -7,7 +7,7 @@ import functools
 from common import id_tools
 from common.enums.entity import Entity
 from common.enums.reporttype import ReportType
-from oozer.common.cold_storage.batch_store import ChunkDumpStore
+from oozer.common.cold_storage.batch_store import SpoolingChunkStore
 from oozer.metrics import collect_insights, vendor_data_extractor
 from oozer.common.job_scope import JobScope
 from tests.base import random
@@ -360,7 +360,7 @@ class VendorDataInjectionTests(TestCase):
 
                 with mock.patch.object(
                     collect_insights.Insights, 'iter_ads_insights', return_value=[input_data]
-                ), mock.patch.object(ChunkDumpStore, 'store') as store:
+                ), mock.patch.object(SpoolingChunkStore, 'store') as store:
 
                     data_iter = collect_insights.Insights.iter_collect_insights(job_scope, None)
                     assert len(list(data_iter)) == 1
@@ -414,7 +414,7 @@ class VendorDataInjectionTests(TestCase):
 
                 with mock.patch.object(
                     collect_insights.Insights, 'iter_ads_insights', return_value=[input_data]
-                ), mock.patch.object(ChunkDumpStore, 'store') as store:
+                ), mock.patch.object(SpoolingChunkStore, 'store') as store:
 
                     data_iter = collect_insights.Insights.iter_collect_insights(job_scope, None)
                     assert len(list(data_iter)) == 1
@@ -479,7 +479,7 @@ class VendorDataInjectionTests(TestCase):
 
                 with mock.patch.object(
                     collect_insights.Insights, 'iter_ads_insights', return_value=[input_data]
-                ), mock.patch.object(ChunkDumpStore, 'store') as store:
+                ), mock.patch.object(SpoolingChunkStore, 'store') as store:
 
                     data_iter = collect_insights.Insights.iter_collect_insights(job_scope, None)
                     assert len(list(data_iter)) == 1
@@ -549,7 +549,7 @@ class VendorDataInjectionTests(TestCase):
 
                 with mock.patch.object(
                     collect_insights.Insights, 'iter_ads_insights', return_value=[input_data]
-                ), mock.patch.object(ChunkDumpStore, 'store') as store:
+                ), mock.patch.object(SpoolingChunkStore, 'store') as store:
 
                     data_iter = collect_insights.Insights.iter_collect_insights(job_scope, None)
                     assert len(list(data_iter)) == 1
@@ -617,7 +617,7 @@ class VendorDataInjectionTests(TestCase):
 
                 with mock.patch.object(
                     collect_insights.Insights, 'iter_ads_insights', return_value=[input_data]
-                ), mock.patch.object(ChunkDumpStore, 'store') as store:
+                ), mock.patch.object(SpoolingChunkStore, 'store') as store:
 
                     data_iter = collect_insights.Insights.iter_collect_insights(job_scope, None)
                     assert len(list(data_iter)) == 1
@@ -0,0 +1,187 @@
+from tests.base.testcase import TestCase, mock
+
+from common.enums.entity import Entity
+from common.enums.reporttype import ReportType
+from config import jobs as jobs_config
+from oozer.common.cold_storage.batch_store import SpoolingChunkStore
+from oozer.common.enum import FB_ADACCOUNT_MODEL, ReportEntityApiKind
+from oozer.common.job_scope import JobScope
+from oozer.metrics import collect_insights, recent_delivery
+from oozer.metrics.collect_insights import Insights, JobScopeParsed
+from oozer.metrics.recent_delivery import LifetimeCollectionScope, RecentDeliveryObserver
+from tests.base.redis import RecordingRedis
+
+
+class RecentDeliveryTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = RecordingRedis(replies={'HGETALL': {}, 'ZRANGEBYSCORE': []})
+        patcher = mock.patch.object(recent_delivery, 'get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        time_patcher = mock.patch.object(recent_delivery.time, 'time', return_value=1000000.0)
+        time_patcher.start()
+        self.addCleanup(time_patcher.stop)
+
+
+class LifetimeCollectionScopeTests(RecentDeliveryTestCase):
+    def _saved_mapping(self):
+        if not self.redis.pipelines:
+            return None
+        [[(_, key, *mapping), expire]] = self.redis.pipelines
+        assert key == 'AA:A:LifetimeCollectionScope'
+        assert expire == ('EXPIRE', key, jobs_config.LIFETIME_DELIVERY_TTL)
+        return dict(zip(mapping[::2], mapping[1::2]))
+
+    def test_first_collection_is_full(self):
+        with LifetimeCollectionScope('AA', Entity.Ad) as scope:
+            assert scope.is_full
+
+        assert self._saved_mapping() == {'collected_at': 1000000, 'full_collected_at': 1000000}
+
+    def test_collects_delivering_entities_after_full_collection(self):
+        self.redis.replies['HGETALL'] = {b'collected_at': b'999000', b'full_collected_at': b'990000'}
+        self.redis.replies['ZRANGEBYSCORE'] = [b'A1', b'A2']
+
+        with LifetimeCollectionScope('AA', Entity.Ad) as scope:
+            assert scope.entity_ids == {'A1', 'A2'}
+
+        assert self.redis.get_commands('ZRANGEBYSCORE') == [
+            ('ZRANGEBYSCORE', 'AA:A:RecentDelivery', 999000 - jobs_config.LIFETIME_DELIVERY_OVERLAP, '+inf')
+        ]
+        assert self._saved_mapping() == {'collected_at': 1000000}
+
+    def test_nothing_delivered(self):
+        self.redis.replies['HGETALL'] = {b'collected_at': b'999000', b'full_collected_at': b'990000'}
+
+        scope = LifetimeCollectionScope('AA', Entity.Ad)
+
+        assert scope.is_empty
+
+    def test_full_collection_when_too_many_delivered(self):
+        self.redis.replies['HGETALL'] = {b'collected_at': b'999000', b'full_collected_at': b'990000'}
+        self.redis.replies['ZRANGEBYSCORE'] = [b'A1', b'A2']
+
+        with mock.patch.object(jobs_config, 'LIFETIME_DELIVERY_AWARE_MAX_ENTITIES', 1):
+            assert LifetimeCollectionScope('AA', Entity.Ad).is_full
+
+    def test_full_collection_after_interval(self):
+        full_collected_at = 1000000 - jobs_config.LIFETIME_FULL_COLLECTION_INTERVAL
+        self.redis.replies['HGETALL'] = {b'collected_at': b'999000', b'full_collected_at': str(full_collected_at)}
+
+        with LifetimeCollectionScope('AA', Entity.Ad) as scope:
+            assert scope.is_full
+
+        assert self._saved_mapping() == {'collected_at': 1000000, 'full_collected_at': 1000000}
+
+    def test_not_saved_on_failure(self):
+        with self.assertRaises(ValueError):
+            with LifetimeCollectionScope('AA', Entity.Ad):
+                raise ValueError()
+
+        assert self._saved_mapping() is None
+
+    def test_submitted_scope_kept(self):
+        submitted = {'started_at': 990000, 'entity_ids': ['A1']}
+
+        with LifetimeCollectionScope('AA', Entity.Ad, submitted=submitted) as scope:
+            assert scope.entity_ids == {'A1'}
+            assert scope.to_dict() == submitted
+
+        assert not self.redis.get_commands('HGETALL')
+        assert self._saved_mapping() == {'collected_at': 990000}
+
+    def test_disabled(self):
+        with LifetimeCollectionScope('AA', Entity.Ad, enabled=False) as scope:
+            assert scope.is_full
+
+        assert not self.redis.get_commands('HGETALL')
+        assert self._saved_mapping() is None
+
+
+class RecentDeliveryObserverTests(RecentDeliveryTestCase):
+    def test_recent_delivery_saved_per_level(self):
+        # time.time is patched, so days are far enough not to depend on today
+        recent_day = '2999-01-01'
+        old_day = '2000-01-01'
+
+        with RecentDeliveryObserver('AA') as observer:
+            observer.observe({'date_start': recent_day, 'campaign_id': 'C1', 'adset_id': 'AS1', 'ad_id': 'A1'})
+            observer.observe({'date_start': old_day, 'campaign_id': 'C2', 'adset_id': 'AS2', 'ad_id': 'A2'})
+
+        assert sorted(self.redis.get_commands('ZADD')) == [
+            ('ZADD', 'AA:A:RecentDelivery', 1000000.0, 'A1'),
+            ('ZADD', 'AA:AS:RecentDelivery', 1000000.0, 'AS1'),
+            ('ZADD', 'AA:C:RecentDelivery', 1000000.0, 'C1'),
+        ]
+
+
+class DeliveryAwareReportParamsTests(RecentDeliveryTestCase):
+    def _job_scope(self, report_type=ReportType.lifetime):
+        return JobScope(
+            sweep_id='sweep',
+            ad_account_id='AA',
+            report_type=report_type,
+            report_variant=Entity.AdSet,
+            range_start='2020-01-01',
+            tokens=['blah'],
+        )
+
+    def test_lifetime_report_filtered_by_delivering_entities(self):
+        self.redis.replies['HGETALL'] = {b'collected_at': b'999000', b'full_collected_at': b'990000'}
+        self.redis.replies['ZRANGEBYSCORE'] = [b'AS2', b'AS1']
+
+        with mock.patch.object(jobs_config, 'LIFETIME_DELIVERY_AWARE_ENABLED', True):
+            scope_parsed = JobScopeParsed(self._job_scope(), ReportEntityApiKind.Ad)
+
+        assert scope_parsed.report_params['filtering'] == [
+            {'field': 'adset.id', 'operator': 'IN', 'value': ['AS1', 'AS2']}
+        ]
+
+    def test_not_filtered_when_disabled(self):
+        scope_parsed = JobScopeParsed(self._job_scope(), ReportEntityApiKind.Ad)
+
+        assert 'filtering' not in scope_parsed.report_params
+        assert not self.redis.get_commands('HGETALL')
+
+    def test_download_stored_with_scope_report_was_submitted_with(self):
+        self.redis.replies['HGETALL'] = {b'collected_at': b'999000', b'full_collected_at': b'990000'}
+        self.redis.replies['ZRANGEBYSCORE'] = [b'AS1']
+        job_scope = self._job_scope()
+
+        with mock.patch.object(jobs_config, 'LIFETIME_DELIVERY_AWARE_ENABLED', True), mock.patch.object(
+            FB_ADACCOUNT_MODEL, 'get_insights', return_value={'id': 'RR1'}
+        ), mock.patch.object(collect_insights, 'PlatformTokenManager'):
+            assert Insights.start_ads_insights(job_scope) == 'RR1'
+
+            # full collection falls due while the report is baked
+            with mock.patch.object(
+                recent_delivery.time, 'time', return_value=1000000.0 + jobs_config.LIFETIME_FULL_COLLECTION_INTERVAL
+            ), mock.patch.object(collect_insights, 'FacebookAsyncReportStatus') as report_status, mock.patch.object(
+                SpoolingChunkStore, 'store'
+            ):
+                report_status.return_value.iter_report_data.return_value = [{'adset_id': 'AS1'}]
+                assert len(list(Insights.iter_download_insights('RR1', job_scope))) == 1
+
+        assert job_scope.lifetime_collection_scope == {'started_at': 1000000, 'entity_ids': ['AS1']}
+        [[(_, key, *mapping), _]] = self.redis.pipelines
+        assert key == 'AA:AS:LifetimeCollectionScope'
+        # not a full collection, and entities delivering while report was baked are collected next time
+        assert mapping == ['collected_at', 1000000]
+
+    def test_download_not_recorded_when_store_fails(self):
+        job_scope = self._job_scope()
+        job_scope.lifetime_collection_scope = {'started_at': 1000000, 'entity_ids': None}
+
+        with mock.patch.object(jobs_config, 'LIFETIME_DELIVERY_AWARE_ENABLED', True), mock.patch.object(
+            collect_insights, 'PlatformTokenManager'
+        ), mock.patch.object(collect_insights, 'FacebookAsyncReportStatus') as report_status, mock.patch.object(
+            SpoolingChunkStore, 'store'
+        ), mock.patch.object(
+            SpoolingChunkStore, '__exit__', side_effect=IOError('upload failed')
+        ):
+            report_status.return_value.iter_report_data.return_value = [{'adset_id': 'AS1'}]
+            with self.assertRaises(IOError):
+                list(Insights.iter_download_insights('RR1', job_scope))
+
+        assert not self.redis.get_commands('HMSET')
@@ -0,0 +1,169 @@
+from tests.base.testcase import TestCase, mock
+
+import pickle
+
+from urllib.parse import parse_qs
+
+import gevent.pywsgi
+import ujson as json
+
+from common.enums.entity import Entity
+from common.enums.reporttype import ReportType
+from config import facebook as facebook_config
+from oozer.common.job_context import JobContext
+from oozer.common.job_scope import JobScope
+from oozer.metrics import report_run_poller
+from oozer.metrics.report_run_poller import ReportRunPoller, STATUS_EXPIRED
+
+
+class FakeRedis:
+    """
+    Just the hash and sorted set commands poller uses
+    """
+
+    def __init__(self):
+        self.hashes = {}
+        self.zsets = {}
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    def hmget(self, key, fields):
+        return [self.hashes.get(key, {}).get(field) for field in fields]
+
+    def hdel(self, key, field):
+        return 1 if self.hashes.get(key, {}).pop(field, None) is not None else 0
+
+    def hlen(self, key):
+        return len(self.hashes.get(key, {}))
+
+    def zadd(self, key, member, score):
+        self.zsets.setdefault(key, {})[member] = score
+
+    def zrem(self, key, member):
+        self.zsets.get(key, {}).pop(member, None)
+
+    def zrangebyscore(self, key, low, high):
+        members = self.zsets.get(key, {})
+        return [
+            member.encode() for member, score in sorted(members.items(), key=lambda x: x[1]) if low <= score <= high
+        ]
+
+
+class FakeGraphApi:
+    """
+    Answers multi-ID reads of report run statuses, the way Graph API does
+    """
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.requests = []
+        self.server = gevent.pywsgi.WSGIServer(('127.0.0.1', 0), self, log=None)
+
+    def __call__(self, environ, start_response):
+        query = parse_qs(environ['QUERY_STRING'])
+        self.requests.append(query)
+        ids = query['ids'][0].split(',')
+        body = {
+            report_run_id: {'id': report_run_id, 'async_status': self.statuses[report_run_id]}
+            for report_run_id in ids
+            if report_run_id in self.statuses
+        }
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        return [json.dumps(body).encode()]
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    def __enter__(self):
+        self.server.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.stop()
+
+
+class TestReportRunPoller(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = FakeRedis()
+        patcher = mock.patch.object(report_run_poller, 'get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _register(self, report_run_id, token='token', registered_at=1000.0):
+        job_scope = JobScope(
+            sweep_id='sweep',
+            ad_account_id='AA',
+            entity_id='AA',
+            entity_type=Entity.AdAccount,
+            report_type=ReportType.day,
+            report_variant=Entity.Ad,
+            tokens=[token],
+        )
+        with mock.patch.object(report_run_poller.time, 'time', return_value=registered_at):
+            report_run_poller.register_report_run(report_run_id, job_scope, JobContext())
+
+    def test_register_schedules_first_check_after_min_interval(self):
+        self._register('R1')
+
+        assert report_run_poller.get_outstanding_count() == 1
+        assert self.redis.zsets[report_run_poller._report_runs_due_key] == {
+            'R1': 1000.0 + facebook_config.INSIGHTS_MIN_POLLING_INTERVAL
+        }
+
+    def test_poll_once_against_fake_graph_api(self):
+        self._register('R1', token='token-a')
+        self._register('R2', token='token-a')
+        self._register('R3', token='token-b')
+        self._register('R4', token='token-b')
+
+        on_complete = mock.Mock()
+        statuses = {'R1': 'Job Completed', 'R2': 'Job Running', 'R3': 'Job Failed'}
+        with FakeGraphApi(statuses) as graph_api, mock.patch.object(facebook_config, 'GRAPH_URL', graph_api.url):
+            checked, completed = ReportRunPoller(on_complete=on_complete).poll_once(now=1001.0)
+
+        assert (checked, completed) == (4, 2)
+        # one status request per token
+        assert len(graph_api.requests) == 2
+        assert {request['access_token'][0] for request in graph_api.requests} == {'token-a', 'token-b'}
+
+        assert {call[0][:2] for call in on_complete.call_args_list} == {('R1', 'Job Completed'), ('R3', 'Job Failed')}
+        # pending one and the one FB did not return are checked again later, with backoff
+        assert set(self.redis.hashes[report_run_poller._report_runs_key]) == {'R2', 'R4'}
+        due = self.redis.zsets[report_run_poller._report_runs_due_key]
+        assert due == {
+            'R2': 1001.0 + facebook_config.INSIGHTS_MIN_POLLING_INTERVAL * 2,
+            'R4': 1001.0 + facebook_config.INSIGHTS_MIN_POLLING_INTERVAL * 2,
+        }
+        assert pickle.loads(self.redis.hashes[report_run_poller._report_runs_key]['R2']).poll_count == 1
+
+    def test_poll_once_batches_status_requests(self):
+        for index in range(5):
+            self._register(f'R{index}')
+
+        fetch_statuses = mock.Mock(return_value={})
+        checked, completed = ReportRunPoller(fetch_statuses=fetch_statuses, batch_size=2).poll_once(now=1001.0)
+
+        assert (checked, completed) == (5, 0)
+        assert [len(call[0][1]) for call in fetch_statuses.call_args_list] == [2, 2, 1]
+
+    def test_poll_once_skips_not_yet_due(self):
+        self._register('R1')
+
+        fetch_statuses = mock.Mock()
+        assert ReportRunPoller(fetch_statuses=fetch_statuses).poll_once(now=1000.1) == (0, 0)
+        assert not fetch_statuses.called
+
+    def test_poll_once_gives_up_on_old_report_runs(self):
+        self._register('R1')
+
+        fetch_statuses = mock.Mock()
+        on_complete = mock.Mock()
+        poller = ReportRunPoller(fetch_statuses=fetch_statuses, on_complete=on_complete)
+        poller.poll_once(now=1000.0 + facebook_config.INSIGHTS_REPORT_RUN_MAX_AGE + 1)
+
+        assert not fetch_statuses.called
+        assert on_complete.call_args[0][:2] == ('R1', STATUS_EXPIRED)
+        assert report_run_poller.get_outstanding_count() == 0
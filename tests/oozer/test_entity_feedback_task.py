@@ -11,7 +11,11 @@ from common.enums.entity import Entity
 from common.facebook.entity_model_map import MODEL_ENTITY_TYPE_MAP as FB_MODEL_ENTITY_TYPE_MAP
 from common.store.entities import ENTITY_TYPE_MODEL_MAP as ENTITY_TYPE_DB_MODEL_MAP
 from facebook_business.adobjects import campaign, adcreative, advideo, customaudience
-from oozer.entities.tasks import feedback_entity_task
+from pynamodb.exceptions import UpdateError
+from config import jobs as jobs_config
+from oozer.entities import feedback_entity_task as feedback_entity_task_module
+from oozer.entities.feedback_entity_task import EntityFeedbackBuffer
+from oozer.entities.tasks import feedback_entity_task, feedback_entities_task
 from tests.base.random import gen_string_id
 
 
@@ -230,3 +234,61 @@ def test_all_upserted(entity_type, entity_data, expected):
 
     record = ENTITY_TYPE_DB_MODEL_MAP[entity_type].get(entity_data['account_id'], entity_data['id'])
     assert record.to_dict() == expected
+
+
+class TestEntitiesFeedback(TestCase):
+    def test_batch_writes_what_single_feedback_writes(self):
+        entities_data = [
+            {'id': 'A1', 'account_id': 'AA', 'created_time': '2019-01-01T12:00:00.000Z', 'campaign_id': 'C1'},
+            {'id': 'A2', 'account_id': 'AA', 'created_time': '2019-01-01T12:00:00.000Z', 'status': 'DELETED'},
+        ]
+        Model = ENTITY_TYPE_DB_MODEL_MAP[Entity.Ad]
+
+        with mock.patch.object(Model, 'upsert') as upsert:
+            for entity_data in entities_data:
+                feedback_entity_task(dict(entity_data), Entity.Ad)
+            single_calls = upsert.call_args_list
+            upsert.reset_mock()
+
+            feedback_entities_task([dict(entity_data) for entity_data in entities_data], Entity.Ad)
+
+        # conditional update expressions don't compare by value, so positional keys and attribute names are compared
+        def _keys(calls):
+            return sorted((call[0], sorted(call[1])) for call in calls)
+
+        assert _keys(upsert.call_args_list) == _keys(single_calls)
+        assert len(single_calls) == 2
+
+    def test_batch_retries_on_exceeded_throughput(self):
+        throughput_error = UpdateError('ProvisionedThroughputExceededException')
+        Model = ENTITY_TYPE_DB_MODEL_MAP[Entity.Campaign]
+
+        with mock.patch.object(Model, 'upsert', side_effect=[throughput_error, None]) as upsert, mock.patch.object(
+            jobs_config, 'ENTITY_FEEDBACK_THROUGHPUT_BACKOFF', 0
+        ):
+            feedback_entities_task([{'id': 'C1', 'account_id': 'AA'}], Entity.Campaign)
+
+        assert upsert.call_count == 2
+
+    def test_batch_raises_other_errors(self):
+        Model = ENTITY_TYPE_DB_MODEL_MAP[Entity.Campaign]
+
+        with mock.patch.object(Model, 'upsert', side_effect=UpdateError('other')):
+            with pytest.raises(UpdateError):
+                feedback_entities_task([{'id': 'C1', 'account_id': 'AA'}], Entity.Campaign)
+
+    def test_buffer_sends_trimmed_entities_in_batches(self):
+        with mock.patch.object(feedback_entity_task_module.feedback_entities_task, 'delay') as delay:
+            with EntityFeedbackBuffer(Entity.Campaign, batch_size=2) as feedback:
+                for index in range(5):
+                    feedback({'id': f'C{index}', 'account_id': 'AA', 'name': 'not needed', 'targeting': {}})
+
+        assert [[entity['id'] for entity in call[0][0]] for call in delay.call_args_list] == [
+            ['C0', 'C1'],
+            ['C2', 'C3'],
+            ['C4'],
+        ]
+        assert delay.call_args_list[0][0] == (
+            [{'id': 'C0', 'account_id': 'AA'}, {'id': 'C1', 'account_id': 'AA'}],
+            Entity.Campaign,
+        )
@@ -1,5 +1,5 @@
 # must be first, as it does event loop patching and other "first" things
-from tests.base.testcase import TestCase
+from tests.base.testcase import TestCase, mock
 from datetime import datetime
 import pytz
 from facebook_business.adobjects.campaign import Campaign
@@ -9,7 +9,9 @@ from common.enums.entity import Entity
 
 from config.facebook import AD_ACCOUNT, TOKEN
 
-from oozer.entities.entity_hash import EntityHash, _checksum_entity
+from oozer.entities import entity_hash
+from oozer.entities.entity_hash import EntityHash, EntityHashStore, _checksum_entity
+from tests.base.redis import RecordingRedis
 
 
 class TestEntityHasher(TestCase):
@@ -47,3 +49,48 @@ class TestEntityHasher(TestCase):
         checksum = _checksum_entity(entity, ['account_id', 'buying_type'])
 
         assert checksum == EntityHash(data='298161fe360af3f3', fields='1558fc6663140a4e')
+
+
+class TestEntityHashStore(TestCase):
+    key = 'AA:C:EntityHashStore'
+
+    def setUp(self):
+        super().setUp()
+        self.redis = RecordingRedis(replies={'HGETALL': {b'C1': b'aaaabbbb', b'C2': b'ccccdddd'}})
+        patcher = mock.patch.object(entity_hash, 'get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_changes_are_detected_and_saved(self):
+        with EntityHashStore('AA', Entity.Campaign) as store:
+            assert not store.is_changed('C1', EntityHash(data='aaaa', fields='bbbb'))
+            assert store.is_changed('C3', EntityHash(data='eeee', fields='bbbb'))
+
+        assert self.redis.commands[0] == ('HGETALL', self.key)
+        assert self.redis.pipelines == [
+            # C2 was not seen this time
+            [('HMSET', self.key, 'C3', 'eeeebbbb'), ('HDEL', self.key, 'C2')]
+        ]
+
+    def test_nothing_saved_on_failure(self):
+        with self.assertRaises(ValueError):
+            with EntityHashStore('AA', Entity.Campaign) as store:
+                assert store.is_changed('C3', EntityHash(data='eeee', fields='bbbb'))
+                raise ValueError()
+
+        assert self.redis.commands == [('HGETALL', self.key)]
+
+    def test_expiry_set_on_creation(self):
+        self.redis.replies['HGETALL'] = {}
+        with EntityHashStore('AA', Entity.Campaign) as store:
+            assert store.is_changed('C1', EntityHash(data='aaaa', fields='bbbb'))
+
+        assert self.redis.pipelines == [
+            [('HMSET', self.key, 'C1', 'aaaabbbb'), ('EXPIRE', self.key, entity_hash.jobs_config.ENTITY_HASH_TTL)]
+        ]
+
+    def test_disabled(self):
+        with EntityHashStore('AA', Entity.Campaign, enabled=False) as store:
+            assert store.is_changed('C1', EntityHash(data='aaaa', fields='bbbb'))
+
+        assert self.redis.commands == []
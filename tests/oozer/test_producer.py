@@ -1,8 +1,20 @@
 import contextlib
 from unittest.mock import patch
 
+from common.enums.entity import Entity
+from common.enums.failure_bucket import FailureBucket
+from common.enums.reporttype import ReportType
+from common.job_signature import JobSignature
+from common.store.jobreport import JobReport
+from oozer.common import sorted_jobs_queue
+from oozer.common.job_scope import JobScope
 from oozer.common.sorted_jobs_queue import SortedJobsQueue
+from oozer.common.throttled_retries import ThrottledRetries
 from oozer.producer import TaskProducer
+from sweep_builder.data_containers.entity_node import EntityNode
+from sweep_builder.data_containers.expectation_claim import ExpectationClaim
+from sweep_builder.scorable import generate_scorable
+from tests.base.redis import RecordingRedis
 
 
 @contextlib.contextmanager
@@ -18,3 +30,194 @@ def test_iter_tasks():
         assert task is not None
         assert job_scope.job_id == 'fb|029dc5f3253c456ea5ee29d0919b686e|||dayplatform|A|2000-01-02'
         assert score == 100
+
+
+@contextlib.contextmanager
+def mock_reader_with_child_jobs(_):
+    yield [
+        ('fb|AA|C|C1|lifetime|A', {}, 300),
+        ('fb|AA|||lifetime|A', {}, 200),
+        ('fb|AA|C|C2|lifetime|A', {}, 100),
+        ('fb|AA|C|C3|lifetime|A', {}, 50),
+    ]
+
+
+@contextlib.contextmanager
+def mock_empty_reader(_):
+    yield []
+
+
+@patch.object(SortedJobsQueue, 'JobsReader', new=mock_reader_with_child_jobs)
+@patch.object(SortedJobsQueue, 'get_child_job_counts', side_effect=lambda: {'fb|AA|||lifetime|A': 3})
+class TestWholesaleDedup:
+    @staticmethod
+    def _iter_job_ids():
+        return [job_scope.job_id for _, job_scope, _, _ in TaskProducer('sweep-id').iter_tasks()]
+
+    def test_all_let_out_when_disabled(self, _):
+        assert self._iter_job_ids() == [
+            'fb|AA|C|C1|lifetime|A',
+            'fb|AA|||lifetime|A',
+            'fb|AA|C|C2|lifetime|A',
+            'fb|AA|C|C3|lifetime|A',
+        ]
+
+    @patch('oozer.producer.looper_config.WHOLESALE_DEDUP_ENABLED', True)
+    def test_singles_skipped_once_parent_let_out(self, _):
+        assert self._iter_job_ids() == ['fb|AA|C|C1|lifetime|A', 'fb|AA|||lifetime|A']
+
+    @patch('oozer.producer.looper_config.WHOLESALE_DEDUP_ENABLED', True)
+    @patch('oozer.producer.looper_config.WHOLESALE_DEDUP_SPECULATIVE_TAIL', 2)
+    def test_parent_skipped_on_speculative_tail(self, _):
+        assert self._iter_job_ids() == ['fb|AA|C|C1|lifetime|A', 'fb|AA|C|C2|lifetime|A', 'fb|AA|C|C3|lifetime|A']
+
+    @patch('oozer.producer.looper_config.WHOLESALE_DEDUP_ENABLED', True)
+    @patch('oozer.producer.looper_config.WHOLESALE_DEDUP_SPECULATIVE_TAIL', 1)
+    def test_parent_let_out_when_tail_is_long(self, _):
+        assert self._iter_job_ids() == ['fb|AA|C|C1|lifetime|A', 'fb|AA|||lifetime|A']
+
+
+@patch('sweep_builder.scorable.TASK_BREAKDOWN_ENABLED', True)
+@patch('sweep_builder.scorable.TASK_BREAKDOWN_PREDICTIVE_ENABLED', True)
+@patch('sweep_builder.scorable.TASK_BREAKDOWN_MAX_DATAPOINTS', 100)
+@patch('sweep_builder.scorable.WHOLESALE_DEDUP_ENABLED', True)
+@patch('sweep_builder.scorable.AccountCache.get_refresh_if_older_than', return_value=None)
+@patch('sweep_builder.scorable._fetch_job_report')
+@patch('oozer.producer.looper_config.WHOLESALE_DEDUP_ENABLED', True)
+class TestWholesaleDedupOfBrokenDownJob:
+    """Per-AdAccount job broken down by Sweep Builder, through the queue, to Looper"""
+
+    scores = {'fb|AA|C|C1|lifetime|C': 30, 'fb|AA|||lifetime|C': 20, 'fb|AA|C|C2|lifetime|C': 10}
+
+    @staticmethod
+    def _claim():
+        ad_account_node = EntityNode('AA', Entity.AdAccount)
+        ad_account_node.add_node(EntityNode('C1', Entity.Campaign))
+        ad_account_node.add_node(EntityNode('C2', Entity.Campaign))
+        return ExpectationClaim(
+            'AA',
+            Entity.AdAccount,
+            ReportType.lifetime,
+            Entity.Campaign,
+            JobSignature('fb|AA|||lifetime|C'),
+            ad_account_id='AA',
+            entity_hierarchy=ad_account_node,
+        )
+
+    def _iter_job_ids(self, fetch_job_report, last_report):
+        fetch_job_report.side_effect = lambda job_id: last_report if job_id == 'fb|AA|||lifetime|C' else None
+        redis = RecordingRedis(
+            replies={
+                'HGETALL': lambda *_: {
+                    key.encode('utf8'): str(value).encode('utf8') for _, _, key, value in redis.get_commands('HMSET')
+                }
+            }
+        )
+        queue = SortedJobsQueue('sweep-id')
+        with patch.object(sorted_jobs_queue, 'get_redis', return_value=redis):
+            with queue.JobsWriter() as add_to_queue:
+                for claim in generate_scorable(self._claim()):
+                    add_to_queue(claim.job_id, self.scores[claim.job_id])
+
+            queued = [
+                (job_id, {}, score)
+                for _, _, *scores_and_job_ids in redis.get_commands('ZADD')
+                for score, job_id in zip(scores_and_job_ids[::2], scores_and_job_ids[1::2])
+            ]
+
+            @contextlib.contextmanager
+            def mock_reader(_):
+                yield sorted(queued, key=lambda job: job[2], reverse=True)
+
+            with patch.object(SortedJobsQueue, 'JobsReader', new=mock_reader):
+                return [job_scope.job_id for _, job_scope, _, _ in TaskProducer('sweep-id').iter_tasks()]
+
+    def test_singles_skipped_once_failing_parent_let_out(self, fetch_job_report, _):
+        last_report = JobReport(last_failure_bucket=FailureBucket.TooLarge, fails_in_row=1)
+
+        assert self._iter_job_ids(fetch_job_report, last_report) == ['fb|AA|C|C1|lifetime|C', 'fb|AA|||lifetime|C']
+
+    @patch('oozer.producer.looper_config.WHOLESALE_DEDUP_SPECULATIVE_TAIL', 1)
+    def test_failing_parent_skipped_on_speculative_tail(self, fetch_job_report, _):
+        last_report = JobReport(last_failure_bucket=FailureBucket.TooLarge, fails_in_row=1)
+
+        assert self._iter_job_ids(fetch_job_report, last_report) == ['fb|AA|C|C1|lifetime|C', 'fb|AA|C|C2|lifetime|C']
+
+    def test_singles_let_out_for_parent_too_large(self, fetch_job_report, _):
+        last_report = JobReport(last_total_datapoint_count=120)
+
+        assert self._iter_job_ids(fetch_job_report, last_report) == ['fb|AA|C|C1|lifetime|C', 'fb|AA|C|C2|lifetime|C']
+
+
+class _RetryLane:
+    """Throttled retries lane of a sweep, on a clock of its own"""
+
+    def __init__(self, ready_times):
+        self.now = 1000
+        self.job_scopes = []
+        for i, ready_at in enumerate(ready_times):
+            job_scope = JobScope(
+                sweep_id='sweep-id', ad_account_id='AA', report_type='lifetime', report_variant='A', entity_id=f'R{i}'
+            )
+            job_scope.score = 1000
+            self.job_scopes.append((ready_at, job_scope))
+        self.is_closed = False
+        self.slept = []
+
+    def pop_due(self, limit=100):
+        due = [job_scope for ready_at, job_scope in self.job_scopes if ready_at <= self.now][:limit]
+        self.job_scopes = [(ready_at, job_scope) for ready_at, job_scope in self.job_scopes if job_scope not in due]
+        return due
+
+    def get_next_ready_time(self):
+        return min((ready_at for ready_at, _ in self.job_scopes), default=None)
+
+    def close(self):
+        self.is_closed = True
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    @contextlib.contextmanager
+    def patch(self):
+        with patch.object(ThrottledRetries, 'pop_due', side_effect=self.pop_due), patch.object(
+            ThrottledRetries, 'get_next_ready_time', side_effect=self.get_next_ready_time
+        ), patch.object(ThrottledRetries, 'close', side_effect=self.close), patch(
+            'oozer.producer.gevent.sleep', side_effect=self.sleep
+        ), patch(
+            'oozer.producer.time.time', side_effect=lambda: self.now
+        ):
+            yield
+
+
+@patch('oozer.producer.looper_config.THROTTLED_RETRY_ENABLED', True)
+@patch('oozer.producer.looper_config.THROTTLED_RETRY_CHECK_INTERVAL', 0)
+class TestThrottledRetries:
+    @patch.object(SortedJobsQueue, 'JobsReader', new=mock_reader_with_child_jobs)
+    def test_due_throttled_retries_let_out_ahead_of_new_jobs(self):
+        lane = _RetryLane([1000])
+
+        with lane.patch():
+            tasks = [(job_scope.job_id, score) for _, job_scope, _, score in TaskProducer('sweep-id').iter_tasks()]
+
+        assert tasks == [
+            ('fb|AA||R0|lifetime|A', 1000),
+            ('fb|AA|C|C1|lifetime|A', 300),
+            ('fb|AA|||lifetime|A', 200),
+            ('fb|AA|C|C2|lifetime|A', 100),
+            ('fb|AA|C|C3|lifetime|A', 50),
+        ]
+        assert lane.is_closed
+
+    @patch.object(SortedJobsQueue, 'JobsReader', new=mock_empty_reader)
+    def test_lane_drained_as_retries_fall_due_once_queue_runs_out(self):
+        # more than one pop_due batch due now, one due in a minute, one past time to stop oozing
+        lane = _RetryLane([1000] * 150 + [1060, 1400])
+
+        with lane.patch():
+            tasks = list(TaskProducer('sweep-id').iter_tasks(stop_oozing_time=1300))
+
+        assert len(tasks) == 151
+        assert lane.slept == [60]
+        assert lane.is_closed
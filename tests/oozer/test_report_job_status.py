@@ -1,11 +1,14 @@
 # must be first, as it does event loop patching and other "first" things
 from tests.base.testcase import TestCase, mock
 
+from datetime import date
+
 from common.enums.entity import Entity
 from common.enums.reporttype import ReportType
 from common.tztools import now
 from oozer.common import cold_storage
 from oozer.common import report_job_status
+from oozer.common.enum import ExternalPlatformJobStatus
 from oozer.common.job_scope import JobScope
 from tests.base import random
 
@@ -53,3 +56,65 @@ class TestJobDoneReporter(TestCase):
         assert job_scope_reported.sweep_id == job_scope.sweep_id
         assert job_scope_reported.ad_account_id == job_scope.ad_account_id
         assert job_scope_reported.report_type == ReportType.sync_status
+
+
+class TestJobStatusReporter(TestCase):
+    def test_coalesced_job_status_recorded_for_each_day(self):
+        job_scope = JobScope(
+            sweep_id=random.gen_string_id(),
+            ad_account_id=random.gen_string_id(),
+            report_type=ReportType.day,
+            report_variant=Entity.Ad,
+            range_start=date(2020, 1, 30),
+            range_end=date(2020, 2, 1),
+            datapoint_count=10,
+        )
+
+        with mock.patch.object(report_job_status, 'JobReport') as JobReport, mock.patch.object(
+            report_job_status, '_report_job_done_to_cold_store'
+        ):
+            report_job_status.report_job_status(ExternalPlatformJobStatus.Done, job_scope)
+
+        assert [aa for aa, _ in JobReport.call_args_list] == [
+            (JobScope(job_scope.to_dict(), range_start=day, range_end=None).job_id,)
+            for day in [date(2020, 1, 30), date(2020, 1, 31), date(2020, 2, 1)]
+        ]
+        # split evenly among days
+        JobReport.last_total_datapoint_count.set.assert_called_once_with(4)
+
+    def test_single_day_job_status_recorded_for_job(self):
+        job_scope = JobScope(
+            sweep_id=random.gen_string_id(),
+            ad_account_id=random.gen_string_id(),
+            report_type=ReportType.day,
+            report_variant=Entity.Ad,
+            range_start=date(2020, 1, 30),
+            datapoint_count=10,
+        )
+
+        with mock.patch.object(report_job_status, 'JobReport') as JobReport:
+            report_job_status.report_job_status(ExternalPlatformJobStatus.DataFetched, job_scope)
+
+        JobReport.assert_called_once_with(job_scope.job_id)
+
+    def test_batched_job_status_recorded_for_each_entity(self):
+        job_scope = JobScope(
+            sweep_id=random.gen_string_id(),
+            ad_account_id=random.gen_string_id(),
+            entity_type=Entity.PagePost,
+            entity_id='PP1',
+            entity_ids=['PP1', 'PP2'],
+            report_type=ReportType.lifetime,
+            report_variant=Entity.PagePost,
+            datapoint_count=2,
+        )
+
+        with mock.patch.object(report_job_status, 'JobReport') as JobReport, mock.patch.object(
+            report_job_status, '_report_job_done_to_cold_store'
+        ) as report_job_done_to_cold_store:
+            report_job_status.report_job_status(ExternalPlatformJobStatus.Done, job_scope)
+
+        job_ids = [JobScope(job_scope.to_dict(), entity_id=entity_id).job_id for entity_id in ['PP1', 'PP2']]
+        assert [aa for aa, _ in JobReport.call_args_list] == [(job_id,) for job_id in job_ids]
+        assert [aa[0].job_id for aa, _ in report_job_done_to_cold_store.call_args_list] == job_ids
+        JobReport.last_total_datapoint_count.set.assert_called_once_with(1)
@@ -6,6 +6,7 @@ from common.bugsnag import SEVERITY_ERROR
 from common.enums.failure_bucket import FailureBucket
 from common.error_inspector import ErrorTypesReport
 from oozer.common.enum import ExternalPlatformJobStatus
+from oozer.common.errors import TaskHandedOff
 from oozer.reporting import reported_task
 
 
@@ -78,3 +79,19 @@ def test_reported_task_on_failure_generic_error(mock_notify, mock_report, mock_f
     mock_from_job_scope.return_value.report_usage_per_failure_bucket.assert_called_once_with(
         'token', FailureBucket.Other
     )
+
+
+@patch('oozer.reporting.SweepStatusTracker')
+@patch('oozer.reporting.report_job_status_task')
+def test_reported_task_handed_off(mock_report, mock_tracker):
+    mock_job_scope = Mock()
+
+    @reported_task
+    def test_task(*_, **__):
+        raise TaskHandedOff(mock_job_scope)
+
+    test_task(mock_job_scope)
+
+    # whoever took over reports the outcome
+    assert not mock_report.delay.called
+    mock_tracker.return_value.report_handed_off.assert_called_once_with()
@@ -1,10 +1,13 @@
 # must be first, as it does event loop patching and other "first" things
-from tests.base.testcase import TestCase
+from tests.base.testcase import TestCase, mock
 
 from common.enums.entity import Entity
 from common.enums.reporttype import ReportType
 from common.id_tools import generate_id
+from config import looper as looper_config
+from oozer.common import sorted_jobs_queue
 from tests.base import random
+from tests.base.redis import RecordingRedis
 
 from oozer.common.sorted_jobs_queue import SortedJobsQueue
 
@@ -91,3 +94,36 @@ class JobsWriterTests(TestCase):
                 cnt += 1
 
         assert cnt == jobs_to_generate
+
+    def _add_parent_and_child_jobs(self, parent_job_id):
+        with SortedJobsQueue(self.sweep_id).JobsWriter() as add_to_queue:
+            add_to_queue(parent_job_id, 10)
+            for campaign_id in ['C1', 'C2']:
+                add_to_queue(
+                    generate_id(
+                        ad_account_id='AAID',
+                        entity_type=Entity.Campaign,
+                        entity_id=campaign_id,
+                        report_type=ReportType.lifetime,
+                        report_variant=Entity.Ad,
+                    ),
+                    20,
+                )
+
+    @mock.patch.object(looper_config, 'WHOLESALE_DEDUP_ENABLED', True)
+    def test_child_job_counts(self):
+        parent_job_id = generate_id(ad_account_id='AAID', report_type=ReportType.lifetime, report_variant=Entity.Ad)
+
+        self._add_parent_and_child_jobs(parent_job_id)
+
+        assert SortedJobsQueue(self.sweep_id).get_child_job_counts() == {parent_job_id: 2}
+
+    def test_child_job_counts_not_written_without_wholesale_dedup(self):
+        redis = RecordingRedis()
+        parent_job_id = generate_id(ad_account_id='AAID', report_type=ReportType.lifetime, report_variant=Entity.Ad)
+
+        with mock.patch.object(sorted_jobs_queue, 'get_redis', return_value=redis):
+            self._add_parent_and_child_jobs(parent_job_id)
+
+        assert redis.get_commands('ZADD')
+        assert not redis.get_commands('HMSET')
@@ -37,3 +37,13 @@ def test_get_child():
     node.add_node(child)
 
     assert child == node.get_child('ad-id1')
+
+
+def test_count_leaves():
+    node = EntityNode('ad-account-id', Entity.AdAccount)
+    node.add_node(EntityNode('adset-id1', Entity.AdSet), ('campaign-id1',))
+    node.add_node(EntityNode('adset-id2', Entity.AdSet), ('campaign-id1',))
+    node.add_node(EntityNode('adset-id3', Entity.AdSet), ('campaign-id2',))
+
+    assert node.count_leaves() == 3
+    assert node.get_child('campaign-id1').count_leaves() == 2
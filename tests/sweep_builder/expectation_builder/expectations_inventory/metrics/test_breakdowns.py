@@ -110,3 +110,32 @@ def test_day_metrics_per_entity_under_ad_account_is_divisible(mock_iter_reality_
             ),
         )
     ]
+
+
+@patch('sweep_builder.expectation_builder.expectations_inventory.metrics.breakdowns.AccountCache')
+@patch('sweep_builder.expectation_builder.expectations_inventory.metrics.breakdowns.FinalDays')
+@patch('sweep_builder.expectation_builder.expectations_inventory.metrics.breakdowns.iter_reality_per_ad_account_claim')
+def test_day_metrics_per_entity_under_ad_account_final_days_skipped(
+    mock_iter_reality_per_ad_account, mock_final_days, mock_account_cache
+):
+    reality_claim = RealityClaim(
+        ad_account_id='ad-account-id',
+        entity_id='ad-account-id',
+        entity_type=Entity.AdAccount,
+        timezone='America/Los_Angeles',
+    )
+
+    mock_iter_reality_per_ad_account.return_value = [
+        RealityClaim(
+            entity_type=Entity.Ad, entity_id='ad-2', bol=datetime(2019, 1, 1, 12, 0), eol=datetime(2019, 1, 2, 12, 0)
+        )
+    ]
+    refresh_if_older_than = datetime(2019, 3, 1)
+    mock_account_cache.get_refresh_if_older_than.return_value = refresh_if_older_than
+    mock_final_days.return_value.get.side_effect = [{date(2019, 1, 1)}, {date(2019, 1, 1), date(2019, 1, 2)}]
+
+    with patch('config.jobs.DAY_REPORT_FINALITY_ENABLED', True):
+        result = list(day_metrics_per_ads_under_ad_account([ReportType.day, ReportType.day_hour], reality_claim))
+
+    assert [claim.job_id for claim in result] == ['fb|ad-account-id|||day|A|2019-01-02']
+    mock_final_days.return_value.get.assert_called_with(final_since=refresh_if_older_than)
@@ -0,0 +1,36 @@
+from unittest.mock import patch
+
+import pytest
+
+from common.enums.entity import Entity
+from config import jobs as jobs_config
+from oozer.entities import inline_comments
+from sweep_builder.account_cache import AccountCache
+from sweep_builder.data_containers.reality_claim import RealityClaim
+from sweep_builder.expectation_builder.expectations_inventory.entities import entities_per_page_post
+from tests.base.redis import RecordingRedis
+
+
+@pytest.fixture
+def redis():
+    redis = RecordingRedis(replies={'SMEMBERS': {b'PP2'}})
+    AccountCache.reset()
+    with patch.object(inline_comments, 'get_redis', return_value=redis), patch.object(
+        jobs_config, 'PAGE_POST_INLINE_COMMENTS_ENABLED', True
+    ):
+        yield redis
+    AccountCache.reset()
+
+
+def test_comments_expected_only_for_page_posts_pending_comments(redis):
+    expected_page_post_ids = [
+        claim.entity_id
+        for page_post_id in ['PP1', 'PP2', 'PP3']
+        for claim in entities_per_page_post(
+            Entity.Comment, RealityClaim(ad_account_id='P', entity_id=page_post_id, entity_type=Entity.PagePost)
+        )
+    ]
+
+    assert expected_page_post_ids == ['PP2']
+    # pending PagePosts are read once per Page
+    assert redis.commands == [('SMEMBERS', 'P:PagePostsPendingComments')]
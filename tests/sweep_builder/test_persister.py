@@ -1,10 +1,14 @@
 # must be first, as it does event loop patching and other "first" things
-from tests.base.testcase import TestCase
+from tests.base.testcase import TestCase, mock
+
+from datetime import date
 
 from common.enums.entity import Entity
 from common.enums.reporttype import ReportType
 from common.id_tools import generate_id
 from common.job_signature import JobSignature
+from common.store.jobreport import JobReport
+from config import jobs as jobs_config
 from oozer.common.job_scope import JobScope
 from oozer.common.sorted_jobs_queue import SortedJobsQueue
 from oozer.looper import TaskProducer
@@ -97,3 +101,188 @@ class PersisterSavesJobScopeData(TestCase):
         )
 
         assert job_scope.to_dict() == job_scope_should_be.to_dict()
+
+
+def _claim(
+    ad_account_id,
+    report_type,
+    report_variant,
+    score,
+    entity_id=None,
+    entity_type=None,
+    range_start=None,
+    last_report=None,
+    timezone=None,
+):
+    return PrioritizationClaim(
+        entity_id or ad_account_id,
+        entity_type or Entity.AdAccount,
+        report_type,
+        JobSignature(
+            generate_id(
+                ad_account_id=ad_account_id,
+                entity_type=entity_type,
+                entity_id=entity_id,
+                range_start=range_start,
+                report_type=report_type,
+                report_variant=report_variant,
+            )
+        ),
+        score,
+        ad_account_id=ad_account_id,
+        timezone=timezone,
+        range_start=range_start,
+        last_report=last_report,
+    )
+
+
+class TestDayRangeCoalescing(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ad_account_id = random.gen_string_id()
+
+    def _day_claim(self, day, score=100, datapoint_count=10, fails_in_row=None, report_type=ReportType.day):
+        return _claim(
+            self.ad_account_id,
+            report_type,
+            Entity.Ad,
+            score,
+            range_start=day,
+            last_report=JobReport('job_id', last_total_datapoint_count=datapoint_count, fails_in_row=fails_in_row),
+            timezone='Europe/London',
+        )
+
+    def test_adjacent_small_days_coalesced(self):
+        claims = [
+            self._day_claim(date(2020, 1, 3), score=300),
+            self._day_claim(date(2020, 1, 1)),
+            self._day_claim(date(2020, 1, 2)),
+            # not adjacent
+            self._day_claim(date(2020, 1, 5)),
+        ]
+
+        coalesced = list(persister.iter_coalesced(claims))
+
+        assert [claim.job_id for claim in coalesced] == [
+            generate_id(
+                ad_account_id=self.ad_account_id,
+                range_start=date(2020, 1, 1),
+                range_end=date(2020, 1, 3),
+                report_type=ReportType.day,
+                report_variant=Entity.Ad,
+            ),
+            claims[3].job_id,
+        ]
+        assert coalesced[0].score == 300
+        assert coalesced[0].range_start == date(2020, 1, 1)
+        assert coalesced[0].range_end == date(2020, 1, 3)
+        assert coalesced[0].timezone == 'Europe/London'
+        assert coalesced[1] is claims[3]
+
+    def test_coalesced_within_limits(self):
+        claims = [self._day_claim(date(2020, 1, day), datapoint_count=40) for day in range(1, 8)]
+
+        with mock.patch.object(jobs_config, 'DAY_RANGE_COALESCING_MAX_DATAPOINTS', 100), mock.patch.object(
+            jobs_config, 'DAY_RANGE_COALESCING_MAX_DAYS', 30
+        ):
+            coalesced = list(persister.iter_coalesced(claims))
+
+        assert [(claim.range_start.day, claim.range_end and claim.range_end.day) for claim in coalesced] == [
+            (1, 2),
+            (3, 4),
+            (5, 6),
+            (7, None),
+        ]
+
+        with mock.patch.object(jobs_config, 'DAY_RANGE_COALESCING_MAX_DAYS', 3):
+            coalesced = list(persister.iter_coalesced(claims))
+
+        assert [(claim.range_start.day, claim.range_end and claim.range_end.day) for claim in coalesced] == [
+            (1, 3),
+            (4, 6),
+            (7, None),
+        ]
+
+    def test_not_coalesced(self):
+        ad_account_id = self.ad_account_id
+        claims = [
+            # different report types
+            self._day_claim(date(2020, 1, 1), report_type=ReportType.day),
+            self._day_claim(date(2020, 1, 2), report_type=ReportType.day_hour),
+            # failing
+            self._day_claim(date(2020, 1, 3), fails_in_row=2),
+            # not to be persisted
+            self._day_claim(date(2020, 1, 4), score=1),
+            # unknown size
+            self._day_claim(date(2020, 1, 5), datapoint_count=None),
+            # too large on its own
+            self._day_claim(date(2020, 1, 6), datapoint_count=jobs_config.DAY_RANGE_COALESCING_MAX_DATAPOINTS + 1),
+        ]
+        # other AdAccount
+        self.ad_account_id = random.gen_string_id()
+        claims.append(self._day_claim(date(2020, 1, 2)))
+        self.ad_account_id = ad_account_id
+
+        coalesced = list(persister.iter_coalesced(claims))
+
+        assert sorted(claim.job_id for claim in coalesced) == sorted(claim.job_id for claim in claims)
+
+
+class TestOrganicInsightsBatching(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.page_id = random.gen_string_id()
+
+    def _lifetime_claim(
+        self, entity_id, entity_type=Entity.PagePost, score=100, report_type=ReportType.lifetime, fails_in_row=None
+    ):
+        return _claim(
+            self.page_id,
+            report_type,
+            entity_type,
+            score,
+            entity_id=entity_id,
+            entity_type=entity_type,
+            last_report=JobReport('job_id', fails_in_row=fails_in_row),
+        )
+
+    def test_page_posts_batched_per_entity_type(self):
+        claims = [
+            self._lifetime_claim('PP1'),
+            self._lifetime_claim('PV1', entity_type=Entity.PageVideo),
+            self._lifetime_claim('PP2', score=300),
+            self._lifetime_claim('PP3'),
+            # not to be persisted
+            self._lifetime_claim('PP4', score=1),
+            # not lifetime insights
+            self._lifetime_claim('PP5', report_type=ReportType.entity),
+            # failing
+            self._lifetime_claim('PP6', fails_in_row=2),
+        ]
+
+        with mock.patch.object(jobs_config, 'ORGANIC_INSIGHTS_BATCH_SIZE', 2):
+            batched = list(persister.iter_batched(claims))
+
+        assert [(claim.job_id, claim.entity_ids) for claim in batched] == [
+            (claims[4].job_id, None),
+            (claims[5].job_id, None),
+            (claims[6].job_id, None),
+            (claims[0].job_id, ['PP1', 'PP2']),
+            (claims[3].job_id, None),
+            (claims[1].job_id, None),
+        ]
+        assert batched[3].score == 300
+
+    def test_batched_per_page(self):
+        claims = [self._lifetime_claim('PP1'), self._lifetime_claim('PP2')]
+        page_id = self.page_id
+        self.page_id = random.gen_string_id()
+        claims.append(self._lifetime_claim('PP3'))
+        self.page_id = page_id
+
+        batched = list(persister.iter_batched(claims))
+
+        assert [(claim.ad_account_id, claim.entity_ids) for claim in batched] == [
+            (claims[0].ad_account_id, ['PP1', 'PP2']),
+            (claims[2].ad_account_id, None),
+        ]
@@ -0,0 +1,81 @@
+from collections import namedtuple
+from unittest.mock import patch
+
+from sweep_builder import profiler
+from sweep_builder.profiler import (
+    PipelineProfiler,
+    STAGE_EXPECTATIONS,
+    STAGE_SCORABLE,
+    METRICS,
+    METRIC_ITEMS,
+    METRIC_WALL,
+)
+from tests.base.redis import RecordingRedis
+
+Claim = namedtuple('Claim', ['ad_account_id'])
+
+
+class _Clock:
+    """Stands in for the time module, so that stages take exactly as long as they say"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def process_time(self):
+        return 0
+
+
+def _slow_stage(iterable, clock, delay):
+    for item in iterable:
+        clock.now += delay
+        yield item
+
+
+def test_profiler_attributes_exclusive_time_per_stage_and_account():
+    claims = [Claim('A1'), Claim('A1'), Claim('A2')]
+    clock = _Clock()
+
+    redis = RecordingRedis()
+    with patch.object(profiler, 'get_redis', return_value=redis), patch.object(profiler, 'time', clock):
+        with PipelineProfiler('sweep', flamegraph=False) as pipeline_profiler:
+            upstream = pipeline_profiler.wrap(STAGE_EXPECTATIONS, _slow_stage(claims, clock, 0.02))
+            downstream = pipeline_profiler.wrap(STAGE_SCORABLE, _slow_stage(upstream, clock, 0.01))
+            assert list(downstream) == claims
+
+    exclusive = pipeline_profiler.exclusive()
+    index_items = METRICS.index(METRIC_ITEMS)
+    index_wall = METRICS.index(METRIC_WALL)
+
+    assert exclusive[STAGE_EXPECTATIONS]['A1'][index_items] == 2
+    assert exclusive[STAGE_SCORABLE]['A2'][index_items] == 1
+
+    expectations_wall = sum(stats[index_wall] for stats in exclusive[STAGE_EXPECTATIONS].values())
+    scorable_wall = sum(stats[index_wall] for stats in exclusive[STAGE_SCORABLE].values())
+    assert round(expectations_wall, 6) == 0.06
+    # upstream stage's 0.06 seconds must have been subtracted
+    assert round(scorable_wall, 6) == 0.03
+
+    # per-slice numbers are added to per-sweep totals
+    fields = {command[2] for command in redis.get_commands('HINCRBYFLOAT')}
+    assert 'scorable|A2|items' in fields
+
+
+def test_one_slice_per_process_profiled():
+    claims = [Claim('A1')]
+
+    redis = RecordingRedis()
+    with patch.object(profiler, 'get_redis', return_value=redis):
+        with PipelineProfiler('sweep', flamegraph=False) as pipeline_profiler:
+            with PipelineProfiler('sweep', flamegraph=False) as concurrent_profiler:
+                assert concurrent_profiler.wrap(STAGE_SCORABLE, claims) is claims
+            assert list(pipeline_profiler.wrap(STAGE_SCORABLE, claims)) == claims
+
+        assert pipeline_profiler.exclusive()[STAGE_SCORABLE]['A1'][0] == 1
+        assert not concurrent_profiler.inclusive[STAGE_SCORABLE]
+
+        # and the next one is, once the first one is done
+        with PipelineProfiler('sweep', flamegraph=False) as next_profiler:
+            assert next_profiler.active
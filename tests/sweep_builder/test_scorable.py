@@ -1,4 +1,4 @@
-from datetime import date
+from datetime import date, datetime, timezone
 from unittest.mock import patch, Mock, sentinel
 
 import pytest
@@ -190,3 +190,93 @@ def test_prefer_job_breakdown_last_error_is_unrelated_but_under_limit():
     report = Mock(last_failure_bucket=FailureBucket.Throttling, fails_in_row=1)
 
     assert not prefer_job_breakdown(report)
+
+
+class TestPredictiveTaskBreakdown:
+    @pytest.fixture(autouse=True)
+    def patch_config(self):
+        with patch('sweep_builder.scorable.TASK_BREAKDOWN_PREDICTIVE_ENABLED', True), patch(
+            'sweep_builder.scorable.TASK_BREAKDOWN_MAX_DATAPOINTS', 100
+        ), patch('sweep_builder.scorable.TASK_BREAKDOWN_MAX_RUNNING_TIME', 100), patch(
+            'sweep_builder.scorable.AccountCache.get_refresh_if_older_than', return_value=None
+        ):
+            yield
+
+    @staticmethod
+    def _claim():
+        ad_account_node = EntityNode('ad-account-id', Entity.AdAccount)
+        ad_account_node.add_node(EntityNode('adset-id1', Entity.AdSet), path=('campaign-id1',))
+        ad_account_node.add_node(EntityNode('adset-id2', Entity.AdSet), path=('campaign-id1',))
+        ad_account_node.add_node(EntityNode('adset-id3', Entity.AdSet), path=('campaign-id2',))
+        return ExpectationClaim(
+            'ad-account-id',
+            Entity.AdAccount,
+            ReportType.lifetime,
+            Entity.Ad,
+            JobSignature('fb|ad-account-id|||lifetime|A'),
+            ad_account_id='ad-account-id',
+            entity_hierarchy=ad_account_node,
+        )
+
+    @staticmethod
+    def _scorable_entity_ids(job_reports):
+        with patch('sweep_builder.scorable._fetch_job_report', side_effect=lambda job_id: job_reports.get(job_id)):
+            return sorted(claim.entity_id for claim in generate_scorable(TestPredictiveTaskBreakdown._claim()))
+
+    def test_small_job_not_broken_down(self):
+        job_reports = {'fb|ad-account-id|||lifetime|A': JobReport(last_total_datapoint_count=90)}
+
+        assert self._scorable_entity_ids(job_reports) == ['ad-account-id']
+
+    def test_large_job_broken_down_by_campaign(self):
+        job_reports = {'fb|ad-account-id|||lifetime|A': JobReport(last_total_datapoint_count=120)}
+
+        assert self._scorable_entity_ids(job_reports) == ['campaign-id1', 'campaign-id2']
+
+    def test_long_running_job_broken_down_to_adsets(self):
+        job_reports = {'fb|ad-account-id|||lifetime|A': JobReport(last_total_running_time=400)}
+
+        assert self._scorable_entity_ids(job_reports) == ['adset-id1', 'adset-id2', 'adset-id3']
+
+    def test_failing_job_broken_down_by_partial_datapoint_count(self):
+        job_reports = {
+            'fb|ad-account-id|||lifetime|A': JobReport(
+                last_total_datapoint_count=90, last_partial_datapoint_count=150, fails_in_row=1
+            )
+        }
+
+        assert self._scorable_entity_ids(job_reports) == ['campaign-id1', 'campaign-id2']
+
+    @patch('sweep_builder.scorable.WHOLESALE_DEDUP_ENABLED', True)
+    def test_failing_job_queued_alongside_breakdown_with_wholesale_dedup(self):
+        job_reports = {
+            'fb|ad-account-id|||lifetime|A': JobReport(last_failure_bucket=FailureBucket.TooLarge, fails_in_row=1)
+        }
+
+        assert self._scorable_entity_ids(job_reports) == ['ad-account-id', 'campaign-id1', 'campaign-id2']
+
+    @patch('sweep_builder.scorable.WHOLESALE_DEDUP_ENABLED', True)
+    def test_large_job_not_queued_alongside_breakdown_with_wholesale_dedup(self):
+        job_reports = {'fb|ad-account-id|||lifetime|A': JobReport(last_total_datapoint_count=120)}
+
+        assert self._scorable_entity_ids(job_reports) == ['campaign-id1', 'campaign-id2']
+
+    @pytest.mark.parametrize(
+        ['child_datapoint_count', 'expected_entity_ids'],
+        [(20, ['ad-account-id']), (30, ['campaign-id1', 'campaign-id2'])],
+    )
+    def test_broken_down_job_merged_back_once_small(self, child_datapoint_count, expected_entity_ids):
+        job_reports = {
+            'fb|ad-account-id|||lifetime|A': JobReport(
+                last_total_datapoint_count=120, last_success_dt=datetime(2020, 1, 1, tzinfo=timezone.utc)
+            ),
+            **{
+                f'fb|ad-account-id|C|{campaign_id}|lifetime|A': JobReport(
+                    last_total_datapoint_count=child_datapoint_count,
+                    last_success_dt=datetime(2020, 1, 2, tzinfo=timezone.utc),
+                )
+                for campaign_id in ['campaign-id1', 'campaign-id2']
+            },
+        }
+
+        assert self._scorable_entity_ids(job_reports) == expected_entity_ids